@@ -0,0 +1,162 @@
+"""
+Giới hạn số request /ask chạy đồng thời.
+
+Công việc nặng (embedding, Chroma, gọi LLM) chạy trong thread pool riêng để
+không chặn event loop của uvicorn. Khi quá tải:
+  - hàng đợi đầy -> QueueFullError (429)
+  - chờ quá lâu  -> QueueTimeoutError (503)
+
+Slot chỉ được trả khi thread làm xong việc: request bị hủy (client ngắt kết
+nối) trong lúc hàm còn chạy thì slot vẫn bị giữ tới khi thread rảnh, số việc
+chạy thật trong pool không bao giờ vượt max_in_flight.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+
+class QueueFullError(Exception):
+    """Số request đang chờ vượt giới hạn"""
+
+
+class QueueTimeoutError(Exception):
+    """Chờ slot quá queue_timeout giây"""
+
+
+class ConcurrencyLimiter:
+    """
+    Giới hạn số tác vụ đang chạy + hàng đợi có timeout, kèm số liệu thống kê.
+
+    Args:
+        max_in_flight: số tác vụ chạy cùng lúc (cũng là số thread của pool)
+        max_queue: số request tối đa được chờ
+        queue_timeout: thời gian chờ tối đa (giây)
+        name: tên dùng cho thread pool
+    """
+    def __init__(self, max_in_flight=4, max_queue=32, queue_timeout=10.0, name="ask"):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=name)
+
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def acquire(self):
+        """Chờ 1 slot, trả về thời gian đã chờ (giây)"""
+        if self.waiting >= self.max_queue and self._semaphore.locked():
+            self.rejected_full += 1
+            raise QueueFullError(f"Hàng đợi đầy ({self.waiting} request đang chờ)")
+
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise QueueTimeoutError(f"Chờ quá {self.queue_timeout}s để được xử lý")
+        finally:
+            self.waiting -= 1
+
+        waited = time.perf_counter() - start
+        self.in_flight += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        return waited
+
+    def release(self):
+        self.in_flight -= 1
+        self.completed += 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """async with limiter.slot() as waited: ..."""
+        waited = await self.acquire()
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def _release_when_done(self, future):
+        """Trả slot khi future (chạy trong thread pool) xong hoặc bị hủy"""
+        loop = asyncio.get_running_loop()
+
+        def done(_):
+            try:
+                loop.call_soon_threadsafe(self.release)
+            except RuntimeError:
+                # event loop đã đóng (app shutdown)
+                pass
+
+        future.add_done_callback(done)
+
+    async def run(self, func, *args, **kwargs):
+        """Chạy hàm đồng bộ trong thread pool riêng, trả về (kết quả, thời gian chờ)"""
+        waited = await self.acquire()
+        try:
+            future = self.executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self.release()
+            raise
+        self._release_when_done(future)
+        # Bị hủy khi đang chờ: future chưa chạy thì bị hủy luôn, đang chạy thì
+        # chạy tiếp và trả slot khi xong
+        result = await asyncio.wrap_future(future)
+        return result, waited
+
+    async def iterate(self, iterator, release=False):
+        """
+        Duyệt 1 iterator đồng bộ (vd generator stream token) trong thread pool
+        riêng, từng phần tử một. Không tự lấy slot: gọi acquire() trước.
+
+        Args:
+            release: trả slot khi duyệt xong / bị hủy (sau khi thread chạy next() xong)
+        """
+        done = object()
+        pending = None
+        try:
+            while True:
+                pending = self.executor.submit(next, iterator, done)
+                item = await asyncio.wrap_future(pending)
+                if item is done:
+                    return
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except ValueError:
+                    # generator vẫn đang chạy trong thread (client ngắt kết nối)
+                    pass
+            if release:
+                if pending is None or pending.done():
+                    self.release()
+                else:
+                    self._release_when_done(pending)
+
+    def stats(self):
+        admitted = self.completed + self.in_flight
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_queue_wait_ms": round(self._total_wait / admitted * 1000, 2) if admitted else 0.0,
+            "max_queue_wait_ms": round(self._max_wait * 1000, 2),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
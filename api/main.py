@@ -1,20 +1,25 @@
 from typing import Union
-from fastapi import FastAPI, HTTPException, status, Depends, Request
+from fastapi import FastAPI, HTTPException, status, Depends, Request, Response, Query
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
-from fastapi.responses import JSONResponse
+from typing import Optional, List, Dict, Any, Literal
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from apscheduler.schedulers.background import BackgroundScheduler
 import time
 import os
+import math
+import json
 import logging
 
 from dotenv import load_dotenv
-from scrape.scrape_web import Scrape
-from scrape.book_csv import CSV_DATA_BOOK
+from scrape.scheduler import ScrapeScheduler
+from scrape.book_db import create_book_store
 from chatbot.chatbot import ChatbotEngine
+from chatbot.session_store import create_session_backend
+from api.concurrency import ConcurrencyLimiter, QueueFullError, QueueTimeoutError
 
 
 load_dotenv(dotenv_path="url.env")
@@ -31,16 +36,61 @@ logger = logging.getLogger(__name__)
 # Global engine instance
 chatbot_engine = None
 
+# Giới hạn số câu hỏi xử lý đồng thời (chạy ngoài event loop).
+# Tạo trong lifespan: thread pool bị shutdown khi app dừng, mỗi lần start cần pool mới
+ask_limiter = None
+
+# Nơi lưu sách: CATALOG_BACKEND=csv (các CSV trong data/) | sqlite (catalog có index + FTS5).
+# Tạo trong lifespan như session backend / hàng đợi: import module không mở file catalog
+book_store = None
+
 # --- LIFESPAN CONTEXT MANAGER ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Khởi tạo engine khi start app, cleanup khi shutdown"""
-    global chatbot_engine
+    global chatbot_engine, ask_limiter, book_store
     
     logger.info("Khởi động ứng dụng...")
     try:
-        chatbot_engine = ChatbotEngine(window_size=5)
+        book_store = create_book_store(
+            os.getenv("CATALOG_BACKEND", "csv"),
+            sqlite_path=os.getenv("CATALOG_SQLITE_PATH", "cache/catalog.db"),
+        )
+        # SESSION_BACKEND=sqlite | redis khi chạy nhiều worker (uvicorn --workers N).
+        # Không đặt SESSION_MAX_ENTRIES -> mặc định của backend (redis không giới hạn theo số session)
+        max_sessions = os.getenv("SESSION_MAX_ENTRIES")
+        session_backend = create_session_backend(
+            os.getenv("SESSION_BACKEND", "memory"),
+            window_size=5,
+            max_entries=int(max_sessions) if max_sessions else None,
+            ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "3600")),
+            sqlite_path=os.getenv("SESSION_SQLITE_PATH", "cache/sessions.db"),
+            redis_url=os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0"),
+        )
+        # ANSWER_CACHE_SEMANTIC_THRESHOLD (vd 0.95) bật tầng semantic của cache câu trả lời
+        threshold = os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD")
+        catalog_db = book_store if book_store.name == "sqlite" else None
+        if catalog_db is not None and catalog_db.count() == 0:
+            # Catalog mới tạo: nạp 1 lần từ các CSV có sẵn
+            logger.info("Catalog SQLite trống, import từ CSV...")
+            catalog_db.import_csv()
+        chatbot_engine = ChatbotEngine(
+            window_size=5,
+            session_backend=session_backend,
+            answer_cache_size=int(os.getenv("ANSWER_CACHE_SIZE", "500")),
+            answer_cache_ttl=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+            answer_cache_threshold=float(threshold) if threshold else None,
+            query_cache_bytes=int(float(os.getenv("QUERY_CACHE_MB", "32")) * 1024 * 1024),
+            fast_path=os.getenv("ASK_FAST_PATH", "1") != "0",
+            catalog_db=catalog_db,
+        )
         chatbot_engine.init_engine_base()
+        chatbot_engine.sessions.start_sweeper()
+        ask_limiter = ConcurrencyLimiter(
+            max_in_flight=int(os.getenv("ASK_MAX_IN_FLIGHT", "4")),
+            max_queue=int(os.getenv("ASK_MAX_QUEUE", "32")),
+            queue_timeout=float(os.getenv("ASK_QUEUE_TIMEOUT", "10")),
+        )
         logger.info("ChatbotEngine đã sẵn sàng!")
     except Exception as e:
         logger.error(f"Lỗi khởi tạo engine: {e}")
@@ -50,7 +100,13 @@ async def lifespan(app: FastAPI):
     
     logger.info("Đang dọn dẹp resources...")
     # Cleanup nếu cần
+    if ask_limiter is not None:
+        ask_limiter.shutdown()
+    ask_limiter = None
+    if chatbot_engine is not None:
+        chatbot_engine.sessions.stop_sweeper()
     chatbot_engine = None
+    book_store = None
     
 # --- FASTAPI APP ---
 app = FastAPI(
@@ -77,13 +133,25 @@ def get_engine():
         )
     return chatbot_engine
 
+
+def get_ask_limiter():
+    """Dependency để lấy hàng đợi /ask"""
+    if ask_limiter is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Chatbot engine chưa được khởi tạo"
+        )
+    return ask_limiter
+
 # ======================================================================================================================================================
 
 # Tự động cập nhật dữ liệu sách 1 ngày/lần
-def auto_update_books_data(engine: ChatbotEngine = Depends(get_engine)):
-    scrape = Scrape()
-    csv_data = CSV_DATA_BOOK()
-    
+def auto_update_books_data():
+    store = book_store
+    if store is None:
+        print("Bỏ qua cập nhật sách vì app chưa khởi động xong")
+        return
+    jobs = []
     for url_key, path_key in category_map.items():
         url = os.getenv(url_key)
         csv_file = os.getenv(path_key)
@@ -91,16 +159,34 @@ def auto_update_books_data(engine: ChatbotEngine = Depends(get_engine)):
         if not url or not csv_file:
             print(f"Bỏ qua {url_key} vì thiếu URL hoặc PATH trong .env")
             continue
-        
+        jobs.append((url_key, url, csv_file))
+
+    # Tải trang danh mục bằng HTTP, Selenium (pool Chrome) chỉ cho danh mục cần JavaScript;
+    # giãn cách theo host thay cho sleep cố định
+    scrape_scheduler = ScrapeScheduler(
+        workers=int(os.getenv("SCRAPE_WORKERS", "3")),
+        min_interval=float(os.getenv("SCRAPE_MIN_INTERVAL_SECONDS", "1.0")),
+        fetch_mode=os.getenv("SCRAPE_FETCH_MODE", "http"),
+        http_concurrency=int(os.getenv("SCRAPE_HTTP_CONCURRENCY", "8")),
+        # Dừng khi gặp toàn sách đã có trong CSV, vẫn cào toàn bộ định kỳ
+        incremental=os.getenv("SCRAPE_INCREMENTAL", "1") != "0",
+        stop_after=int(os.getenv("SCRAPE_STOP_AFTER_PAGES", "2")),
+        full_crawl_days=float(os.getenv("SCRAPE_FULL_CRAWL_DAYS", "7")),
+        state_path=os.getenv("SCRAPE_STATE_PATH", "cache/scrape_state.json"),
+        # Chrome (khi cần) chặn ảnh / font / media / quảng cáo ở tầng mạng
+        lean_driver=os.getenv("SCRAPE_LEAN_DRIVER", "1") != "0",
+        book_store=store,
+    )
+    scrape_scheduler.run(jobs)
+
+    # Đồng bộ Chroma 1 lần sau khi cập nhật xong tất cả CSV
+    if chatbot_engine is not None:
         try:
-            print(f"Đang cập nhật: {url_key} -> {csv_file}")
-            all_books_data = scrape.scrape_all_pages_selenium_2(url)
-            csv_data.update_csv(csv_file, all_books_data)
-            if os.path.exists(engine.chroma_dir):
-                engine.update_chroma_db()
-            print(f"Hoàn thành {url_key}")
+            chatbot_engine.update_chroma_db()
         except Exception as e:
-            print(f"Lỗi khi cập nhật {url_key}: {e}")
+            print(f"Lỗi khi đồng bộ Chroma DB: {e}")
+            # Chroma lỗi vẫn cập nhật catalog / kho sách cho API /books
+            chatbot_engine.refresh_indexes()
 
     print("Tất cả dữ liệu sách đã được cập nhật xong.")
     
@@ -118,10 +204,65 @@ class BookInfo(BaseModel):
     img_path: str
 
 
+class RankedBookInfo(BookInfo):
+    views_count: int
+    downloads_count: int
+
+
+class CatalogBookInfo(RankedBookInfo):
+    category: str
+
+
+class CatalogSearchBook(BookInfo):
+    views: str
+    downloads: str
+    category: str
+
+
+class BookSearchResponse(BaseModel):
+    """Response model cho kết quả tìm sách theo từ trong tên"""
+    q: str
+    books: List[CatalogSearchBook]
+
+
+class BooksPageResponse(BaseModel):
+    """Response model cho 1 trang danh sách sách"""
+    books: List[CatalogBookInfo]
+    total: int = Field(..., description="Tổng số sách thỏa bộ lọc")
+    next_cursor: Optional[str] = Field(None, description="Truyền vào cursor để lấy trang tiếp theo")
+
+
+class GenreCount(BaseModel):
+    genre: str
+    count: int
+
+
+class CategoryCount(BaseModel):
+    category: str
+    count: int
+
+
+class BookFacetsResponse(BaseModel):
+    """Response model cho số sách theo thể loại / danh mục"""
+    genres: List[GenreCount]
+    categories: List[CategoryCount]
+
+
+class TopBooksResponse(BaseModel):
+    """Response model cho danh sách sách nhiều lượt xem / tải nhất"""
+    field: str
+    genre: Optional[str] = None
+    books: List[RankedBookInfo]
+
+
 class QuestionRequest(BaseModel):
     """Request model cho câu hỏi"""
     user_id: str = Field(..., min_length=1, description="ID của user")
     question: str = Field(..., min_length=1, description="Câu hỏi của user")
+    genre: Optional[str] = Field(None, description="Chỉ tìm sách thuộc thể loại này")
+    category: Optional[str] = Field(
+        None, description="Chỉ tìm sách thuộc danh mục này (vd: adventure-horror/detective hoặc adventure-horror)"
+    )
     
     class Config:
         json_schema_extra = {
@@ -132,6 +273,17 @@ class QuestionRequest(BaseModel):
         }
 
 
+def check_search_filter(engine: ChatbotEngine, request: QuestionRequest):
+    """404 nếu thể loại / danh mục trong request không tồn tại"""
+    try:
+        engine.search_filter(request.question, request.genre, request.category)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Không có thể loại / danh mục: {request.genre or request.category}"
+        )
+
+
 class AnswerResponse(BaseModel):
     """Response model cho câu trả lời"""
     answer: str = Field(..., description="Câu trả lời từ chatbot")
@@ -176,12 +328,105 @@ class ActiveSessionsResponse(BaseModel):
     total_count: int
 
 
+class AskStatsResponse(BaseModel):
+    """Response model cho thống kê hàng đợi /ask"""
+    max_in_flight: int
+    max_queue: int
+    queue_timeout: float
+    in_flight: int
+    waiting: int
+    completed: int
+    rejected_queue_full: int
+    rejected_timeout: int
+    avg_queue_wait_ms: float
+    max_queue_wait_ms: float
+
+
+class SessionStatsResponse(BaseModel):
+    """Response model cho thống kê kho session (trường không có ở backend nào thì để None)"""
+    backend: str
+    active: int
+    max_entries: Optional[int] = None
+    ttl_seconds: Optional[float] = None
+    occupancy: Optional[float] = None
+    created: int
+    evicted_lru: Optional[int] = None
+    evicted_ttl: Optional[int] = None
+    removed: Optional[int] = None
+
+
+class RouterStatsResponse(BaseModel):
+    """Response model cho thống kê bộ định tuyến câu hỏi"""
+    title: int
+    top_views: int
+    top_downloads: int
+    genre: int
+    chain: int
+    fast_path_rate: float
+
+
+class AnswerCacheStatsResponse(BaseModel):
+    """Response model cho thống kê cache câu trả lời"""
+    entries: int
+    max_entries: int
+    ttl_seconds: Optional[float] = None
+    semantic_threshold: Optional[float] = None
+    hits_exact: int
+    hits_semantic: int
+    misses: int
+    hit_rate: float
+    evicted: int
+    invalidations: int
+
+
+class QueryCacheStats(BaseModel):
+    """Thống kê LRU embedding câu hỏi"""
+    hits: int
+    misses: int
+    hit_rate: float
+    entries: int
+    bytes: int
+    max_bytes: int
+    evicted: int
+
+
+class EmbeddingCacheStatsResponse(BaseModel):
+    """Response model cho thống kê cache embedding"""
+    hits: int
+    misses: int
+    hit_rate: float
+    cached_vectors: int
+    query: Optional[QueryCacheStats] = None
+
+
 class HealthResponse(BaseModel):
     """Response model cho health check"""
     status: str
     engine_initialized: bool
 
 
+# === HELPERS ==========================================================================================================================================
+
+def queue_http_error(e: Exception, limiter: ConcurrencyLimiter) -> HTTPException:
+    """Lỗi hàng đợi /ask -> 429 (đầy) hoặc 503 (chờ quá lâu), kèm số liệu hàng đợi"""
+    if isinstance(e, QueueFullError):
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={"message": str(e), **limiter.stats()},
+            headers={"Retry-After": "1"}
+        )
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail={"message": str(e), **limiter.stats()},
+        headers={"Retry-After": str(max(1, math.ceil(limiter.queue_timeout)))}
+    )
+
+
+def sse_event(event: str, data) -> str:
+    """Định dạng 1 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 # === API ENDPOINTS ====================================================================================================================================
 
 @app.get("/", tags=["Root"])
@@ -211,21 +456,34 @@ async def health_check():
 )
 async def ask_question(
     request: QuestionRequest,
-    engine: ChatbotEngine = Depends(get_engine)
+    response: Response,
+    engine: ChatbotEngine = Depends(get_engine),
+    limiter: ConcurrencyLimiter = Depends(get_ask_limiter)
 ):
     """
     Gửi câu hỏi và nhận câu trả lời
     
     - **user_id**: ID duy nhất của user (tự động tạo session nếu chưa có)
     - **question**: Câu hỏi cần trả lời
+    - **genre** / **category** (tùy chọn): chỉ tìm sách trong thể loại / danh mục này;
+      không truyền thể loại thì thể loại nhắc tới trong câu hỏi được dùng làm bộ lọc
+    
+    Trả về 404 khi thể loại / danh mục không tồn tại, 429 khi hàng đợi đầy, 503 khi chờ quá lâu.
     """
+    check_search_filter(engine, request)
     try:
-        result = engine.ask(
+        result, waited = await limiter.run(
+            engine.ask,
             user_id=request.user_id,
-            question=request.question
+            question=request.question,
+            genre=request.genre,
+            category=request.category
         )
+        response.headers["X-Queue-Wait-Ms"] = f"{waited * 1000:.1f}"
         logger.info(f"metadata: {result.get('books')}")
         return result
+    except (QueueFullError, QueueTimeoutError) as e:
+        raise queue_http_error(e, limiter)
     except Exception as e:
         logger.error(f"Lỗi khi xử lý câu hỏi: {e}")
         raise HTTPException(
@@ -234,12 +492,229 @@ async def ask_question(
         )
 
 
+@app.post(
+    "/ask/stream",
+    response_class=StreamingResponse,
+    tags=["Chat"]
+)
+async def ask_question_stream(
+    request: QuestionRequest,
+    engine: ChatbotEngine = Depends(get_engine),
+    limiter: ConcurrencyLimiter = Depends(get_ask_limiter)
+):
+    """
+    Giống /ask nhưng trả về Server-Sent Events trong lúc sinh câu trả lời
+    
+    - **books**: danh sách sách, gửi ngay sau khi retrieve xong
+    - **token**: từng đoạn text của câu trả lời
+    - **done**: câu trả lời đầy đủ (cùng dạng AnswerResponse)
+    - **error**: lỗi xảy ra giữa chừng
+    """
+    check_search_filter(engine, request)
+    try:
+        waited = await limiter.acquire()
+    except (QueueFullError, QueueTimeoutError) as e:
+        raise queue_http_error(e, limiter)
+
+    released = False
+
+    def release_slot():
+        nonlocal released
+        if not released:
+            released = True
+            limiter.release()
+
+    async def event_stream():
+        nonlocal released
+        # Từ đây iterate giữ slot: trả khi thread chạy next() đã xong, kể cả khi
+        # client ngắt kết nối giữa chừng
+        released = True
+        events = engine.ask_stream(
+            user_id=request.user_id, question=request.question,
+            genre=request.genre, category=request.category
+        )
+        try:
+            async for event in limiter.iterate(events, release=True):
+                yield sse_event(event["event"], event["data"])
+        except Exception as e:
+            logger.error(f"Lỗi khi stream câu trả lời: {e}")
+            yield sse_event("error", {"message": f"Lỗi xử lý câu hỏi: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # tắt buffer của nginx
+            "X-Queue-Wait-Ms": f"{waited * 1000:.1f}",
+        },
+        # Phòng trường hợp client ngắt trước khi stream bắt đầu
+        background=BackgroundTask(release_slot)
+    )
+
+
+@app.get(
+    "/ask/stats",
+    response_model=AskStatsResponse,
+    tags=["Chat"]
+)
+async def get_ask_stats(
+    limiter: ConcurrencyLimiter = Depends(get_ask_limiter)
+):
+    """
+    Thống kê hàng đợi /ask: số request đang chạy, đang chờ, bị từ chối, thời gian chờ
+    """
+    return limiter.stats()
+
+
+@app.get(
+    "/ask/router/stats",
+    response_model=RouterStatsResponse,
+    tags=["Chat"]
+)
+async def get_router_stats(
+    engine: ChatbotEngine = Depends(get_engine)
+):
+    """
+    Số câu hỏi được trả lời thẳng từ danh mục (theo tên, thể loại, xem / tải nhiều nhất)
+    so với số câu hỏi phải chạy chain LLM
+    """
+    stats = engine.get_router_stats()
+    if stats is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Fast path đang tắt (ASK_FAST_PATH=0)"
+        )
+    return stats
+
+
+@app.get(
+    "/cache/stats",
+    response_model=AnswerCacheStatsResponse,
+    tags=["Chat"]
+)
+async def get_answer_cache_stats(
+    engine: ChatbotEngine = Depends(get_engine)
+):
+    """
+    Thống kê cache câu trả lời: số entry, số lần hit exact / semantic, hit rate, số lần bị xóa
+    """
+    return engine.get_answer_cache_stats()
+
+
+@app.get(
+    "/cache/embeddings/stats",
+    response_model=EmbeddingCacheStatsResponse,
+    tags=["Chat"]
+)
+async def get_embedding_cache_stats(
+    engine: ChatbotEngine = Depends(get_engine)
+):
+    """
+    Thống kê cache embedding: document (đĩa) và LRU embedding câu hỏi (RAM)
+    """
+    return engine.get_embedding_cache_stats()
+
+
+@app.get(
+    "/books",
+    response_model=BooksPageResponse,
+    tags=["Books"]
+)
+async def list_books(
+    genre: Optional[str] = Query(None, description="Thể loại, vd: Lãng mạn"),
+    category: Optional[str] = Query(None, description="Danh mục, vd: comedy-romance hoặc comedy-romance/romance"),
+    q: Optional[str] = Query(None, description="Tiền tố tên sách (có dấu hoặc không)"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor của trang trước"),
+    engine: ChatbotEngine = Depends(get_engine)
+):
+    """
+    Duyệt / tìm sách theo thứ tự tên, phân trang bằng cursor (không gọi LLM)
+    """
+    try:
+        # JSON ghép sẵn từ kho sách, trả thẳng không qua validate response_model
+        content = engine.browse_books(genre=genre, category=category, q=q, limit=limit,
+                                      cursor=cursor, as_json=True)
+        return Response(content=content, media_type="application/json")
+    except KeyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Không có thể loại / danh mục: {e.args[0]}"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get(
+    "/books/search",
+    response_model=BookSearchResponse,
+    tags=["Books"]
+)
+async def search_books(
+    q: str = Query(..., min_length=1, description="Từ trong tên sách (có dấu hoặc không), từ cuối khớp theo tiền tố"),
+    genre: Optional[str] = Query(None, description="Thể loại, vd: Trinh thám"),
+    category: Optional[str] = Query(None, description="Danh mục, vd: adventure-horror hoặc adventure-horror/detective"),
+    limit: int = Query(20, ge=1, le=100),
+    engine: ChatbotEngine = Depends(get_engine)
+):
+    """
+    Tìm sách theo từ trong tên bằng FTS5 của catalog SQLite (CATALOG_BACKEND=sqlite, không gọi LLM)
+    """
+    try:
+        books = engine.search_books(q, genre=genre, category=category, limit=limit)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    return {"q": q, "books": books}
+
+
+@app.get(
+    "/books/facets",
+    response_model=BookFacetsResponse,
+    tags=["Books"]
+)
+async def get_book_facets(
+    engine: ChatbotEngine = Depends(get_engine)
+):
+    """
+    Số sách theo thể loại và theo danh mục (dùng làm bộ lọc cho /books)
+    """
+    return engine.get_book_facets()
+
+
+@app.get(
+    "/books/top",
+    response_model=TopBooksResponse,
+    tags=["Books"]
+)
+async def get_top_books(
+    field: Literal["views", "downloads"] = Query("views", description="Xếp theo lượt xem hoặc lượt tải"),
+    genre: Optional[str] = Query(None, description="Thể loại, vd: Trinh thám"),
+    limit: int = Query(10, ge=1, le=100),
+    min_count: Optional[int] = Query(None, ge=0, description="Chỉ lấy sách có ít nhất min_count lượt"),
+    engine: ChatbotEngine = Depends(get_engine)
+):
+    """
+    Sách nhiều lượt xem / tải nhất, toàn bộ hoặc theo thể loại (đã sắp xếp sẵn, không gọi LLM)
+    """
+    try:
+        books = engine.get_top_books(field=field, genre=genre, limit=limit, min_count=min_count)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Không có thể loại: {genre}"
+        )
+    return {"field": field, "genre": genre, "books": books}
+
+
+# Các endpoint session gọi thẳng backend (SQLite / Redis, I/O chặn) nên khai báo
+# def thường: FastAPI chạy chúng trong threadpool, không chặn event loop
 @app.get(
     "/session/{user_id}",
     response_model=SessionInfoResponse,
     tags=["Session Management"]
 )
-async def get_session_info(
+def get_session_info(
     user_id: str,
     engine: ChatbotEngine = Depends(get_engine)
 ):
@@ -264,7 +739,7 @@ async def get_session_info(
     response_model=List[Dict[str, Any]],
     tags=["Session Management"]
 )
-async def get_session_history(
+def get_session_history(
     user_id: str,
     engine: ChatbotEngine = Depends(get_engine)
 ):
@@ -298,7 +773,7 @@ async def get_session_history(
     response_model=MessageResponse,
     tags=["Session Management"]
 )
-async def clear_session_history(
+def clear_session_history(
     user_id: str,
     engine: ChatbotEngine = Depends(get_engine)
 ):
@@ -327,7 +802,7 @@ async def clear_session_history(
     response_model=MessageResponse,
     tags=["Session Management"]
 )
-async def end_session(
+def end_session(
     user_id: str,
     engine: ChatbotEngine = Depends(get_engine)
 ):
@@ -356,7 +831,7 @@ async def end_session(
     response_model=ActiveSessionsResponse,
     tags=["Session Management"]
 )
-async def get_active_sessions(
+def get_active_sessions(
     engine: ChatbotEngine = Depends(get_engine)
 ):
     """
@@ -376,6 +851,27 @@ async def get_active_sessions(
         )
 
 
+@app.get(
+    "/sessions/stats",
+    response_model=SessionStatsResponse,
+    tags=["Session Management"]
+)
+def get_session_stats(
+    engine: ChatbotEngine = Depends(get_engine)
+):
+    """
+    Thống kê kho session: số session đang giữ, tỉ lệ lấp đầy, số session bị xóa do LRU / TTL
+    """
+    try:
+        return engine.get_session_stats()
+    except Exception as e:
+        logger.error(f"Lỗi khi lấy thống kê session: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Lỗi lấy thống kê session: {str(e)}"
+        )
+
+
 # --- ERROR HANDLERS ---
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -386,7 +882,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "error": True,
             "message": exc.detail,
             "status_code": exc.status_code
-        }
+        },
+        headers=exc.headers
     )
 
 
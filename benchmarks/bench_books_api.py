@@ -0,0 +1,142 @@
+"""
+Load test API duyệt sách (/books, /books/top): đo trực tiếp BookStore và qua
+toàn bộ FastAPI app (gọi ASGI trong process: routing, validate tham số,
+serialize). Không tính mạng / uvicorn; số liệu là của 1 worker, chạy
+uvicorn --workers N thì nhân lên gần tuyến tính.
+
+Không cần model embedding hay Chroma: chỉ build catalog / kho sách từ CSV.
+
+Chạy từ thư mục gốc dự án:
+    uv run python -m benchmarks.bench_books_api [--data-dir data] [--seconds 5] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from urllib.parse import urlencode
+
+import api.main as api_main
+from chatbot.chatbot import ChatbotEngine
+
+
+def build_engine(data_dir, cache_dir):
+    engine = ChatbotEngine(data_dir=data_dir, cache_dir=cache_dir)
+    start = time.perf_counter()
+    engine.refresh_indexes()
+    print(f">> Build catalog + kho sách: {len(engine.book_store)} sách trong {time.perf_counter() - start:.2f}s")
+    return engine
+
+
+def make_queries(engine, count, seed=0):
+    """Trộn các kiểu truy vấn: trang đầu, lọc thể loại / danh mục, tìm tiền tố, trang tiếp theo"""
+    rng = random.Random(seed)
+    store = engine.book_store
+    genres = [store.genre_names[key] for key in store.genres]
+    categories = list(store.categories)
+    prefixes = [title[:rng.randint(1, 6)] for title in rng.sample(store.titles, min(200, len(store)))]
+
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.25:
+            params = {"genre": rng.choice(genres)}
+        elif kind < 0.4:
+            params = {"category": rng.choice(categories)}
+        elif kind < 0.7:
+            params = {"q": rng.choice(prefixes)}
+        elif kind < 0.85:
+            params = {"genre": rng.choice(genres), "q": rng.choice(prefixes)[:1]}
+        else:
+            params = {}
+        params["limit"] = 20
+        # 1/3 số truy vấn đi tiếp tới trang sau
+        if rng.random() < 0.33:
+            page = engine.browse_books(**params)
+            if page["next_cursor"]:
+                params["cursor"] = page["next_cursor"]
+        queries.append(params)
+    return queries
+
+
+def bench_store(engine, queries, seconds):
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for params in queries:
+            engine.browse_books(**params, as_json=True)
+        done += len(queries)
+    elapsed = time.perf_counter() - start
+    print(f"BookStore.search: {done / elapsed:,.0f} truy vấn/s")
+
+
+async def asgi_get(path, query_string):
+    """Gọi thẳng ASGI app (không qua client HTTP) -> chỉ đo phần việc của server"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query_string.encode(), "headers": [(b"host", b"bench")],
+        "server": ("bench", 80), "client": ("127.0.0.1", 0), "root_path": "",
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await api_main.app(scope, receive, send)
+    return status[0]
+
+
+async def bench_http(queries, seconds, concurrency, path="/books"):
+    query_strings = [urlencode(params) for params in queries] if path == "/books" else ["limit=10"]
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(offset):
+        nonlocal errors
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = await asgi_get(path, query_strings[i % len(query_strings)])
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+            i += concurrency
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"GET {path}: {len(latencies) / elapsed:,.0f} request/s, "
+          f"p50 {p50:.2f}ms, p99 {p99:.2f}ms, lỗi {errors} (concurrency={concurrency})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--cache-dir", default="cache")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    # Không chạy job cào dữ liệu định kỳ trong lúc đo
+    api_main.scheduler.shutdown(wait=False)
+    engine = build_engine(args.data_dir, args.cache_dir)
+    api_main.chatbot_engine = engine
+
+    queries = make_queries(engine, 1000)
+    bench_store(engine, queries, args.seconds)
+    asyncio.run(bench_http(queries, args.seconds, args.concurrency))
+    asyncio.run(bench_http(queries, args.seconds, args.concurrency, path="/books/top"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+So sánh tốc độ đọc CSV: vòng lặp iterrows cũ vs bản theo cột (chatbot.ingest).
+
+Chạy từ thư mục gốc dự án:
+    uv run python -m benchmarks.bench_load_csv [--data-dir data] [--repeat 3]
+"""
+import argparse
+import glob
+import hashlib
+import os
+import time
+
+import pandas as pd
+from langchain.schema import Document
+
+from chatbot.chatbot import ChatbotEngine
+from chatbot.ingest import load_corpus_frame, frame_to_documents
+
+
+def legacy_load_all_csv(data_dir):
+    """Bản iterrows gốc của ChatbotEngine.load_all_csv (giữ lại để đối chiếu)"""
+    normalize_text = ChatbotEngine.normalize_text
+    lower_text = ChatbotEngine.lower_text
+    documents = []
+    seen_hashes = set()
+
+    for file in glob.glob(f"{data_dir}/**/*.csv", recursive=True):
+        df = pd.read_csv(file)
+
+        for _, row in df.iterrows():
+            original_content = f"{row['title']} {row['genre']}"
+            lower_content = lower_text(original_content)
+            normalized_content = normalize_text(original_content)
+            combined_content = f"{original_content} {lower_content} {normalized_content}"
+
+            content_hash = hashlib.md5(combined_content.encode("utf-8")).hexdigest()
+            if content_hash in seen_hashes:
+                continue
+            seen_hashes.add(content_hash)
+
+            metadata = {
+                "title": row.get("title", "Unknown"),
+                "title_lower": lower_text(row.get("title", "Unknown")),
+                "title_normalized": normalize_text(row.get("title", "Unknown")),
+                "genre": row.get("genre", "Unknown"),
+                "url": row.get("url", "Unknown"),
+                "img_path": row.get("img_path", "Unknown"),
+                "views": row.get("views", 0),
+                "downloads": row.get("downloads", 0),
+                "category": os.path.relpath(file, data_dir)
+            }
+            documents.append(Document(page_content=combined_content, metadata=metadata))
+    return documents
+
+
+def vectorized_load_all_csv(data_dir):
+    return frame_to_documents(load_corpus_frame(data_dir))
+
+
+# Metadata chỉ bản mới có (không có trong bản iterrows)
+EXTRA_METADATA = {"views_count", "downloads_count"}
+
+
+def _key(doc):
+    # NaN != NaN nên so sánh qua str()
+    return doc.page_content, tuple(
+        (k, str(v)) for k, v in sorted(doc.metadata.items()) if k not in EXTRA_METADATA
+    )
+
+
+def timeit(fn, data_dir, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(data_dir)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    legacy_time, legacy_docs = timeit(legacy_load_all_csv, args.data_dir, args.repeat)
+    fast_time, fast_docs = timeit(vectorized_load_all_csv, args.data_dir, args.repeat)
+
+    same = [_key(d) for d in legacy_docs] == [_key(d) for d in fast_docs]
+    print(f"iterrows:   {legacy_time:.3f}s ({len(legacy_docs)} documents)")
+    print(f"vectorized: {fast_time:.3f}s ({len(fast_docs)} documents)")
+    print(f"speedup:    x{legacy_time / fast_time:.1f}")
+    print(f"kết quả giống nhau: {same}")
+
+
+if __name__ == "__main__":
+    main()
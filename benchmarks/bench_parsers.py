@@ -0,0 +1,61 @@
+"""
+Microbenchmark các backend parse trang danh mục (scrape.parsers) trên các
+HTML mẫu trong benchmarks/fixtures: kiểm tra mọi backend cho đúng kết quả
+của bs4, rồi đo thời gian parse 1 trang.
+
+Backend chưa cài thư viện (lxml, selectolax) được bỏ qua. Backend "js" của
+Books (lấy sách trong trình duyệt) cần Chrome nên không đo ở đây.
+
+Chạy từ thư mục gốc dự án:
+    uv run python -m benchmarks.bench_parsers [--seconds 2]
+"""
+import argparse
+import glob
+import os
+import time
+
+from scrape.parsers import PARSERS, available_parsers
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "*.html")
+
+
+def measure(parse, html, seconds):
+    parse(html)  # khởi động (import, biên dịch XPath)
+    runs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        parse(html)
+        runs += 1
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=2, help="thời gian đo mỗi backend / fixture")
+    args = parser.parse_args()
+
+    backends = available_parsers()
+    missing = [name for name in PARSERS if name not in backends]
+    if missing:
+        print(f">> Chưa cài: {', '.join(missing)} (bỏ qua)")
+
+    for path in sorted(glob.glob(FIXTURES)):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        expected = PARSERS["bs4"](html)
+        print(f"\n{os.path.basename(path)}: {len(html) / 1024:.1f} KB, {len(expected)} dòng")
+
+        baseline = None
+        for name in backends:
+            result = PARSERS[name](html)
+            if result != expected:
+                raise AssertionError(f"{name} cho kết quả khác bs4 trên {path}")
+            seconds = measure(PARSERS[name], html, args.seconds)
+            baseline = baseline or seconds
+            print(f"  {name:<10} {seconds * 1000:8.2f} ms/trang  {1 / seconds:8,.0f} trang/s  "
+                  f"x{baseline / seconds:.1f} so với bs4")
+
+
+if __name__ == "__main__":
+    main()
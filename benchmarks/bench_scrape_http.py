@@ -0,0 +1,119 @@
+"""
+Đo HttpScraper (tải trang danh mục bằng HTTP, không mở Chrome) trên máy, không
+cần mạng: 1 HTTP server local trả về HTML mẫu (benchmarks/fixtures/category_page.html)
+cho mọi đường dẫn /cbo/<danh mục>/ và /cbo/<danh mục>/page/<n>/, có thể thêm
+độ trễ giả lập mỗi request.
+
+Kiểm tra luôn:
+  - số trang / số sách cào được khớp với HTML mẫu
+  - danh mục không có data-flatsome-relay (/nojs/...) -> NeedsBrowser (chuyển Selenium)
+
+Chạy từ thư mục gốc dự án:
+    uv run python -m benchmarks.bench_scrape_http [--categories 6] [--pages 12] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scrape.http_fetcher import HttpScraper, NeedsBrowser
+from scrape.scheduler import HostRateLimiter
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "category_page.html")
+PAGE_PATTERN = re.compile(r"/page/(\d+)/?$")
+
+
+def make_handler(html, total_pages, latency):
+    """Handler trả về HTML mẫu, sửa currentPage / totalPages theo đường dẫn"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # giữ kết nối keep-alive
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            match = PAGE_PATTERN.search(self.path)
+            page = int(match.group(1)) if match else 1
+            body = html.replace('"currentPage":1', f'"currentPage":{page}')
+            body = body.replace('"totalPages":12', f'"totalPages":{total_pages}')
+            if self.path.startswith("/nojs/"):
+                body = body.replace("data-flatsome-relay=", "data-relay-removed=")
+            if page > total_pages:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=UTF-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(total_pages, latency):
+    with open(FIXTURE, encoding="utf-8") as f:
+        html = f.read()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(html, total_pages, latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+async def scrape_categories(base_url, categories, concurrency, min_interval):
+    rate_limiter = HostRateLimiter(min_interval) if min_interval else None
+    scraper = HttpScraper(max_concurrency=concurrency, rate_limiter=rate_limiter)
+    stats = [{} for _ in range(categories)]
+    async with scraper.client() as client:
+        frames = await asyncio.gather(*(
+            scraper.scrape_category(client, f"{base_url}/cbo/category-{i}/", stats[i])
+            for i in range(categories)
+        ))
+    return frames, stats
+
+
+def bench(base_url, categories, pages, concurrency, min_interval):
+    start = time.perf_counter()
+    frames, stats = asyncio.run(scrape_categories(base_url, categories, concurrency, min_interval))
+    elapsed = time.perf_counter() - start
+    scraped = sum(s["pages"] for s in stats)
+    assert scraped == categories * pages, (scraped, categories * pages)
+    assert all(len(df) == 20 for df in frames), [len(df) for df in frames]  # 20 sách / trang, trùng tên giữa các trang
+    print(f"concurrency={concurrency:>2}: {scraped} trang trong {elapsed:.2f}s ({scraped / elapsed:,.1f} trang/s)")
+
+
+def check_fallback(base_url):
+    scraper = HttpScraper()
+    try:
+        scraper.scrape_all_pages(f"{base_url}/nojs/cbo/category/")
+    except NeedsBrowser:
+        print("Trang không có data-flatsome-relay -> NeedsBrowser (chuyển sang Selenium)")
+        return
+    raise AssertionError("Trang không có relay phải chuyển sang Selenium")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=12, help="số trang mỗi danh mục")
+    parser.add_argument("--latency-ms", type=float, default=50, help="độ trễ giả lập mỗi request")
+    parser.add_argument("--min-interval", type=float, default=0.0, help="giãn cách theo host (giây)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.pages, args.latency_ms / 1000)
+    try:
+        check_fallback(base_url)
+        for concurrency in (1, 4, 8, 16):
+            bench(base_url, args.categories, args.pages, concurrency, args.min_interval)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Cache câu trả lời cho các câu hỏi lặp lại.
+
+2 tầng:
+  - exact: khóa = câu hỏi đã chuẩn hóa (bỏ dấu, chữ thường, bỏ ký tự thừa)
+  - semantic (tùy chọn): dùng lại câu trả lời nếu embedding câu hỏi mới có
+    cosine >= semantic_threshold với 1 câu hỏi đã cache
+
+Giới hạn số entry (LRU) và thời gian sống (TTL). Khi dữ liệu sách thay đổi thì
+gọi invalidate() để xóa toàn bộ; generation dùng để bỏ qua kết quả của các
+request đã bắt đầu trước lúc xóa.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class AnswerCache:
+    """
+    Args:
+        max_entries: số câu trả lời tối đa
+        ttl_seconds: thời gian sống của 1 câu trả lời (None = không hết hạn)
+        semantic_threshold: ngưỡng cosine của tầng semantic (None = tắt)
+    """
+    def __init__(self, max_entries=500, ttl_seconds=3600, semantic_threshold=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+
+        self._data = OrderedDict()  # khóa -> [result, vector, created_at], cũ nhất ở đầu
+        self._lock = threading.Lock()
+        self._matrix = None         # (keys, ma trận vector) cho tầng semantic, tạo lại khi cần
+        self.generation = 0
+
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+        self.evicted = 0
+        self.invalidations = 0
+
+    @property
+    def semantic(self):
+        return self.semantic_threshold is not None
+
+    # --- NỘI BỘ ---
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _drop(self, key):
+        del self._data[key]
+        self._matrix = None
+
+    def _exact(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry[2], now):
+            self._drop(key)
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _nearest(self, vector, now):
+        """Entry có cosine lớn nhất với vector (nếu vượt ngưỡng)"""
+        if self._matrix is None:
+            keys = [key for key, entry in self._data.items() if entry[1] is not None]
+            if not keys:
+                return None
+            self._matrix = (keys, np.stack([self._data[key][1] for key in keys]))
+        keys, matrix = self._matrix
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+        return self._exact(keys[best], now)
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # --- API ---
+    def get(self, key, vector=None):
+        """
+        Tra cache theo khóa, sau đó theo vector (nếu bật tầng semantic).
+
+        Returns:
+            dict | None: bản sao kết quả đã cache
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._exact(key, now)
+            if entry is not None:
+                self.hits_exact += 1
+            elif self.semantic and vector is not None:
+                entry = self._nearest(self._unit(vector), now)
+                if entry is not None:
+                    self.hits_semantic += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            return copy.deepcopy(entry[0])
+
+    def put(self, key, result, vector=None, generation=None):
+        """
+        Lưu kết quả. Bỏ qua nếu cache đã bị invalidate sau khi request bắt đầu
+        (generation khác hiện tại).
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            unit = self._unit(vector) if self.semantic and vector is not None else None
+            self._data[key] = [copy.deepcopy(result), unit, time.monotonic()]
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evicted += 1
+            self._matrix = None
+
+    def invalidate(self):
+        """Xóa toàn bộ cache (dữ liệu sách đã thay đổi)"""
+        with self._lock:
+            self._data.clear()
+            self._matrix = None
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            hits = self.hits_exact + self.hits_semantic
+            total = hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "semantic_threshold": self.semantic_threshold,
+                "hits_exact": self.hits_exact,
+                "hits_semantic": self.hits_semantic,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "evicted": self.evicted,
+                "invalidations": self.invalidations,
+            }
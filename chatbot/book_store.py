@@ -0,0 +1,220 @@
+"""
+Kho sách dạng cột trong RAM cho API duyệt / tìm sách (không qua chatbot).
+
+Build 1 lần từ frame của CorpusCache (cùng các CSV mà CSV_DATA_BOOK ghi),
+build lại toàn bộ rồi thay tham chiếu khi dữ liệu đổi (request đang chạy vẫn
+dùng bản cũ, không bao giờ thấy kho dở dang).
+
+Sách được sắp xếp theo (tên chuẩn hóa, content_hash):
+  - tìm theo tiền tố tên: 2 lần bisect
+  - lọc thể loại / danh mục: mảng vị trí đã sắp xếp, giao với khoảng tiền tố
+    bằng searchsorted
+  - phân trang bằng cursor = khóa sắp xếp của sách cuối trang trước, nên vẫn
+    đúng khi kho được build lại giữa 2 trang. Cursor kèm dấu của bộ lọc, dùng
+    cursor cho truy vấn khác (đổi thể loại / danh mục / tiền tố) bị từ chối
+  - JSON của từng sách được tạo sẵn lúc build, 1 trang chỉ là nối chuỗi
+"""
+import base64
+import bisect
+import hashlib
+import json
+import os
+from collections import defaultdict
+
+import numpy as np
+
+
+COLUMNS = ("title", "genre", "url", "img_path", "category", "views_count", "downloads_count")
+TEXT_COLUMNS = ("title", "genre", "url", "img_path")
+
+
+def category_key(category):
+    """'adventure-horror/detective.csv' -> 'adventure-horror/detective'"""
+    return os.path.splitext(str(category).replace(os.sep, "/"))[0]
+
+
+def query_tag(genre_key, category, prefix):
+    """Dấu của bộ lọc (đã chuẩn hóa) để gắn vào cursor"""
+    raw = json.dumps([genre_key or "", category or "", prefix or ""], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_cursor(sort_key, tag):
+    raw = json.dumps([*sort_key, tag], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor, tag):
+    """
+    Cursor -> khóa sắp xếp. ValueError nếu cursor không hợp lệ hoặc được tạo
+    cho truy vấn khác (tag khác)
+    """
+    try:
+        title, content_hash, cursor_tag = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError(f"Cursor không hợp lệ: {cursor}")
+    if cursor_tag != tag:
+        raise ValueError(f"Cursor không thuộc truy vấn này: {cursor}")
+    return str(title), str(content_hash)
+
+
+class BookStore:
+    """
+    Args:
+        df: frame đã chuẩn hóa (CorpusCache.load())
+        normalize: hàm chuẩn hóa text (ChatbotEngine.normalize_text)
+    """
+    def __init__(self, df, normalize):
+        self.normalize = normalize
+        order = np.lexsort((df["content_hash"].to_numpy(), df["title_normalized"].to_numpy()))
+        df = df.iloc[order].reset_index(drop=True)
+
+        self.titles = df["title_normalized"].tolist()   # đã sắp xếp -> bisect
+        self.hashes = df["content_hash"].tolist()
+        self.columns = {col: df[col].to_numpy() for col in COLUMNS}
+
+        genres = defaultdict(list)
+        categories = defaultdict(list)
+        self.genre_names = {}
+        # Khóa chuẩn hóa -> các giá trị gốc trong metadata (dùng cho filter của Chroma)
+        self.genre_values = defaultdict(set)
+        self.category_values = defaultdict(set)
+        for i, (genre, category) in enumerate(zip(df["genre"].tolist(), df["category"].tolist())):
+            key = normalize(genre)
+            if key and genre != "Unknown":
+                self.genre_names.setdefault(key, genre)
+                self.genre_values[key].add(genre)
+                genres[key].append(i)
+            # File và các thư mục cha đều lọc được: "adventure-horror" gồm mọi file trong đó
+            parts = category_key(category).split("/")
+            for depth in range(1, len(parts) + 1):
+                categories["/".join(parts[:depth])].append(i)
+                self.category_values["/".join(parts[:depth])].add(category)
+
+        self.genres = {key: np.array(ids, dtype=np.int64) for key, ids in genres.items()}
+        self.categories = {key: np.array(ids, dtype=np.int64) for key, ids in categories.items()}
+        self.rows_json = [json.dumps(book, ensure_ascii=False) for book in self.books(range(len(self)))]
+
+    def __len__(self):
+        return len(self.titles)
+
+    # --- TRUY VẤN ---
+    def _prefix_range(self, prefix):
+        if not prefix:
+            return 0, len(self.titles)
+        lo = bisect.bisect_left(self.titles, prefix)
+        hi = bisect.bisect_left(self.titles, prefix + "\U0010ffff", lo)
+        return lo, hi
+
+    def metadata_filter(self, genre_key=None, category=None):
+        """
+        Filter "where" của Chroma cho thể loại (khóa chuẩn hóa) / danh mục.
+        KeyError nếu không tồn tại, None nếu không lọc.
+        """
+        clauses = []
+        if genre_key:
+            if genre_key not in self.genre_values:
+                raise KeyError(genre_key)
+            clauses.append(("genre", sorted(self.genre_values[genre_key])))
+        if category:
+            key = category_key(category).strip("/")
+            if key not in self.category_values:
+                raise KeyError(category)
+            clauses.append(("category", sorted(self.category_values[key])))
+        where = [{field: values[0]} if len(values) == 1 else {field: {"$in": values}}
+                 for field, values in clauses]
+        if not where:
+            return None
+        return where[0] if len(where) == 1 else {"$and": where}
+
+    def _filtered(self, genre, category):
+        """Mảng vị trí (tăng dần) thỏa bộ lọc, None = không lọc. KeyError nếu không tồn tại"""
+        arrays = []
+        if genre:
+            arrays.append(self.genres[self.normalize(genre)])
+        if category:
+            arrays.append(self.categories[category_key(category).strip("/")])
+        if not arrays:
+            return None
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.intersect1d(arrays[0], arrays[1], assume_unique=True)
+
+    def search(self, genre=None, category=None, prefix=None, limit=20, cursor=None):
+        """
+        Danh sách sách theo thứ tự tên, lọc theo thể loại / danh mục / tiền tố tên.
+
+        Returns:
+            dict: {"books", "total", "next_cursor"}
+
+        Raises:
+            KeyError: thể loại / danh mục không tồn tại
+            ValueError: cursor không hợp lệ
+        """
+        page, total, next_cursor = self._page(genre, category, prefix, limit, cursor)
+        return {"books": self.books(page), "total": total, "next_cursor": next_cursor}
+
+    def search_json(self, genre=None, category=None, prefix=None, limit=20, cursor=None):
+        """Giống search() nhưng trả về chuỗi JSON, ghép từ JSON tạo sẵn của từng sách"""
+        page, total, next_cursor = self._page(genre, category, prefix, limit, cursor)
+        books = ",".join([self.rows_json[i] for i in page])
+        return f'{{"books":[{books}],"total":{total},"next_cursor":{json.dumps(next_cursor)}}}'
+
+    def _page(self, genre, category, prefix, limit, cursor):
+        """Vị trí các sách của trang, tổng số sách thỏa bộ lọc, cursor trang sau"""
+        prefix = self.normalize(prefix) if prefix else ""
+        tag = query_tag(self.normalize(genre) if genre else "",
+                        category_key(category).strip("/") if category else "", prefix)
+        lo, hi = self._prefix_range(prefix)
+        start = lo
+        if cursor:
+            title, content_hash = decode_cursor(cursor, tag)
+            # Vị trí ngay sau sách cuối trang trước (so sánh khóa (tên, hash))
+            pos = bisect.bisect_right(self.titles, title, lo, hi)
+            first = bisect.bisect_left(self.titles, title, lo, pos)
+            pos = first + bisect.bisect_right(self.hashes[first:pos], content_hash)
+            start = max(lo, pos)
+
+        ids = self._filtered(genre, category)
+        if ids is None:
+            total = hi - lo
+            page = np.arange(start, min(hi, start + limit))
+            has_more = start + limit < hi
+        else:
+            a, b = np.searchsorted(ids, [lo, hi])
+            total = int(b - a)
+            begin = max(int(np.searchsorted(ids, start)), int(a))
+            page = ids[begin:min(b, begin + limit)]
+            has_more = begin + limit < b
+
+        next_cursor = None
+        if has_more:
+            last = int(page[-1])
+            next_cursor = encode_cursor((self.titles[last], self.hashes[last]), tag)
+        return page.tolist(), total, next_cursor
+
+    def books(self, positions):
+        books = []
+        columns = self.columns
+        for i in positions:
+            book = {col: columns[col][i] for col in COLUMNS}
+            for col in TEXT_COLUMNS:
+                if not isinstance(book[col], str):
+                    book[col] = str(book[col])
+            book["views_count"] = int(book["views_count"])
+            book["downloads_count"] = int(book["downloads_count"])
+            book["category"] = category_key(book["category"])
+            books.append(book)
+        return books
+
+    def facets(self):
+        """Số sách theo thể loại và theo danh mục"""
+        return {
+            "genres": sorted(
+                ({"genre": self.genre_names[key], "count": len(ids)} for key, ids in self.genres.items()),
+                key=lambda item: -item["count"],
+            ),
+            "categories": [
+                {"category": key, "count": len(self.categories[key])} for key in sorted(self.categories)
+            ],
+        }
@@ -0,0 +1,175 @@
+"""
+Build Chroma index theo lô, embed song song bằng nhiều process (CPU).
+
+Mỗi worker giữ 1 bản model riêng với số thread cố định; lô nào embed xong
+được ghi ngay vào Chroma. Vector đã có trong embedding cache không gửi sang
+worker. Diff với DB dùng chung chroma_sync.sync_documents với update_chroma_db.
+Có thể chạy lại khi bị dừng giữa chừng: document đã có trong DB được bỏ qua.
+
+Chạy từ thư mục gốc dự án:
+    uv run python -m chatbot.build_index --workers 4 --threads 2 --batch-size 128
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from chatbot.chatbot import ChatbotEngine, EMBEDDING_MODEL
+from chatbot.chroma_sync import sync_documents
+from chatbot.embedding_cache import CachedEmbeddings
+from chatbot.ingest import frame_to_documents
+
+
+# Model của từng worker process
+_worker_model = None
+
+
+def _create_model(model_name, batch_size):
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True, "batch_size": batch_size},
+    )
+
+
+def _init_worker(model_name, threads, batch_size):
+    """Khởi tạo worker: cố định số thread rồi load model 1 lần"""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    global _worker_model
+    _worker_model = _create_model(model_name, batch_size)
+
+
+def _embed_batch(texts):
+    return np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+
+
+class Progress:
+    """In tiến độ và tốc độ (docs/s)"""
+    def __init__(self):
+        self.done = 0
+        self.start = time.perf_counter()
+
+    def update(self, count):
+        self.done += count
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        print(f">> {self.done} document ({rate:.1f} docs/s, {elapsed:.1f}s)")
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        return {"documents": self.done, "seconds": round(elapsed, 2), "docs_per_sec": round(rate, 1)}
+
+
+def embed_serial(cache, progress):
+    """embed_batches cho sync_documents: embed từng lô ngay trong process hiện tại"""
+    def embed_batches(batches):
+        for texts in batches:
+            vectors = cache.embed_documents(texts)
+            progress.update(len(texts))
+            yield vectors
+    return embed_batches
+
+
+def embed_parallel(pool, cache, progress, max_pending):
+    """
+    embed_batches cho sync_documents: gửi các lô chưa có trong cache sang pool,
+    trả vector theo đúng thứ tự lô. Tối đa max_pending lô đang chờ để không giữ
+    quá nhiều vector trong RAM.
+    """
+    def finish(pending):
+        keys, results, missing, future = pending.popleft()
+        if future is not None:
+            results = cache.store(keys, results, missing, future.result())
+        progress.update(len(keys))
+        return results
+
+    def embed_batches(batches):
+        pending = deque()
+        for texts in batches:
+            keys, results, missing = cache.lookup(texts)
+            future = pool.submit(_embed_batch, list(missing.values())) if missing else None
+            pending.append((keys, results, missing, future))
+            if len(pending) >= max_pending:
+                yield finish(pending)
+        while pending:
+            yield finish(pending)
+
+    return embed_batches
+
+
+def build_index(engine, batch_size=128, workers=1, threads=1):
+    """
+    Build / hoàn thiện Chroma index cho toàn bộ corpus.
+    Diff với DB (xóa / sửa metadata / thêm) do chroma_sync.sync_documents làm,
+    ở đây chỉ thay cách embed document mới.
+
+    Args:
+        engine: ChatbotEngine (chỉ dùng cấu hình thư mục, không cần init)
+        batch_size: số document mỗi lô
+        workers: số process embed (<= 1: embed ngay trong process hiện tại)
+        threads: số thread torch mỗi worker
+
+    Returns:
+        dict: số document đã embed, thời gian, docs/s và kết quả đồng bộ
+    """
+    fingerprint = engine.corpus_cache.fingerprint()
+    df = engine.corpus_cache.load()
+    docs = frame_to_documents(df)
+    ids = df["content_hash"].tolist()
+
+    base = _create_model(EMBEDDING_MODEL, batch_size) if workers <= 1 else None
+    cache = CachedEmbeddings(base, EMBEDDING_MODEL, engine.embedding_cache_dir)
+    db = Chroma(persist_directory=engine.chroma_dir, embedding_function=cache)
+
+    print(f">> Đồng bộ {len(docs)} document, "
+          f"batch_size={batch_size}, workers={workers}, threads={threads}")
+    progress = Progress()
+
+    if workers <= 1:
+        result = sync_documents(db, docs, ids, batch_size=batch_size,
+                                embed_batches=embed_serial(cache, progress))
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(EMBEDDING_MODEL, threads, batch_size),
+        )
+        with pool:
+            result = sync_documents(db, docs, ids, batch_size=batch_size,
+                                    embed_batches=embed_parallel(pool, cache, progress, workers * 2))
+
+    engine._mark_chroma_synced(fingerprint)
+    summary = {**progress.summary(), **result}
+    cache_stats = cache.stats()
+    print(f">> Build xong: {summary}, embedding cache {cache_stats['hits']} hit / {cache_stats['misses']} miss")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build Chroma index song song trên CPU")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--threads", type=int, default=2, help="Số thread torch mỗi worker")
+    args = parser.parse_args()
+
+    engine = ChatbotEngine()
+    build_index(engine, batch_size=args.batch_size, workers=args.workers, threads=args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Danh mục sách trong RAM để trả lời các câu hỏi tra cứu không cần LLM.
+
+Build từ cùng list Document với Chroma / LexicalIndex, gồm:
+  - tên sách chuẩn hóa -> vị trí
+  - thứ tự sách theo lượt xem / lượt tải, toàn bộ và theo từng thể loại
+    (sắp xếp sẵn lúc build: top N là 1 lần cắt mảng, lọc "ít nhất X lượt"
+    là 1 lần tìm nhị phân)
+"""
+import re
+from collections import defaultdict
+
+import numpy as np
+
+from chatbot.hybrid_retriever import tokenize
+from chatbot.ingest import parse_count
+
+
+SORT_FIELDS = ("views", "downloads")
+
+# Tên gọi khác của thể loại, key = thể loại đã chuẩn hóa. Tên thể loại chỉ gồm số
+# hoặc 1 từ ngắn ("18+" chuẩn hóa thành "18", "Hot") không tự dò trong câu hỏi,
+# nếu không "top 18 cuốn" hay "học sinh 18 tuổi" sẽ thành thể loại 18+
+GENRE_ALIASES = {
+    "18": ("18+", "18 cộng", "người lớn"),
+}
+MIN_SINGLE_TOKEN_LENGTH = 4
+# "18+" -> "18 cộng" trước khi chuẩn hóa (normalize_text bỏ dấu "+")
+PLUS_PATTERN = re.compile(r"(?<=\d)\s*\+")
+
+
+def _detectable(tokens):
+    """Tên thể loại đủ rõ để dò trong câu hỏi: không chỉ gồm số, không phải 1 từ ngắn"""
+    if not tokens or all(token.isdigit() for token in tokens):
+        return False
+    return len(tokens) > 1 or len(tokens[0]) >= MIN_SINGLE_TOKEN_LENGTH
+
+
+def doc_count(doc, field):
+    """Lượt xem / tải của 1 document (metadata cũ chưa có *_count thì parse text)"""
+    value = doc.metadata.get(f"{field}_count")
+    return value if value is not None else parse_count(doc.metadata.get(field, 0))
+
+
+class BookCatalog:
+    """
+    Args:
+        docs: list Document (metadata có title, title_normalized, genre, views, downloads)
+        normalize: hàm chuẩn hóa text (ChatbotEngine.normalize_text)
+    """
+    def __init__(self, docs, normalize):
+        self.docs = docs
+        self.normalize = normalize
+
+        self.counts = {
+            field: np.array([doc_count(doc, field) for doc in docs], dtype=np.int64)
+            for field in SORT_FIELDS
+        }
+
+        self.by_title = defaultdict(list)
+        genre_ids = defaultdict(list)
+        self.genres = {}  # thể loại chuẩn hóa -> tên hiển thị
+        self.genre_keys = []  # vị trí -> thể loại chuẩn hóa
+        for i, doc in enumerate(docs):
+            title = doc.metadata.get("title_normalized") or normalize(doc.metadata.get("title", ""))
+            self.by_title[title].append(i)
+            genre = doc.metadata.get("genre", "")
+            key = normalize(genre)
+            self.genre_keys.append(key)
+            if key and genre != "Unknown":
+                self.genres.setdefault(key, genre)
+                genre_ids[key].append(i)
+
+        # field -> thể loại (None = tất cả) -> vị trí sắp xếp giảm dần, cùng giá trị giữ thứ tự CSV
+        self.order = {}
+        for field, counts in self.counts.items():
+            self.order[field] = {None: np.argsort(-counts, kind="stable")}
+            for key, ids in genre_ids.items():
+                ids = np.array(ids, dtype=np.int64)
+                self.order[field][key] = ids[np.argsort(-counts[ids], kind="stable")]
+        # Lượt xem / tải theo đúng thứ tự trên, đổi dấu (tăng dần) để searchsorted
+        self._sorted_neg = {
+            field: {key: -self.counts[field][ids] for key, ids in orders.items()}
+            for field, orders in self.order.items()
+        }
+        # Dò thể loại trong câu hỏi: tên thể loại đủ rõ + tên gọi khác trong GENRE_ALIASES
+        self._genre_patterns = []
+        for key in self.genres:
+            names = [key] + [self._normalize_question(alias) for alias in GENRE_ALIASES.get(key, ())]
+            for name in dict.fromkeys(names):
+                tokens = tokenize(name)
+                if name != key or _detectable(tokens):
+                    self._genre_patterns.append((f" {' '.join(tokens)} ", len(tokens), key))
+
+    def __len__(self):
+        return len(self.docs)
+
+    # --- TRA CỨU ---
+    def find_title(self, normalized_title):
+        """Vị trí các sách có đúng tên (đã chuẩn hóa)"""
+        return list(self.by_title.get(normalized_title, []))
+
+    def _normalize_question(self, text):
+        return self.normalize(PLUS_PATTERN.sub(" cộng", text))
+
+    def detect_genre(self, question):
+        """
+        Thể loại (chuẩn hóa) nhắc tới trong câu hỏi (chưa chuẩn hóa), None nếu không có.
+        Nhiều thể loại cùng khớp: tên nhiều từ hơn trước ("kinh te - tai chinh" trước
+        "kinh te"), bằng nhau thì lấy thể loại xuất hiện trước trong câu hỏi.
+        """
+        padded = f" {' '.join(tokenize(self._normalize_question(question)))} "
+        best = None
+        for pattern, length, key in self._genre_patterns:
+            position = padded.find(pattern)
+            if position >= 0 and (best is None or (-length, position) < best[0]):
+                best = ((-length, position), key)
+        return best[1] if best else None
+
+    def query_genre(self, question, genre=None):
+        """
+        Thể loại (chuẩn hóa) áp cho câu hỏi. Thể loại client truyền vào luôn thắng
+        thể loại nhắc tới trong câu hỏi (cùng 1 luật cho router và filter của chain).
+        """
+        return genre or self.detect_genre(question)
+
+    def in_genre(self, ids, genre):
+        """Giữ các vị trí thuộc thể loại (chuẩn hóa), genre None = giữ tất cả"""
+        if genre is None:
+            return list(ids)
+        return [i for i in ids if self.genre_keys[i] == genre]
+
+    def genre_name(self, key):
+        return self.genres.get(key, key)
+
+    def top(self, field="views", limit=5, genre=None, min_count=None, offset=0):
+        """
+        Vị trí sách nhiều lượt xem / tải nhất.
+
+        Args:
+            field: "views" | "downloads"
+            limit: số sách
+            genre: thể loại đã chuẩn hóa (None = tất cả)
+            min_count: chỉ lấy sách có ít nhất min_count lượt
+            offset: bỏ qua offset sách đầu (phân trang)
+        """
+        ids = self.order[field].get(genre)
+        if ids is None:
+            return []
+        end = len(ids)
+        if min_count is not None:
+            end = int(np.searchsorted(self._sorted_neg[field][genre], -min_count, side="right"))
+        return ids[offset:min(end, offset + limit)].tolist()
+
+    def count(self, field, i):
+        return int(self.counts[field][i])
+
+    def books(self, ids, with_counts=False):
+        """Vị trí -> danh sách sách (cùng dạng "books" của AnswerResponse)"""
+        books = []
+        for i in ids:
+            metadata = self.docs[i].metadata
+            book = {
+                "title": metadata["title"],
+                "genre": metadata["genre"],
+                "url": metadata["url"],
+                "img_path": metadata["img_path"],
+            }
+            if with_counts:
+                book["views_count"] = self.count("views", i)
+                book["downloads_count"] = self.count("downloads", i)
+            books.append(book)
+        return books
@@ -4,19 +4,26 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.prompts import PromptTemplate
 from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferWindowMemory
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+from langchain_core.messages import HumanMessage, AIMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 
 from dotenv import load_dotenv
 import os
-import glob
-import pandas as pd
-import uuid
-from langchain.schema import Document
 import re
 import unicodedata
-import hashlib
+
+from chatbot.ingest import frame_to_documents
+from chatbot.corpus_cache import CorpusCache, CatalogCorpus
+from chatbot.chroma_sync import sync_documents
+from chatbot.embedding_cache import CachedEmbeddings
+from chatbot.session_store import MemorySessionBackend
+from chatbot.answer_cache import AnswerCache
+from chatbot.hybrid_retriever import HybridRetriever, LexicalIndex
+from chatbot.catalog import BookCatalog
+from chatbot.book_store import BookStore
+from chatbot.intent_router import IntentRouter
 
 
 load_dotenv(dotenv_path="url.env")
@@ -26,6 +33,10 @@ load_dotenv(dotenv_path="api.env")
 MODEL_PATH = os.getenv("MODEL_GPT4ALL_PATH")
 DATA_DIR = "data"
 CHROMA_DIR = "chroma_db"
+CACHE_DIR = "cache"
+EMBEDDING_MODEL = "AITeamVN/Vietnamese_Embedding"
+# File trong chroma_dir ghi dấu vân tay CSV lúc DB được đồng bộ lần cuối
+SYNC_MARKER = "corpus_fingerprint"
 
 class MyCustomHandler(BaseCallbackHandler):
     def on_llm_new_token(self, token: str, **kwargs) -> None:
@@ -34,19 +45,49 @@ class MyCustomHandler(BaseCallbackHandler):
 class ChatbotEngine:
     """
     ChatbotEngine có khả năng:
-      - Load tất cả CSV làm knowledge base
+      - Load tất cả CSV (hoặc catalog SQLite) làm knowledge base
       - Khởi tạo Chroma + GPT4All
-      - Quản lý nhiều session (mỗi session có memory riêng)
+      - Quản lý nhiều session: 1 chain dùng chung, mỗi session chỉ giữ
+        lịch sử window_size lượt gần nhất (trong RAM, SQLite hoặc Redis)
     """
-    def __init__(self, data_dir=DATA_DIR, model_path=MODEL_PATH, chroma_dir=CHROMA_DIR, window_size=5):
+    def __init__(self, data_dir=DATA_DIR, model_path=MODEL_PATH, chroma_dir=CHROMA_DIR, window_size=5,
+                 cache_dir=CACHE_DIR, max_sessions=1000, session_ttl=3600, session_backend=None,
+                 answer_cache_size=500, answer_cache_ttl=3600, answer_cache_threshold=None,
+                 query_cache_bytes=32 * 1024 * 1024, fast_path=True, catalog_db=None):
         self.data_dir = data_dir
         self.model_path = model_path
         self.chroma_dir = chroma_dir
         self.window_size = window_size
+        self.cache_dir = cache_dir
+        # catalog_db (scrape.book_db.BookDB): đọc corpus từ SQLite thay vì quét CSV trong data_dir
+        self.catalog_db = catalog_db
+        if catalog_db is not None:
+            self.corpus_cache = CatalogCorpus(catalog_db, os.path.join(cache_dir, "corpus_catalog.pkl"))
+        else:
+            self.corpus_cache = CorpusCache(data_dir, os.path.join(cache_dir, "corpus.pkl"))
+        self.embedding_cache_dir = os.path.join(cache_dir, "embeddings")
+        self.query_cache_bytes = query_cache_bytes
 
         self.local_llm = None
+        self.embeddings = None
+        self.db = None
         self.retriever = None
-        self.sessions = {}  # Lưu {session_key: ConversationalRetrievalChain}
+        self.lexical_index = None  # BM25 trên tên sách / thể loại, build cùng lúc đồng bộ Chroma
+        self.catalog = None        # danh mục sách cho câu hỏi tra cứu (không cần LLM)
+        self.book_store = None     # kho sách dạng cột cho API /books
+        # Câu hỏi tra cứu (theo tên, thể loại, xem / tải nhiều nhất) trả lời thẳng từ catalog
+        self.intent_router = IntentRouter(None) if fast_path else None
+        self.chain = None  # ConversationalRetrievalChain dùng chung
+        # Kho session {user_id: [(câu hỏi, câu trả lời)]}, mặc định trong RAM (LRU + TTL).
+        # Chạy nhiều worker thì truyền SQLiteSessionBackend / RedisSessionBackend
+        self.sessions = session_backend or MemorySessionBackend(
+            window_size, max_entries=max_sessions, ttl_seconds=session_ttl
+        )
+        # Cache câu trả lời cho câu hỏi mở đầu hội thoại (không phụ thuộc lịch sử)
+        self.answer_cache = AnswerCache(
+            max_entries=answer_cache_size, ttl_seconds=answer_cache_ttl,
+            semantic_threshold=answer_cache_threshold,
+        )
         
         
     @staticmethod
@@ -82,124 +123,136 @@ class ChatbotEngine:
 
     # --- LOAD CSV ---
     def load_all_csv(self):
-        """Đọc tất cả CSV trong data_dir -> list Document"""
-        documents = []
-        seen_hashes = set()  # Lưu dấu vết nội dung đã thêm
-        
-        for file in glob.glob(f"{self.data_dir}/**/*.csv", recursive=True):
-            df = pd.read_csv(file)
-
-            for _, row in df.iterrows():
-                # Content gốc (có dấu)
-                original_content = f"{row['title']} {row['genre']}"
-                
-                # content chuẩn hóa (chữ thường)
-                lower_content = self.lower_text(original_content)
-                
-                # Content chuẩn hóa (không dấu) để tăng khả năng tìm kiếm
-                normalized_content = self.normalize_text(original_content)
-                
-                # Kết hợp cả 2 để search được cả có dấu và không dấu
-                combined_content = f"{original_content} {lower_content} {normalized_content}"
-                
-                # --- Tạo hash từ combined_content ---
-                content_hash = hashlib.md5(combined_content.encode("utf-8")).hexdigest()
-
-                # --- Bỏ qua nếu trùng ---
-                if content_hash in seen_hashes:
-                    continue
-                seen_hashes.add(content_hash)
-                
-                metadata = {
-                    "title": row.get("title", "Unknown"),
-                    "title_lower": self.lower_text(row.get("title", "Unknown")),
-                    "title_normalized": self.normalize_text(row.get("title", "Unknown")),
-                    "genre": row.get("genre", "Unknown"),
-                    "url": row.get("url", "Unknown"),
-                    "img_path": row.get("img_path", "Unknown"),
-                    "views": row.get("views", 0),
-                    "downloads": row.get("downloads", 0),
-                    "category": os.path.relpath(file, self.data_dir)
-                }
-                
-                documents.append(Document(page_content=combined_content, metadata=metadata))
-        return documents
-    
-    def update_chroma_db(self):
         """
-        Cập nhật Chroma DB từ các file CSV trong data_dir.
-        - Chỉ thêm document mới chưa tồn tại trong DB.
-        - Không xóa dữ liệu cũ.
+        Đọc tất cả CSV trong data_dir -> list Document
+
+        Toàn bộ CSV được gộp thành 1 DataFrame và xử lý theo cột
+        (chuẩn hóa, hash, loại trùng) thay vì lặp từng dòng.
+        Frame của từng CSV được cache, chỉ file thay đổi mới phải đọc lại.
         """
-        print("Đang đọc dữ liệu từ CSV...")
-        docs, ids = self.load_all_csv()
+        df = self.corpus_cache.load()
+        return frame_to_documents(df)
 
-        print(f"Tổng số tài liệu quét được: {len(docs)}")
+    def _sync_marker_path(self):
+        return os.path.join(self.chroma_dir, SYNC_MARKER)
 
-        # Kết nối hoặc khởi tạo DB
-        db = Chroma(
-            persist_directory=self.chroma_dir,
-            embedding_function=self.embeddings
-        )
+    def is_chroma_synced(self):
+        """Chroma DB đã được đồng bộ với CSV hiện tại chưa (chỉ cần stat file)"""
+        marker = self._sync_marker_path()
+        if not os.path.exists(marker):
+            return False
+        with open(marker, encoding="utf-8") as f:
+            return f.read().strip() == self.corpus_cache.fingerprint()
 
-        # Lấy danh sách ID đã có trong DB
-        existing_data = db.get()
-        existing_ids = set(existing_data["ids"])
-        print(f"DB hiện có {len(existing_ids)} tài liệu.")
-
-        # So sánh và lọc ra những tài liệu mới
-        new_docs, new_ids = [], []
-        for doc, id_ in zip(docs, ids):
-            if id_ not in existing_ids:
-                new_docs.append(doc)
-                new_ids.append(id_)
-
-        # Nếu có dữ liệu mới thì thêm vào DB
-        if new_docs:
-            print(f"Thêm {len(new_docs)} tài liệu mới vào DB...")
-            db.add_documents(new_docs, ids=new_ids)
-            db.persist()
-            print("Cập nhật DB thành công!")
-        else:
-            print("Không có tài liệu mới để thêm. DB đã cập nhật.")
+    def _mark_chroma_synced(self, fingerprint):
+        """
+        Ghi dấu vân tay của corpus vừa đồng bộ.
+        fingerprint phải lấy TRƯỚC khi đọc corpus: CSV đổi trong lúc đang đồng bộ
+        thì marker giữ bản cũ, lần khởi động sau vẫn đồng bộ lại.
+        """
+        os.makedirs(self.chroma_dir, exist_ok=True)
+        with open(self._sync_marker_path(), "w", encoding="utf-8") as f:
+            f.write(fingerprint)
+    
+    def update_chroma_db(self, force=False):
+        """
+        Đồng bộ tăng dần Chroma DB với các file CSV trong data_dir.
+        - Bỏ qua hoàn toàn nếu CSV không đổi kể từ lần đồng bộ trước.
+        - Chỉ embed document mới, dòng chỉ đổi metadata được update tại chỗ.
+        - Xóa document không còn trong CSV.
+
+        Args:
+            force: đồng bộ kể cả khi dấu vân tay CSV không đổi
 
-        # Tạo retriever để dùng cho LLM
-        self.retriever = db.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 100}
+        Returns:
+            dict: số document added / updated / deleted / unchanged
+        """
+        if self.db is None:
+            raise RuntimeError("Engine chưa được khởi tạo. Gọi init_engine_base() trước.")
+
+        if not force and self.is_chroma_synced():
+            print("CSV không thay đổi, DB đã cập nhật.")
+            return {"added": 0, "updated": 0, "deleted": 0, "unchanged": self.db._collection.count()}
+
+        print("Đang đọc dữ liệu từ CSV...")
+        fingerprint = self.corpus_cache.fingerprint()
+        df = self.corpus_cache.load()
+        docs = frame_to_documents(df)
+        ids = df["content_hash"].tolist()
+        print(f"Tổng số tài liệu quét được: {len(docs)}")
+
+        result = sync_documents(self.db, docs, ids)
+        self._mark_chroma_synced(fingerprint)
+        if result["added"] or result["updated"] or result["deleted"] or self.lexical_index is None:
+            self._build_indexes(df, docs)
+        if result["added"] or result["updated"] or result["deleted"]:
+            self.answer_cache.invalidate()
+        print(
+            f"Đồng bộ xong: thêm {result['added']}, cập nhật {result['updated']}, "
+            f"xóa {result['deleted']}, giữ nguyên {result['unchanged']}"
         )
+        cache = self.embeddings.stats()
+        print(f"Embedding cache: {cache['hits']} hit, {cache['misses']} miss")
+        return result
 
-        return db
+    def _build_indexes(self, df, docs=None):
+        """
+        Build lại inverted index, catalog và kho sách từ frame corpus.
+        Bản mới được build xong hết rồi mới thay tham chiếu, retriever / router / API
+        đang chạy chuyển sang bản mới mà không bao giờ thấy bản dở dang.
+        """
+        if docs is None:
+            docs = frame_to_documents(df)
+        book_store = BookStore(df, self.normalize_text)
+        lexical_index = LexicalIndex(docs, self.normalize_text)
+        catalog = BookCatalog(docs, self.normalize_text)
+        self.book_store, self.lexical_index, self.catalog = book_store, lexical_index, catalog
+        if isinstance(self.retriever, HybridRetriever):
+            self.retriever.index = self.lexical_index
+        if self.intent_router is not None:
+            self.intent_router.catalog = self.catalog
+        print(f">> Lexical index, catalog, kho sách: {len(self.lexical_index)} document")
 
     def init_engine_base(self):
-        """Chỉ khởi tạo embeddings, vector DB và LLM (chưa tạo chain/memory)"""
-        print(">> Đang load dữ liệu CSV...")
-        docs = self.load_all_csv()
-
+        """Khởi tạo embeddings, vector DB, LLM và chain dùng chung (session tạo khi có câu hỏi)"""
         print(">> Đang tạo embeddings...")
-        embeddings = HuggingFaceEmbeddings(
-            model_name="AITeamVN/Vietnamese_Embedding",
-            encode_kwargs={"normalize_embeddings": True}
+        # Bọc model bằng cache: document trên đĩa (rebuild không phải embed lại),
+        # câu hỏi trong RAM (câu hỏi lặp lại không phải chạy model)
+        self.embeddings = CachedEmbeddings(
+            HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL,
+                encode_kwargs={"normalize_embeddings": True}
+            ),
+            model_name=EMBEDDING_MODEL,
+            cache_dir=self.embedding_cache_dir,
+            query_cache_bytes=self.query_cache_bytes,
         )
         
-        if not os.path.exists(self.chroma_dir):
-            db = Chroma.from_documents(docs, embeddings, persist_directory=self.chroma_dir)
+        db = Chroma(
+            persist_directory=self.chroma_dir,
+            embedding_function=self.embeddings
+        )
+        self.db = db
+
+        # DB mới hoặc CSV đã đổi -> đồng bộ tăng dần (chỉ đọc CSV khi cần)
+        if self.is_chroma_synced():
+            print(">> Chroma DB đã khớp với CSV, bỏ qua bước đọc CSV.")
         else:
-            db = Chroma(
-                persist_directory=self.chroma_dir,
-                embedding_function=embeddings
-            )
+            self.update_chroma_db(force=True)
         
         print(f"Số lượng embeddings hiện tại: {db._collection.count()}")
 
-        # Tạo retriever với search_kwargs để tăng số kết quả
-        self.retriever = db.as_retriever(
-            search_type="mmr",       # đa dạng két quả
-            search_kwargs={
-                "k": 5,  # Số lượng vừa phải
-                "fetch_k": 20,  # Fetch nhiều để có nhiều lựa chọn
-                "lambda_mult": 0.7  # Đa dạng hóa kết quả
-            }
+        if self.lexical_index is None:
+            self._build_indexes(self.corpus_cache.load())
+
+        # Retriever BM25 (tên sách, thể loại) + MMR, gộp bằng RRF.
+        # Câu hỏi chứa nguyên tên sách được trả lời từ index, không cần embedding
+        self.retriever = HybridRetriever(
+            vectorstore=db,
+            index=self.lexical_index,
+            k=5,               # Số lượng vừa phải
+            fetch_k=20,        # Fetch nhiều để có nhiều lựa chọn
+            lambda_mult=0.7,   # Đa dạng hóa kết quả
         )
 
         # print(">> Load LLM local GPT4All...")
@@ -213,11 +266,17 @@ class ChatbotEngine:
             temperature=0.3,
             google_api_key=os.getenv("GOOGLE_API_KEY"),
         )
+
+        # Chain retrieval + QA tạo 1 lần, dùng chung cho mọi session
+        self.chain = self._create_chain()
         print(">> Khởi tạo engine hoàn tất.")
 
     # --- SESSION MANAGEMENT ---
     def _create_chain(self):
-        """Tạo 1 chain mới (memory riêng)"""
+        """
+        Tạo chain retrieval + QA dùng chung cho mọi user (không có memory).
+        Lịch sử hội thoại của từng user được truyền vào lúc gọi qua "chat_history".
+        """
         
         #===================================================================================================================================================
         # Template cho việc trả lời dựa trên context và lịch sử chat
@@ -254,25 +313,15 @@ class ChatbotEngine:
         #     template=condense_template
         # )
         
-
-        # Sử dụng ConversationBufferWindowMemory với window_size
-        memory = ConversationBufferWindowMemory(
-            k=self.window_size,  # Giữ k cặp hội thoại gần nhất
-            memory_key="chat_history",
-            return_messages=True,
-            output_key="answer"
-        )
         return ConversationalRetrievalChain.from_llm(
             llm=self.local_llm,
             retriever=self.retriever,
-            memory=memory,
-            
             combine_docs_chain_kwargs={"prompt": prompt, },
             return_source_documents=True,
             verbose=True
         )
 
-    def ask(self, user_id: str, question: str):
+    def ask(self, user_id: str, question: str, genre: str = None, category: str = None):
         """
         Trả lời câu hỏi cho user_id cụ thể.
         Tự động tạo session mới nếu user_id chưa tồn tại.
@@ -280,30 +329,269 @@ class ChatbotEngine:
         Args:
             user_id: ID của user từ client
             question: Câu hỏi của user
+            genre: chỉ tìm trong thể loại này (None = dò từ câu hỏi)
+            category: chỉ tìm trong danh mục này (file CSV hoặc thư mục)
             
         Returns:
             dict: {"answer": str, "user_id": str, "is_new_session": bool}
         """
-        if not self.local_llm or not self.retriever:
+        if not self.chain:
             raise RuntimeError("Engine chưa được khởi tạo. Gọi init_engine_base() trước.")
 
-        # Kiểm tra xem user_id đã có session chưa
-        is_new_session = user_id not in self.sessions
-        
-        if is_new_session:
-            print(f">> Tạo session mới cho user: {user_id}")
-            self.sessions[user_id] = self._create_chain()
-        
-        # Lấy chain của user
-        chain = self.sessions[user_id]
+        where = self.search_filter(question, genre, category)
+
+        # Lịch sử của user (tự tạo session nếu chưa có)
+        history = self._get_history(user_id)
+
+        # Câu hỏi tra cứu danh mục: trả lời thẳng, không gọi LLM
+        routed = self._route(question, genre, category)
+        if routed:
+            self.sessions.append_turn(user_id, question, routed["answer"])
+            return {"answer": routed["answer"], "user_id": user_id, "books": routed["books"]}
+
+        # Câu hỏi mở đầu hội thoại: thử lấy câu trả lời từ cache
+        lookup = self._cache_lookup(question, genre, category) if not history else None
+        if lookup and lookup["cached"]:
+            cached = lookup["cached"]
+            self.sessions.append_turn(user_id, question, cached["answer"])
+            return {"answer": cached["answer"], "user_id": user_id, "books": cached["books"]}
         
-        # Thực hiện truy vấn
-        result = chain.invoke({"question": question})
+        # Thực hiện truy vấn với chain dùng chung, lịch sử truyền vào lúc gọi
+        result = self._chain_for(where).invoke({"question": question, "chat_history": history})
+        self.sessions.append_turn(user_id, question, result["answer"])
         
         # Lấy source documents
         docs = result.get('source_documents', [])
-    
-        # Format response chắc chắn đúng
+        books = self._format_books(docs)
+        if lookup:
+            self._cache_store(lookup, result["answer"], books)
+        
+        return {
+            "answer": result["answer"],
+            "user_id": user_id,
+            "books": books
+        }
+
+    def ask_stream(self, user_id: str, question: str, genre: str = None, category: str = None):
+        """
+        Giống ask() nhưng trả về từng phần khi đang sinh câu trả lời.
+        Các bước condense câu hỏi -> retrieve -> LLM được chạy tay bằng chính
+        các thành phần của chain dùng chung để stream token ra ngoài.
+        
+        Args:
+            user_id: ID của user từ client
+            question: Câu hỏi của user
+            genre, category: bộ lọc như ask()
+            
+        Yields:
+            dict: {"event": "books" | "token" | "done", "data": ...}
+              - books: danh sách sách ngay sau khi retrieve xong
+              - token: từng đoạn text của câu trả lời
+              - done: câu trả lời đầy đủ (giống kết quả ask())
+        """
+        if not self.chain:
+            raise RuntimeError("Engine chưa được khởi tạo. Gọi init_engine_base() trước.")
+
+        chain = self._chain_for(self.search_filter(question, genre, category))
+        history = self._get_history(user_id)
+        chat_history = _get_chat_history(history)
+
+        # Trả lời có sẵn (tra cứu danh mục hoặc cache) -> gửi cả câu trả lời trong 1 token
+        lookup = None
+        ready = self._route(question, genre, category)
+        if not ready and not history:
+            lookup = self._cache_lookup(question, genre, category)
+            ready = lookup["cached"]
+        if ready:
+            self.sessions.append_turn(user_id, question, ready["answer"])
+            yield {"event": "books", "data": {"user_id": user_id, "books": ready["books"]}}
+            yield {"event": "token", "data": ready["answer"]}
+            yield {"event": "done", "data": {"answer": ready["answer"], "user_id": user_id,
+                                             "books": ready["books"]}}
+            return
+
+        # Tạo câu hỏi độc lập từ lịch sử (giống ConversationalRetrievalChain)
+        new_question = question
+        if chat_history:
+            new_question = chain.question_generator.invoke(
+                {"question": question, "chat_history": chat_history}
+            )["text"]
+
+        docs = chain.retriever.invoke(new_question)
+        books = self._format_books(docs)
+        yield {"event": "books", "data": {"user_id": user_id, "books": books}}
+
+        combine_chain = chain.combine_docs_chain
+        inputs = combine_chain._get_inputs(docs, question=new_question, chat_history=chat_history)
+        prompt_text = combine_chain.llm_chain.prompt.format(**inputs)
+
+        tokens = []
+        for chunk in self.local_llm.stream(prompt_text):
+            token = chunk.content
+            if token:
+                tokens.append(token)
+                yield {"event": "token", "data": token}
+
+        answer = "".join(tokens)
+        self.sessions.append_turn(user_id, question, answer)
+        if lookup:
+            self._cache_store(lookup, answer, books)
+        yield {"event": "done", "data": {"answer": answer, "user_id": user_id, "books": books}}
+
+    def _get_history(self, user_id: str):
+        """Lấy lịch sử của user, tạo session mới nếu user_id chưa tồn tại"""
+        history, created = self.sessions.load(user_id)
+        if created:
+            print(f">> Tạo session mới cho user: {user_id}")
+        return history
+
+    def _route(self, question: str, genre: str = None, category: str = None):
+        """Câu trả lời từ catalog nếu là câu hỏi tra cứu, None nếu cần chạy chain"""
+        # Catalog không chia theo danh mục -> câu hỏi có lọc danh mục luôn chạy chain
+        if self.intent_router is None or category:
+            return None
+        return self.intent_router.route(question, genre=self.normalize_text(genre) if genre else None)
+
+    def search_filter(self, question: str, genre: str = None, category: str = None):
+        """
+        Filter "where" của Chroma cho câu hỏi: thể loại / danh mục truyền vào,
+        nếu không truyền thể loại thì dò thể loại nhắc tới trong câu hỏi.
+
+        Returns:
+            dict | None: None nếu không lọc
+
+        Raises:
+            KeyError: thể loại / danh mục truyền vào không tồn tại
+        """
+        store = self.book_store
+        if store is None:
+            return None
+        key = None
+        if genre:
+            key = self.normalize_text(genre)
+            if key not in store.genre_values:
+                raise KeyError(genre)
+        if self.catalog is not None:
+            key = self.catalog.query_genre(question, key)
+        return store.metadata_filter(key, category)
+
+    def _chain_for(self, where):
+        """Chain dùng chung, hoặc bản copy nông với retriever có filter (không sửa chain chung)"""
+        if not where:
+            return self.chain
+        return self.chain.model_copy(update={"retriever": self.retriever.with_filter(where)})
+
+    def get_router_stats(self):
+        """Số câu hỏi theo từng intent và tỉ lệ trả lời không cần LLM"""
+        if self.intent_router is None:
+            return None
+        return self.intent_router.stats()
+
+    def get_top_books(self, field="views", genre=None, limit=10, min_count=None):
+        """
+        Sách nhiều lượt xem / tải nhất (từ catalog, không qua Chroma / LLM)
+
+        Args:
+            field: "views" | "downloads"
+            genre: tên thể loại (có dấu hoặc không), None = tất cả
+            limit: số sách
+            min_count: chỉ lấy sách có ít nhất min_count lượt
+
+        Returns:
+            list: sách kèm views_count / downloads_count
+        """
+        if self.catalog is None:
+            raise RuntimeError("Engine chưa được khởi tạo. Gọi init_engine_base() trước.")
+        key = None
+        if genre:
+            key = self.normalize_text(genre)
+            if key not in self.catalog.genres:
+                raise KeyError(genre)
+        ids = self.catalog.top(field, limit, key, min_count=min_count)
+        return self.catalog.books(ids, with_counts=True)
+
+    def refresh_indexes(self):
+        """Build lại index / catalog / kho sách từ CSV (không đụng tới Chroma)"""
+        self._build_indexes(self.corpus_cache.load())
+
+    def browse_books(self, genre=None, category=None, q=None, limit=20, cursor=None, as_json=False):
+        """
+        Duyệt / tìm sách theo thứ tự tên (API /books)
+
+        Args:
+            genre: thể loại
+            category: danh mục (file CSV, vd "adventure-horror/detective", hoặc thư mục)
+            q: tiền tố tên sách (có dấu hoặc không)
+            limit: số sách mỗi trang
+            cursor: next_cursor của trang trước
+            as_json: trả về chuỗi JSON thay vì dict (API trả thẳng, không serialize lại)
+
+        Returns:
+            dict | str: {"books", "total", "next_cursor"}
+        """
+        if self.book_store is None:
+            raise RuntimeError("Engine chưa được khởi tạo. Gọi init_engine_base() trước.")
+        search = self.book_store.search_json if as_json else self.book_store.search
+        return search(genre=genre, category=category, prefix=q, limit=limit, cursor=cursor)
+
+    def search_books(self, q, genre=None, category=None, limit=20):
+        """
+        Tìm sách theo từ trong tên qua FTS5 của catalog SQLite (API /books/search)
+
+        Returns:
+            list: dict sách, xếp theo độ khớp
+
+        Raises:
+            NotImplementedError: engine không dùng catalog SQLite (CATALOG_BACKEND=csv)
+        """
+        if self.catalog_db is None:
+            raise NotImplementedError("Tìm theo từ cần CATALOG_BACKEND=sqlite")
+        return self.catalog_db.search(q, genre=genre, category=category, limit=limit)
+
+    def get_book_facets(self):
+        """Số sách theo thể loại / danh mục"""
+        if self.book_store is None:
+            raise RuntimeError("Engine chưa được khởi tạo. Gọi init_engine_base() trước.")
+        return self.book_store.facets()
+
+    def _cache_lookup(self, question: str, genre: str = None, category: str = None):
+        """
+        Tra cache câu trả lời cho câu hỏi (khóa = normalize_text, kèm bộ lọc nếu có).
+        Câu hỏi có bộ lọc truyền vào chỉ dùng tầng exact: câu gần nghĩa ở
+        thể loại / danh mục khác không phải cùng câu trả lời.
+
+        Returns:
+            dict: {"key", "vector", "generation", "cached"} - cached là None nếu miss
+        """
+        cache = self.answer_cache
+        generation = cache.generation
+        key = self.normalize_text(question)
+        scoped = bool(genre or category)
+        if scoped:
+            key += f"|genre={self.normalize_text(genre or '')}|category={category or ''}"
+        vector = self.embeddings.embed_query(question) if cache.semantic and not scoped else None
+        return {"key": key, "vector": vector, "generation": generation,
+                "cached": cache.get(key, vector)}
+
+    def _cache_store(self, lookup, answer, books):
+        self.answer_cache.put(
+            lookup["key"], {"answer": answer, "books": books},
+            vector=lookup["vector"], generation=lookup["generation"],
+        )
+
+    def get_embedding_cache_stats(self):
+        """Thống kê cache embedding: document (đĩa) và câu hỏi (RAM)"""
+        if self.embeddings is None:
+            raise RuntimeError("Engine chưa được khởi tạo. Gọi init_engine_base() trước.")
+        return self.embeddings.stats()
+
+    def get_answer_cache_stats(self):
+        """Thống kê cache câu trả lời: số entry, hit exact / semantic, hit rate"""
+        return self.answer_cache.stats()
+
+    @staticmethod
+    def _format_books(docs):
+        """Metadata của các document -> danh sách sách trả về cho client"""
         books = []
         for doc in docs:
             books.append({
@@ -312,12 +600,7 @@ class ChatbotEngine:
                 "url": doc.metadata['url'],
                 "img_path": doc.metadata['img_path']
             })
-        
-        return {
-            "answer": result["answer"],
-            "user_id": user_id,
-            "books": books
-        }
+        return books
 
     def get_session_history(self, user_id: str):
         """
@@ -327,16 +610,17 @@ class ChatbotEngine:
             user_id: ID của user
             
         Returns:
-            list: Danh sách các message trong memory
+            list: Danh sách message (HumanMessage / AIMessage) theo thứ tự
         """
-        if user_id not in self.sessions:
+        history = self.sessions.get_history(user_id)
+        if history is None:
             return []
         
-        chain = self.sessions[user_id]
-        memory = chain.memory
-        
-        # Lấy chat history
-        return memory.load_memory_variables({}).get("chat_history", [])
+        messages = []
+        for question, answer in history:
+            messages.append(HumanMessage(content=question))
+            messages.append(AIMessage(content=answer))
+        return messages
 
     def clear_session(self, user_id: str):
         """
@@ -345,9 +629,7 @@ class ChatbotEngine:
         Args:
             user_id: ID của user
         """
-        if user_id in self.sessions:
-            chain = self.sessions[user_id]
-            chain.memory.clear()
+        if self.sessions.clear(user_id):
             print(f">> Đã xóa lịch sử chat của user: {user_id}")
         else:
             print(f">> User {user_id} không có session")
@@ -359,8 +641,7 @@ class ChatbotEngine:
         Args:
             user_id: ID của user
         """
-        if user_id in self.sessions:
-            del self.sessions[user_id]
+        if self.sessions.delete(user_id):
             print(f">> Đã kết thúc session của user: {user_id}")
         else:
             print(f">> User {user_id} không có session để kết thúc")
@@ -372,7 +653,16 @@ class ChatbotEngine:
         Returns:
             list: Danh sách user_id
         """
-        return list(self.sessions.keys())
+        return self.sessions.list_users()
+
+    def get_session_stats(self):
+        """
+        Thống kê kho session: loại backend, số session, giới hạn, số lần bị xóa do LRU / TTL
+        
+        Returns:
+            dict: Thống kê
+        """
+        return self.sessions.stats()
 
     def get_session_info(self, user_id: str):
         """
@@ -384,18 +674,17 @@ class ChatbotEngine:
         Returns:
             dict: Thông tin session
         """
-        if user_id not in self.sessions:
+        history = self.sessions.get_history(user_id)
+        if history is None:
             return {
                 "user_id": user_id,
                 "exists": False,
                 "history_count": 0
             }
         
-        history = self.get_session_history(user_id)
-        
         return {
             "user_id": user_id,
             "exists": True,
-            "history_count": len(history),
+            "history_count": len(history) * 2,
             "window_size": self.window_size
         }
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Đồng bộ tăng dần (diff) giữa corpus CSV và Chroma DB.
+
+- id của document = md5(page_content), ổn định theo nội dung
+- metadata có thêm "row_hash" để phát hiện dòng đổi metadata (url, views...)
+- Chỉ embed document mới; dòng chỉ đổi metadata được update không cần embed lại;
+  document không còn trong CSV bị xóa
+- id hiện có trong DB được đọc theo trang, không tải cả collection vào RAM
+- Cách embed document mới có thể truyền vào (build_index embed song song nhiều
+  process), mặc định dùng embedding function của DB
+"""
+import hashlib
+import json
+
+
+# Số id đọc mỗi lần khi quét DB
+PAGE_SIZE = 1000
+# Số document mỗi lần add/update/delete
+WRITE_BATCH_SIZE = 256
+
+
+def metadata_hash(metadata):
+    """Hash ổn định của metadata (không tính row_hash)"""
+    payload = {k: v for k, v in metadata.items() if k != "row_hash"}
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def attach_row_hash(docs):
+    """Gắn row_hash vào metadata của từng document"""
+    for doc in docs:
+        doc.metadata["row_hash"] = metadata_hash(doc.metadata)
+    return docs
+
+
+def iter_existing(collection, page_size=PAGE_SIZE):
+    """Duyệt (id, row_hash) trong collection theo trang"""
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = page["ids"]
+        if not ids:
+            return
+        for id_, metadata in zip(ids, page["metadatas"]):
+            yield id_, (metadata or {}).get("row_hash")
+        offset += len(ids)
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def sync_documents(db, docs, ids, page_size=PAGE_SIZE, batch_size=WRITE_BATCH_SIZE, embed_batches=None):
+    """
+    Đồng bộ Chroma DB với danh sách document hiện tại.
+
+    Args:
+        db: langchain Chroma
+        docs: list Document (page_content quyết định id)
+        ids: id tương ứng từng document
+        page_size: số id đọc mỗi trang khi quét DB
+        batch_size: số document mỗi lần ghi
+        embed_batches: hàm nhận iterator các lô text, trả về iterator vector của
+            từng lô theo đúng thứ tự (có thể embed nhiều lô song song).
+            None = embed bằng embedding function của db
+
+    Returns:
+        dict: số document added / updated / deleted / unchanged
+    """
+    current = dict(zip(ids, attach_row_hash(docs)))
+    collection = db._collection
+
+    to_update, to_delete, seen = [], [], set()
+    for id_, row_hash in iter_existing(collection, page_size):
+        doc = current.get(id_)
+        if doc is None:
+            to_delete.append(id_)
+            continue
+        seen.add(id_)
+        if row_hash != doc.metadata["row_hash"]:
+            to_update.append(id_)
+    to_add = [id_ for id_ in current if id_ not in seen]
+
+    for batch in _batches(to_delete, batch_size):
+        db.delete(ids=batch)
+
+    # Chỉ đổi metadata: page_content (và embedding) giữ nguyên vì id = hash nội dung
+    for batch in _batches(to_update, batch_size):
+        collection.update(ids=batch, metadatas=[current[id_].metadata for id_ in batch])
+
+    add_batches = list(_batches(to_add, batch_size))
+    if embed_batches is None:
+        for batch in add_batches:
+            db.add_documents([current[id_] for id_ in batch], ids=batch)
+            print(f">> Đã embed {len(batch)} document mới")
+    else:
+        texts = ([current[id_].page_content for id_ in batch] for batch in add_batches)
+        # Lô nào embed xong được ghi ngay: dừng giữa chừng thì lần sau chỉ embed phần còn thiếu
+        for batch, vectors in zip(add_batches, embed_batches(texts)):
+            collection.upsert(
+                ids=batch,
+                embeddings=vectors,
+                documents=[current[id_].page_content for id_ in batch],
+                metadatas=[current[id_].metadata for id_ in batch],
+            )
+            print(f">> Đã embed {len(batch)} document mới")
+
+    return {
+        "added": len(to_add),
+        "updated": len(to_update),
+        "deleted": len(to_delete),
+        "unchanged": len(seen) - len(to_update),
+    }
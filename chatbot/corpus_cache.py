@@ -0,0 +1,169 @@
+"""
+Cache corpus đã tiền xử lý, lưu thành 1 file pickle nhị phân.
+
+Mỗi file CSV được lưu 1 frame đã chuẩn hóa (kết quả prepare_frame), kèm khóa
+(path, size, mtime, sha1 nội dung). Khi khởi động chỉ những file thay đổi mới
+phải đọc lại; file chỉ bị "touch" (mtime đổi nhưng nội dung giữ nguyên) được
+nhận ra qua sha1 và không phải parse lại.
+"""
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+
+from chatbot.ingest import (
+    list_csv_files, read_csv_frame, prepare_frame, dedupe_frame, empty_frame,
+)
+
+
+# Tăng khi thay đổi cách tiền xử lý để bỏ cache cũ
+CACHE_VERSION = 2  # 2: thêm views_count / downloads_count
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    """sha1 nội dung file (đọc theo khối)"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CorpusCache:
+    """
+    Cache frame đã chuẩn hóa cho từng CSV trong data_dir.
+
+    Args:
+        data_dir: thư mục chứa CSV
+        cache_path: file pickle lưu cache
+    """
+    def __init__(self, data_dir, cache_path):
+        self.data_dir = data_dir
+        self.cache_path = cache_path
+
+    def _stat(self, file):
+        st = os.stat(file)
+        return st.st_size, st.st_mtime_ns
+
+    def _read_bundle(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "rb") as f:
+                bundle = pickle.load(f)
+        except Exception as e:
+            print(f">> Cache corpus hỏng, đọc lại toàn bộ CSV: {e}")
+            return {}
+        if bundle.get("version") != CACHE_VERSION:
+            return {}
+        return bundle.get("files", {})
+
+    def _write_bundle(self, files):
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": CACHE_VERSION, "files": files}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+    def fingerprint(self):
+        """
+        Dấu vân tay của toàn bộ CSV chỉ dựa trên (path, size, mtime).
+        Chỉ cần stat, không đọc file -> dùng để kiểm tra nhanh lúc khởi động.
+        Đổi CACHE_VERSION (thêm cột / metadata) cũng làm đổi dấu vân tay.
+        """
+        digest = hashlib.sha1()
+        digest.update(f"v{CACHE_VERSION}\n".encode("utf-8"))
+        for file in sorted(list_csv_files(self.data_dir)):
+            size, mtime_ns = self._stat(file)
+            rel = os.path.relpath(file, self.data_dir)
+            digest.update(f"{rel}\0{size}\0{mtime_ns}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def load(self) -> pd.DataFrame:
+        """
+        Trả về frame corpus đã chuẩn hóa và loại trùng.
+        Chỉ parse lại những CSV thay đổi so với cache.
+        """
+        cached = self._read_bundle()
+        files = {}
+        frames = []
+        parsed = reused = 0
+        changed = False
+
+        for file in list_csv_files(self.data_dir):
+            rel = os.path.relpath(file, self.data_dir)
+            size, mtime_ns = self._stat(file)
+            entry = cached.get(rel)
+
+            if entry and entry["size"] == size and entry["mtime_ns"] == mtime_ns:
+                reused += 1
+            else:
+                sha1 = file_sha1(file)
+                if entry and entry["sha1"] == sha1:
+                    entry = {**entry, "size": size, "mtime_ns": mtime_ns}
+                    reused += 1
+                else:
+                    entry = {
+                        "size": size,
+                        "mtime_ns": mtime_ns,
+                        "sha1": sha1,
+                        "frame": prepare_frame(read_csv_frame(file, self.data_dir)),
+                    }
+                    parsed += 1
+                changed = True
+
+            files[rel] = entry
+            frames.append(entry["frame"])
+
+        if changed or set(files) != set(cached):
+            self._write_bundle(files)
+
+        print(f">> Corpus: {reused} file từ cache, {parsed} file đọc lại")
+        if not frames:
+            return prepare_frame(empty_frame())
+        return dedupe_frame(pd.concat(frames, ignore_index=True))
+
+
+
+class CatalogCorpus:
+    """
+    Corpus đọc từ catalog SQLite (scrape.book_db.BookDB, CATALOG_BACKEND=sqlite)
+    thay cho CSV, cùng giao diện load() / fingerprint() với CorpusCache.
+
+    Dấu vân tay là version của catalog (tăng mỗi lần có sách mới), không phải
+    stat file nào. Frame đã chuẩn hóa được cache trong file pickle theo version.
+
+    Args:
+        catalog: BookDB (cần frame() và version())
+        cache_path: file pickle lưu frame đã chuẩn hóa
+    """
+    def __init__(self, catalog, cache_path):
+        self.catalog = catalog
+        self.cache_path = cache_path
+
+    def fingerprint(self):
+        return hashlib.sha1(f"v{CACHE_VERSION}\ncatalog\0{self.catalog.version()}".encode("utf-8")).hexdigest()
+
+    def load(self) -> pd.DataFrame:
+        fingerprint = self.fingerprint()
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "rb") as f:
+                    bundle = pickle.load(f)
+                if bundle.get("fingerprint") == fingerprint:
+                    print(">> Corpus: catalog không đổi, dùng cache")
+                    return bundle["frame"]
+            except Exception as e:
+                print(f">> Cache corpus hỏng, đọc lại catalog: {e}")
+
+        raw = self.catalog.frame()
+        df = dedupe_frame(prepare_frame(raw if len(raw) else empty_frame()))
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"fingerprint": fingerprint, "frame": df}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+        print(f">> Corpus: đọc {len(raw)} sách từ catalog")
+        return df
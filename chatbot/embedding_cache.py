@@ -0,0 +1,338 @@
+"""
+Cache embedding trên đĩa cho document.
+
+Khóa = sha1(tên model + page_content). Vector được lưu nối tiếp trong 1 file
+float32 đọc bằng numpy.memmap, kèm file index (mỗi dòng 1 khóa, số dòng = số
+hàng trong file vector). Rebuild chroma_db hoặc reindex khi model không đổi
+hầu như chỉ đọc lại từ cache thay vì chạy lại model.
+
+Nhiều process có thể dùng chung 1 thư mục cache (API nhiều worker, build_index
+chạy cạnh API): mọi lần ghi / sửa file giữ file lock của thư mục, số hàng bắt
+đầu lấy từ kích thước thật của file vector, và phần index do process khác ghi
+thêm được đọc lại trước khi ghi.
+
+Embedding câu hỏi (embed_query) được cache trong RAM bằng LRU giới hạn theo
+số byte, khóa = câu hỏi chuẩn hóa NFC + gộp khoảng trắng.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.txt"
+META_FILE = "meta.json"
+LOCK_FILE = "lock"
+
+
+def _slug(name):
+    return re.sub(r"[^\w.-]+", "_", name)
+
+
+@contextmanager
+def _file_lock(path):
+    """Khóa độc quyền giữa các process (fcntl.flock, msvcrt.locking trên Windows)"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def query_key(text):
+    """Khóa cache của câu hỏi: NFC + gộp khoảng trắng (giữ dấu, hoa/thường vì model phân biệt)"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbeddingCache:
+    """
+    LRU trong RAM cho embedding câu hỏi, giới hạn theo tổng số byte.
+
+    Args:
+        max_bytes: dung lượng tối đa (vector float32 + khóa)
+    """
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        self._data = OrderedDict()  # khóa -> vector float32, cũ nhất ở đầu
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(key, vector):
+        return vector.nbytes + sys.getsizeof(key)
+
+    def get(self, key):
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vector.tolist()
+
+    def put(self, key, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        size = self._size(key, vector)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= self._size(key, old)
+            self._data[key] = vector
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                old_key, old = self._data.popitem(last=False)
+                self.bytes -= self._size(old_key, old)
+                self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "evicted": self.evicted,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Bọc 1 Embeddings (vd HuggingFaceEmbeddings): cache embed_documents trên
+    đĩa, embed_query trong RAM.
+
+    Args:
+        embeddings: Embeddings gốc
+        model_name: tên model (là 1 phần của khóa cache)
+        cache_dir: thư mục cache, mỗi model 1 thư mục con
+        query_cache_bytes: dung lượng LRU embedding câu hỏi (0 = tắt)
+    """
+    def __init__(self, embeddings, model_name, cache_dir, query_cache_bytes=32 * 1024 * 1024):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_dir = os.path.join(cache_dir, _slug(model_name))
+        self.hits = 0
+        self.misses = 0
+        self.query_cache = QueryEmbeddingCache(query_cache_bytes) if query_cache_bytes else None
+
+        self._lock = threading.Lock()
+        self._index = {}       # khóa -> số hàng trong file vector
+        self._rows = 0         # số hàng (= số dòng index) đã đọc, có thể > len(_index) nếu khóa trùng
+        self._index_offset = 0 # số byte của file index đã đọc
+        self._dim = None
+        self._vectors = None   # np.memmap (n, dim) float32
+        if os.path.exists(self.cache_dir):
+            with self._locked():
+                self._load()
+
+    # --- LƯU TRỮ ---
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _locked(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return _file_lock(self._path(LOCK_FILE))
+
+    def _vector_size(self):
+        path = self._path(VECTORS_FILE)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _load(self):
+        """Đọc lại toàn bộ index (gọi khi đang giữ file lock)"""
+        self._index, self._rows, self._index_offset = {}, 0, 0
+        meta_path = self._path(META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model_name") != self.model_name:
+            return
+        self._dim = meta["dim"]
+
+        keys = []
+        if os.path.exists(self._path(INDEX_FILE)):
+            with open(self._path(INDEX_FILE), encoding="utf-8") as f:
+                keys = f.read().splitlines()
+        row_bytes = self._dim * 4
+        size = self._vector_size()
+        count = min(len(keys), size // row_bytes)
+
+        # Ghi dở lần trước (crash) -> cắt 2 file về cùng số hàng
+        if count != len(keys) or count * row_bytes != size:
+            keys = keys[:count]
+            with open(self._path(VECTORS_FILE), "ab") as f:
+                f.truncate(count * row_bytes)
+            with open(self._path(INDEX_FILE), "w", encoding="utf-8") as f:
+                f.writelines(f"{key}\n" for key in keys)
+
+        self._index = {key: row for row, key in enumerate(keys)}
+        self._rows = count
+        self._index_offset = sum(len(f"{key}\n".encode("utf-8")) for key in keys)
+        self._remap()
+
+    def _refresh(self):
+        """
+        Đọc phần index process khác đã ghi thêm (gọi khi đang giữ file lock).
+        Index và file vector lệch nhau (process khác crash giữa chừng) -> đọc lại toàn bộ.
+        """
+        if self._dim is None:
+            self._load()
+            return
+        path = self._path(INDEX_FILE)
+        data, tail = b"", []
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read()
+            tail = data.decode("utf-8").splitlines()
+            if data and not data.endswith(b"\n"):
+                tail = None  # dòng cuối ghi dở
+        if tail is None or self._vector_size() != (self._rows + len(tail)) * self._dim * 4:
+            self._load()
+            return
+        for key in tail:
+            self._index[key] = self._rows
+            self._rows += 1
+        self._index_offset += len(data)
+        if tail:
+            self._remap()
+
+    def _remap(self):
+        if self._rows == 0:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(
+            self._path(VECTORS_FILE), dtype=np.float32, mode="r", shape=(self._rows, self._dim)
+        )
+
+    def _append(self, keys, vectors):
+        """
+        Ghi thêm vector vào cuối file (vector trước, index sau) dưới file lock.
+        Số hàng bắt đầu = kích thước file vector, không phải số khóa trong RAM.
+        """
+        array = np.asarray(vectors, dtype=np.float32)
+        with self._locked():
+            self._refresh()
+            if self._dim is None:
+                self._dim = array.shape[1]
+                with open(self._path(META_FILE), "w", encoding="utf-8") as f:
+                    json.dump({"model_name": self.model_name, "dim": self._dim}, f)
+
+            # Process khác có thể vừa ghi cùng khóa
+            new = [(key, vector) for key, vector in zip(keys, array) if key not in self._index]
+            if not new:
+                return
+            start = self._vector_size() // (self._dim * 4)
+            with open(self._path(VECTORS_FILE), "ab") as f:
+                f.write(np.asarray([vector for _, vector in new], dtype=np.float32).tobytes())
+            with open(self._path(INDEX_FILE), "ab") as f:
+                f.write("".join(f"{key}\n" for key, _ in new).encode("utf-8"))
+                self._index_offset = f.tell()
+
+            for offset, (key, _) in enumerate(new):
+                self._index[key] = start + offset
+            self._rows = start + len(new)
+            self._remap()
+
+    def key(self, text):
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def lookup(self, texts):
+        """
+        Tra cache cho 1 lô text.
+
+        Returns:
+            tuple: (keys, results, missing) - results có None ở vị trí chưa có
+                   trong cache, missing = {khóa: text} cần embed (đã gộp trùng)
+        """
+        keys = [self.key(text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                row = self._index.get(key)
+                if row is None:
+                    missing.setdefault(key, texts[i])
+                else:
+                    results[i] = self._vectors[row].tolist()
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return keys, results, missing
+
+    def store(self, keys, results, missing, vectors):
+        """Lưu vector vừa embed cho missing và điền vào results"""
+        # Làm tròn về float32 để kết quả giống hệt lần đọc từ cache sau này
+        vectors = np.asarray(vectors, dtype=np.float32)
+        computed = dict(zip(missing.keys(), vectors))
+        with self._lock:
+            new_keys = [key for key in computed if key not in self._index]
+            if new_keys:
+                self._append(new_keys, [computed[key] for key in new_keys])
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                results[i] = computed[key].tolist()
+        return results
+
+    # --- EMBEDDINGS API ---
+    def embed_documents(self, texts):
+        keys, results, missing = self.lookup(texts)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            self.store(keys, results, missing, vectors)
+        return results
+
+    def embed_query(self, text):
+        # Bật / tắt cache đều embed câu hỏi đã chuẩn hóa và làm tròn float32 (giống lần hit)
+        key = query_key(text)
+        vector = self.query_cache.get(key) if self.query_cache is not None else None
+        if vector is None:
+            vector = np.asarray(self.embeddings.embed_query(key), dtype=np.float32)
+            if self.query_cache is not None:
+                self.query_cache.put(key, vector)
+            vector = vector.tolist()
+        return vector
+
+    def stats(self):
+        """Bộ đếm hit/miss của cache document (và cache câu hỏi ở khóa "query")"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "cached_vectors": len(self._index),
+            "query": self.query_cache.stats() if self.query_cache else None,
+        }
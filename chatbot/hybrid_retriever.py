@@ -0,0 +1,329 @@
+"""
+Retrieval kết hợp từ khóa (BM25) + vector (MMR trên Chroma).
+
+LexicalIndex: inverted index trong RAM trên tên sách + thể loại đã chuẩn hóa
+(bỏ dấu, chữ thường), gồm từ đơn và cặp từ liên tiếp của tên sách. Trọng số
+BM25 của từng posting được tính sẵn lúc build, truy vấn chỉ là cộng mảng numpy.
+
+HybridRetriever:
+  - câu hỏi chỉ là 1 tên sách (bỏ từ đệm) -> trả về ngay từ index, không chạy model embedding
+  - câu hỏi chứa tên sách nhưng còn nội dung khác ("sách về gia đình") -> sách đó
+    được gộp cùng kết quả BM25 / MMR, không thay thế chúng
+  - còn lại: gộp kết quả BM25 và MMR bằng reciprocal rank fusion (RRF), thêm
+    thứ hạng lượt xem (views_count) làm tín hiệu phụ với trọng số nhỏ
+  - search_filter (filter "where" của Chroma theo thể loại / danh mục) được đẩy
+    xuống Chroma và áp cùng điều kiện lên BM25, không lọc sau khi đã lấy top k
+"""
+import re
+import threading
+from collections import defaultdict
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import Field, PrivateAttr
+
+from chatbot.ingest import parse_count
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Từ đệm bỏ qua khi so câu hỏi với tên sách / thể loại
+FILLER_WORDS = {"tim", "cho", "toi", "minh", "sach", "truyen", "ebook", "cuon", "quyen",
+                "the", "loai", "ve", "nhe", "voi"}
+# "về" trước cụm từ là hỏi theo chủ đề ("sách về gia đình"), không phải hỏi tên sách
+TOPIC_WORDS = {"ve"}
+# Tên sách ngắn hơn thường cũng là cụm từ thông dụng ("Gia Đình", "Trọng Sinh"):
+# chỉ coi là hỏi tên sách khi câu hỏi đúng bằng tên
+MIN_LOOSE_TITLE_TOKENS = 3
+
+
+def tokenize(normalized):
+    return TOKEN_PATTERN.findall(normalized)
+
+
+def strip_fillers(tokens, fillers=FILLER_WORDS):
+    """Bỏ từ đệm ở 2 đầu câu hỏi"""
+    start, end = 0, len(tokens)
+    while start < end and tokens[start] in fillers:
+        start += 1
+    while end > start and tokens[end - 1] in fillers:
+        end -= 1
+    return tokens[start:end]
+
+
+def title_core(tokens):
+    """Phần câu hỏi có thể là tên sách: bỏ từ đệm nhưng giữ từ chủ đề ("về")"""
+    return strip_fillers(tokens, FILLER_WORDS - TOPIC_WORDS)
+
+
+def _terms(title_tokens, genre_tokens):
+    """Từ đơn + cặp từ của tên sách, từ của thể loại (tiền tố g: để tách trường)"""
+    terms = list(title_tokens)
+    terms += [f"{a}_{b}" for a, b in zip(title_tokens, title_tokens[1:])]
+    terms += [f"g:{token}" for token in genre_tokens]
+    return terms
+
+
+class LexicalIndex:
+    """
+    Args:
+        docs: list Document (metadata có title_normalized, genre)
+        normalize: hàm chuẩn hóa text (ChatbotEngine.normalize_text)
+        k1, b: tham số BM25
+    """
+    MAX_MASKS = 256
+
+    def __init__(self, docs, normalize, k1=1.2, b=0.75):
+        self.docs = docs
+        self.normalize = normalize
+        self.titles = []                   # tên sách đã chuẩn hóa theo thứ tự docs
+        self.by_title = defaultdict(list)  # tên sách chuẩn hóa -> vị trí trong docs
+        # Metadata dùng để lọc, cùng thứ tự docs
+        self.fields = {
+            field: np.array([doc.metadata.get(field, "") for doc in docs], dtype=object)
+            for field in ("genre", "category")
+        }
+        self._masks = {}
+        self._masks_lock = threading.Lock()
+
+        genre_cache = {}
+        postings = defaultdict(dict)       # term -> {vị trí doc: tf}
+        lengths = np.zeros(len(docs), dtype=np.float32)
+        for i, doc in enumerate(docs):
+            title = doc.metadata.get("title_normalized") or normalize(doc.metadata.get("title", ""))
+            genre = doc.metadata.get("genre", "")
+            if genre not in genre_cache:
+                genre_cache[genre] = tokenize(normalize(genre))
+            self.titles.append(title)
+            self.by_title[title].append(i)
+
+            terms = _terms(tokenize(title), genre_cache[genre])
+            lengths[i] = len(terms)
+            for term in terms:
+                postings[term][i] = postings[term].get(i, 0) + 1
+
+        n = max(len(docs), 1)
+        avg_length = float(lengths.mean()) if len(docs) else 1.0
+        norm = k1 * (1 - b + b * lengths / (avg_length or 1.0))
+
+        # term -> (vị trí doc int32, idf * trọng số tf float32)
+        self.postings = {}
+        for term, tfs in postings.items():
+            ids = np.fromiter(tfs.keys(), dtype=np.int32, count=len(tfs))
+            tf = np.fromiter(tfs.values(), dtype=np.float32, count=len(tfs))
+            idf = np.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            self.postings[term] = (ids, (idf * tf * (k1 + 1) / (tf + norm[ids])).astype(np.float32))
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _clause_mask(self, where):
+        """Filter "where" dạng {field: value}, {field: {"$in": [...]}}, {"$and": [...]} -> mảng bool"""
+        if "$and" in where:
+            mask = np.ones(len(self.docs), dtype=bool)
+            for clause in where["$and"]:
+                mask &= self._clause_mask(clause)
+            return mask
+        (field, condition), = where.items()
+        values = condition["$in"] if isinstance(condition, dict) else [condition]
+        return np.isin(self.fields[field], list(values))
+
+    def mask(self, where):
+        """Mảng bool các doc thỏa filter (cache theo filter), None nếu không lọc"""
+        if not where:
+            return None
+        key = repr(where)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._clause_mask(where)
+            with self._masks_lock:
+                if len(self._masks) >= self.MAX_MASKS:
+                    self._masks.clear()
+                self._masks[key] = mask
+        return mask
+
+    def search(self, query, k=20, where=None):
+        """
+        Top k document theo BM25, chỉ trong các doc thỏa filter where (nếu có).
+
+        Returns:
+            list: [(vị trí doc, điểm)] giảm dần theo điểm
+        """
+        tokens = tokenize(self.normalize(query))
+        matched = [self.postings[term] for term in set(_terms(tokens, []))
+                   if term in self.postings]
+        # Từ của câu hỏi cũng có thể là thể loại ("truyện trinh thám")
+        matched += [self.postings[f"g:{token}"] for token in set(tokens)
+                    if f"g:{token}" in self.postings]
+        if not matched:
+            return []
+
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for ids, weights in matched:
+            scores[ids] += weights
+        mask = self.mask(where)
+        if mask is not None:
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(scores[hits], -k)[-k:]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    def _allowed(self, ids, where):
+        mask = self.mask(where)
+        return [i for i in ids if mask is None or mask[i]]
+
+    def whole_title(self, query, where=None):
+        """
+        Câu hỏi chỉ là tên 1 cuốn sách: đúng bằng tên, hoặc bỏ từ đệm ở 2 đầu thì
+        còn đúng tên sách có ít nhất MIN_LOOSE_TITLE_TOKENS từ.
+
+        Returns:
+            list: vị trí các doc có tên đó và thỏa filter where (rỗng nếu không phải)
+        """
+        normalized = self.normalize(query)
+        exact = self._allowed(self.by_title.get(normalized, []), where)
+        if exact:
+            return exact
+        core = title_core(tokenize(normalized))
+        if len(core) < MIN_LOOSE_TITLE_TOKENS:
+            return []
+        return self._allowed(self.by_title.get(" ".join(core), []), where)
+
+    def match_title(self, query, candidates=None, where=None):
+        """
+        Tên sách xuất hiện nguyên vẹn trong câu hỏi (ưu tiên tên dài nhất).
+        Tên 1 từ chỉ khớp khi câu hỏi đúng bằng tên sách.
+
+        Returns:
+            list: vị trí các doc có tên đó và thỏa filter where (rỗng nếu không khớp)
+        """
+        normalized = self.normalize(query)
+        exact = self._allowed(self.by_title.get(normalized, []), where)
+        if exact:
+            return exact
+
+        padded = f" {' '.join(tokenize(normalized))} "
+        if candidates is None:
+            candidates = [i for i, _ in self.search(query, where=where)]
+        best = None
+        for i in candidates:
+            title_tokens = tokenize(self.titles[i])
+            if len(title_tokens) < 2 or f" {' '.join(title_tokens)} " not in padded:
+                continue
+            if best is None or len(title_tokens) > len(tokenize(self.titles[best])):
+                best = i
+        return self._allowed(self.by_title[self.titles[best]], where) if best is not None else []
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever BM25 + MMR, gộp bằng RRF; câu hỏi chỉ là tên sách thì bỏ qua vector search.
+
+    Args:
+        vectorstore: Chroma
+        index: LexicalIndex (có thể thay bằng index mới khi dữ liệu đổi)
+        k: số document trả về
+        fetch_k, lambda_mult: tham số MMR
+        rrf_k: hằng số của reciprocal rank fusion
+        popularity_weight: trọng số của thứ hạng lượt xem trong RRF (0 = tắt)
+        search_filter: filter "where" của Chroma (None = không lọc). Mỗi request có
+            filter riêng dùng bản copy: retriever.with_filter(where)
+
+    counters được cập nhật từ nhiều request song song, luôn qua _count (giữ lock
+    chung với các bản copy của with_filter).
+    """
+    vectorstore: Any
+    index: Any
+    k: int = 5
+    fetch_k: int = 20
+    lambda_mult: float = 0.7
+    rrf_k: int = 60
+    popularity_weight: float = 0.3
+    search_filter: Optional[dict] = None
+    counters: dict = Field(default_factory=lambda: {"title": 0, "title_fused": 0, "hybrid": 0, "dense": 0,
+                                                    "filtered": 0})
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def with_filter(self, where):
+        """Bản copy nông dùng filter where (chung vectorstore, index, bộ đếm và lock)"""
+        if not where:
+            return self
+        return self.model_copy(update={"search_filter": where})
+
+    def _count(self, route):
+        with self._lock:
+            self.counters[route] += 1
+
+    @staticmethod
+    def _key(doc):
+        return doc.page_content
+
+    @staticmethod
+    def _views(doc):
+        value = doc.metadata.get("views_count")
+        return value if value is not None else parse_count(doc.metadata.get("views", 0))
+
+    def _fuse(self, ranked_lists):
+        """
+        Reciprocal rank fusion: điểm = tổng 1 / (rrf_k + hạng) trên các danh sách,
+        cộng popularity_weight / (rrf_k + hạng theo lượt xem trong các ứng viên)
+        """
+        scores = defaultdict(float)
+        docs = {}
+        for ranked in ranked_lists:
+            for rank, doc in enumerate(ranked, start=1):
+                key = self._key(doc)
+                scores[key] += 1.0 / (self.rrf_k + rank)
+                docs.setdefault(key, doc)
+        if self.popularity_weight:
+            by_views = sorted(docs, key=lambda key: self._views(docs[key]), reverse=True)
+            for rank, key in enumerate(by_views, start=1):
+                scores[key] += self.popularity_weight / (self.rrf_k + rank)
+        best = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [docs[key] for key in best]
+
+    def _title_docs(self, index, title_ids, lexical):
+        """Sách khớp tên + các kết quả BM25 tiếp theo cho đủ k"""
+        ids = list(dict.fromkeys(title_ids + [i for i, _ in lexical]))[:self.k]
+        return [index.docs[i] for i in ids]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        index = self.index
+        where = self.search_filter
+        if where:
+            self._count("filtered")
+        lexical = index.search(query, self.fetch_k, where=where) if index is not None else []
+
+        title_ids = index.whole_title(query, where=where) if lexical else []
+        if title_ids:
+            self._count("title")
+            return self._title_docs(index, title_ids, lexical)
+
+        dense = self.vectorstore.max_marginal_relevance_search(
+            query, k=self.k, fetch_k=self.fetch_k, lambda_mult=self.lambda_mult, filter=where
+        )
+        if not lexical:
+            self._count("dense")
+            return self._fuse([dense])
+
+        lexical_docs = [index.docs[i] for i, _ in lexical]
+        # Tên sách chỉ là 1 phần câu hỏi: thêm sách đó làm 1 danh sách xếp hạng trong RRF
+        contained = index.match_title(query, [i for i, _ in lexical], where=where)
+        if contained:
+            self._count("title_fused")
+            return self._fuse([[index.docs[i] for i in contained], dense, lexical_docs])
+
+        self._count("hybrid")
+        return self._fuse([dense, lexical_docs])
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {"documents": len(self.index) if self.index is not None else 0, **counters}
@@ -0,0 +1,170 @@
+"""
+Đọc dữ liệu sách từ CSV theo kiểu cột (vectorized) thay cho vòng lặp iterrows.
+
+Toàn bộ CSV được gộp thành 1 DataFrame, sau đó chuẩn hóa / hash / loại trùng
+bằng các phép toán trên cột. Kết quả giống hệt ChatbotEngine.normalize_text
+và ChatbotEngine.lower_text áp dụng từng dòng.
+"""
+import glob
+import hashlib
+import os
+import re
+import unicodedata
+
+import pandas as pd
+from langchain.schema import Document
+
+
+# Cột metadata -> giá trị mặc định khi file CSV không có cột đó
+META_DEFAULTS = {
+    "title": "Unknown",
+    "genre": "Unknown",
+    "url": "Unknown",
+    "img_path": "Unknown",
+    "views": 0,
+    "downloads": 0,
+}
+
+
+def list_csv_files(data_dir):
+    """Danh sách CSV trong data_dir (cùng thứ tự glob với bản cũ)"""
+    return glob.glob(f"{data_dir}/**/*.csv", recursive=True)
+
+
+def _as_str(series: pd.Series) -> pd.Series:
+    """str(value) cho từng phần tử (giống f-string / str() trong bản cũ)"""
+    return series.map(lambda v: v if isinstance(v, str) else str(v))
+
+
+def _is_str(series: pd.Series) -> pd.Series:
+    return series.map(lambda v: isinstance(v, str))
+
+
+def _mark_pattern(values) -> str:
+    """
+    Regex xóa các ký tự dấu (category 'Mn').
+    Chỉ xét các ký tự thực sự xuất hiện trong dữ liệu nên rất nhanh.
+    """
+    marks = sorted(c for c in set("".join(values)) if unicodedata.category(c) == "Mn")
+    return "[" + "".join(re.escape(c) for c in marks) + "]" if marks else ""
+
+
+def normalize_series(series: pd.Series) -> pd.Series:
+    """
+    Phiên bản theo cột của ChatbotEngine.normalize_text (chỉ cho giá trị str).
+    Chỉ chuẩn hóa các giá trị khác nhau rồi map lại (tên sách trùng rất nhiều).
+    """
+    uniques = pd.Series(series.unique(), dtype=object)
+    text = uniques.str.lower().str.normalize("NFD")
+    pattern = _mark_pattern(text.tolist())
+    if pattern:
+        text = text.str.replace(pattern, "", regex=True)
+    text = text.str.replace(r"[^\w\s:\-,]", " ", regex=True)
+    text = text.str.split().str.join(" ")
+    return series.map(dict(zip(uniques.tolist(), text.tolist())))
+
+
+def normalize_column(series: pd.Series) -> pd.Series:
+    """normalize_text cho cả cột: giá trị không phải str chỉ được str()"""
+    as_str = _as_str(series)
+    return normalize_series(as_str).where(_is_str(series), as_str)
+
+
+def lower_column(series: pd.Series) -> pd.Series:
+    """lower_text cho cả cột: giá trị không phải str chỉ được str()"""
+    as_str = _as_str(series)
+    return as_str.str.lower().where(_is_str(series), as_str)
+
+
+def md5_column(series: pd.Series) -> pd.Series:
+    """MD5 hex cho từng chuỗi (hashlib chạy theo lô, không qua iterrows)"""
+    md5 = hashlib.md5
+    return pd.Series(
+        [md5(s.encode("utf-8")).hexdigest() for s in series.tolist()],
+        index=series.index,
+        dtype=object,
+    )
+
+
+COUNT_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)\s*([kKmM]?)")
+COUNT_UNITS = {"": 1, "k": 1_000, "m": 1_000_000}
+
+
+def parse_count(value):
+    """Lượt xem / tải dạng text ("0.9K", "1.2M", "1 xem", 3) -> số nguyên"""
+    if isinstance(value, (int, float)):
+        return int(value) if value == value else 0
+    match = COUNT_PATTERN.search(str(value))
+    if match is None:
+        return 0
+    number, unit = match.groups()
+    return int(round(float(number.replace(",", ".")) * COUNT_UNITS[unit.lower()]))
+
+
+def count_column(series: pd.Series) -> pd.Series:
+    """parse_count cho cả cột (chỉ parse các giá trị khác nhau)"""
+    uniques = series.unique()
+    parsed = dict(zip(uniques.tolist(), [parse_count(v) for v in uniques]))
+    return series.map(parsed).astype("int64")
+
+
+def empty_frame():
+    """Frame rỗng có đủ cột như read_csv_frame"""
+    return pd.DataFrame(columns=[*META_DEFAULTS, "category"])
+
+
+def read_csv_frame(file, data_dir):
+    """Đọc 1 file CSV, bổ sung cột thiếu và cột category"""
+    df = pd.read_csv(file)
+    for col, default in META_DEFAULTS.items():
+        if col not in df.columns:
+            df[col] = default
+    df = df[list(META_DEFAULTS)].astype(object)
+    df["category"] = os.path.relpath(file, data_dir)
+    return df
+
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tính các cột dẫn xuất cho 1 frame thô:
+      - page_content: "gốc + chữ thường + không dấu"
+      - content_hash: md5(page_content)
+      - title_lower / title_normalized
+      - views_count / downloads_count: lượt xem / tải dạng số nguyên
+    """
+    df = df.copy()
+    original = _as_str(df["title"]) + " " + _as_str(df["genre"])
+    df["page_content"] = (
+        original + " " + original.str.lower() + " " + normalize_series(original)
+    )
+    df["content_hash"] = md5_column(df["page_content"])
+    df["title_lower"] = lower_column(df["title"])
+    df["title_normalized"] = normalize_column(df["title"])
+    df["views_count"] = count_column(df["views"])
+    df["downloads_count"] = count_column(df["downloads"])
+    return df
+
+
+def load_corpus_frame(data_dir) -> pd.DataFrame:
+    """Đọc toàn bộ CSV thành 1 frame đã chuẩn hóa và loại trùng"""
+    frames = [read_csv_frame(file, data_dir) for file in list_csv_files(data_dir)]
+    if not frames:
+        return prepare_frame(empty_frame())
+    return dedupe_frame(prepare_frame(pd.concat(frames, ignore_index=True)))
+
+
+def dedupe_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Giữ dòng đầu tiên cho mỗi content_hash (1 lượt qua hash-set)"""
+    return df[~df["content_hash"].duplicated()].reset_index(drop=True)
+
+
+def frame_to_documents(df: pd.DataFrame) -> list:
+    """Frame đã chuẩn hóa -> list Document (metadata giống bản iterrows)"""
+    columns = ["title", "title_lower", "title_normalized", "genre",
+               "url", "img_path", "views", "downloads", "category",
+               "views_count", "downloads_count"]
+    values = zip(*(df[col].tolist() for col in columns))
+    return [
+        Document(page_content=content, metadata=dict(zip(columns, row)))
+        for content, row in zip(df["page_content"].tolist(), values)
+    ]
@@ -0,0 +1,170 @@
+"""
+Bộ định tuyến câu hỏi: câu hỏi tra cứu danh mục được trả lời thẳng từ
+BookCatalog, không qua condense + retrieve + Gemini.
+
+Các intent (dò bằng luật trên câu hỏi đã chuẩn hóa, không dấu):
+  - title: câu hỏi chỉ là tên 1 cuốn sách: đúng bằng tên, tên trong ngoặc kép,
+    tên viết hoa đúng như trong dữ liệu ("sách Gia Đình"), hoặc bỏ từ đệm thì còn
+    đúng tên sách dài ("tìm sách bọt tháng ngày"). "sách về gia đình", "truyện trọng
+    sinh" là hỏi theo chủ đề -> chain
+  - top_views / top_downloads: sách xem / tải nhiều nhất, có thể theo thể loại
+  - genre: liệt kê sách của 1 thể loại ("liệt kê sách trinh thám", "truyện kinh dị")
+Thể loại client truyền vào thắng thể loại nhắc trong câu hỏi (BookCatalog.query_genre,
+giống filter của chain); tên sách thuộc thể loại khác không được trả lời theo tên.
+Câu hỏi khác (gợi ý theo nội dung, hỏi đáp...) vẫn đi qua chain như cũ.
+"""
+import re
+import threading
+
+from chatbot.hybrid_retriever import (
+    FILLER_WORDS, MIN_LOOSE_TITLE_TOKENS, strip_fillers, title_core, tokenize,
+)
+
+
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 20
+
+TOP_VIEWS_PHRASES = ("xem nhieu nhat", "nhieu luot xem", "luot xem cao", "nhieu nguoi xem",
+                     "pho bien nhat", "most viewed")
+TOP_DOWNLOADS_PHRASES = ("tai nhieu nhat", "nhieu luot tai", "luot tai cao", "nhieu nguoi tai",
+                         "download nhieu", "most downloaded")
+LIST_PHRASES = ("liet ke", "danh sach", "list", "co nhung", "nhung cuon", "nhung quyen",
+                "cac cuon", "cac quyen", "nhung sach", "cac sach", "nhung truyen", "cac truyen")
+LIMIT_PATTERN = re.compile(r"\b(?:top\s*(\d{1,2})|(\d{1,2})\s*(?:cuon|quyen|sach|truyen))\b")
+QUOTED_PATTERN = re.compile(r'["“”«»]([^"“”«»]+)["“”«»]')
+
+
+def _has_phrase(padded, phrases):
+    return any(f" {phrase} " in padded for phrase in phrases)
+
+
+def _written_as_title(question, title):
+    """Tên sách (có ít nhất 2 từ viết hoa) được gõ đúng chữ hoa / thường như trong dữ liệu"""
+    return sum(word[:1].isupper() for word in title.split()) >= 2 and title in question
+
+
+class IntentRouter:
+    """
+    Args:
+        catalog: BookCatalog (có thể thay bằng catalog mới khi dữ liệu đổi)
+    """
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self.counters = {"title": 0, "top_views": 0, "top_downloads": 0, "genre": 0, "chain": 0}
+
+    def _count(self, intent):
+        with self._lock:
+            self.counters[intent] += 1
+
+    @staticmethod
+    def _limit(normalized):
+        match = LIMIT_PATTERN.search(normalized)
+        if match is None:
+            return DEFAULT_LIMIT
+        return max(1, min(MAX_LIMIT, int(match.group(1) or match.group(2))))
+
+    def route(self, question, genre=None):
+        """
+        Trả lời câu hỏi tra cứu từ catalog.
+
+        Args:
+            question: câu hỏi
+            genre: thể loại (chuẩn hóa) do client chọn, thắng thể loại nhắc trong câu hỏi
+
+        Returns:
+            dict | None: {"intent", "answer", "books"}, None nếu cần chạy chain
+        """
+        catalog = self.catalog
+        if catalog is None or len(catalog) == 0:
+            return None
+
+        normalized = catalog.normalize(question)
+        tokens = tokenize(normalized)
+        core = " ".join(strip_fillers(tokens, FILLER_WORDS))
+        padded = f" {' '.join(tokens)} "
+
+        result = None
+        title_ids = catalog.in_genre(self._find_title(question, normalized, tokens), genre)
+        if title_ids:
+            result = self._answer_title(title_ids)
+        elif _has_phrase(padded, TOP_DOWNLOADS_PHRASES):
+            result = self._answer_top("downloads", question, normalized, genre)
+        elif _has_phrase(padded, TOP_VIEWS_PHRASES):
+            result = self._answer_top("views", question, normalized, genre)
+        else:
+            genre = catalog.query_genre(question, genre)
+            # Chỉ khi rõ là yêu cầu liệt kê, hoặc câu hỏi chỉ gồm tên thể loại
+            if genre is not None and (_has_phrase(padded, LIST_PHRASES)
+                                      or core == " ".join(tokenize(genre))):
+                result = self._answer_genre(genre, normalized)
+
+        self._count(result["intent"] if result else "chain")
+        return result
+
+    def _find_title(self, question, normalized, tokens):
+        """Vị trí sách nếu câu hỏi chắc chắn là hỏi tên 1 cuốn sách, rỗng nếu không"""
+        catalog = self.catalog
+        ids = catalog.find_title(normalized)
+        if ids:
+            return ids
+        for quoted in QUOTED_PATTERN.findall(question):
+            ids = catalog.find_title(catalog.normalize(quoted))
+            if ids:
+                return ids
+        # Tên 1 từ chỉ khớp khi câu hỏi đúng bằng tên, tránh nhầm "sách hay" với sách "Hay"
+        core = title_core(tokens)
+        if len(core) < 2:
+            return []
+        ids = catalog.find_title(" ".join(core))
+        if ids and (len(core) >= MIN_LOOSE_TITLE_TOKENS
+                    or any(_written_as_title(question, catalog.docs[i].metadata["title"]) for i in ids)):
+            return ids
+        return []
+
+    # --- CÂU TRẢ LỜI ---
+    def _answer_title(self, ids):
+        catalog = self.catalog
+        books = catalog.books(ids)
+        first = books[0]
+        answer = f"Đã tìm thấy sách \"{first['title']}\" (thể loại {first['genre']}): {first['url']}"
+        if len(books) > 1:
+            answer += f"\nCó {len(books)} bản cùng tên trong dữ liệu, xem danh sách bên dưới."
+        return {"intent": "title", "answer": answer, "books": books}
+
+    def _listing(self, header, ids, field=None):
+        catalog = self.catalog
+        books = catalog.books(ids)
+        lines = [header]
+        for n, (i, book) in enumerate(zip(ids, books), start=1):
+            line = f"{n}. {book['title']} ({book['genre']})"
+            if field == "views":
+                line += f" - {catalog.docs[i].metadata['views']} lượt xem"
+            elif field == "downloads":
+                line += f" - {catalog.docs[i].metadata['downloads']} lượt tải"
+            lines.append(line)
+        return "\n".join(lines), books
+
+    def _answer_top(self, field, question, normalized, genre=None):
+        catalog = self.catalog
+        genre = catalog.query_genre(question, genre)
+        limit = self._limit(normalized)
+        ids = catalog.top(field, limit, genre)
+        action = "xem" if field == "views" else "tải"
+        scope = f" thể loại {catalog.genre_name(genre)}" if genre else ""
+        answer, books = self._listing(f"Top {len(ids)} sách{scope} được {action} nhiều nhất:", ids, field)
+        return {"intent": f"top_{field}", "answer": answer, "books": books}
+
+    def _answer_genre(self, genre, normalized):
+        catalog = self.catalog
+        ids = catalog.top("views", self._limit(normalized), genre)
+        answer, books = self._listing(
+            f"Một số sách thể loại {catalog.genre_name(genre)} được nhiều người đọc:", ids
+        )
+        return {"intent": "genre", "answer": answer, "books": books}
+
+    def stats(self):
+        with self._lock:
+            routed = sum(v for k, v in self.counters.items() if k != "chain")
+            total = routed + self.counters["chain"]
+            return {**self.counters, "fast_path_rate": routed / total if total else 0.0}
@@ -0,0 +1,162 @@
+"""
+Client Redis tối giản (giao thức RESP2) qua socket, hỗ trợ pipeline.
+
+Đủ cho kho session (GET/SET/RPUSH/LRANGE/EXPIRE/SCAN...), không cần thêm thư
+viện. Chạy được với mọi server nói giao thức Redis (Redis, Valkey, KeyDB hoặc
+1 server giả lập cục bộ khi test).
+
+Lệnh không được gửi lại khi kết nối đứt sau khi đã gửi: RPUSH / INCR... có
+thể đã chạy trên server, gửi lại sẽ ghi 2 lần. Thay vào đó kết nối cũ được
+kiểm tra trước khi gửi (server đóng kết nối idle -> kết nối lại).
+"""
+import select
+import socket
+import threading
+from urllib.parse import urlparse
+
+
+class RedisError(Exception):
+    """Server trả về lỗi (-ERR ...)"""
+
+
+class RedisClient:
+    """
+    Args:
+        url: redis://[:password@]host:port/db
+        timeout: timeout socket (giây)
+    """
+    def __init__(self, url="redis://localhost:6379/0", timeout=5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+
+    # --- KẾT NỐI ---
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._file = sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            self._roundtrip(setup)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._file = None
+
+    # --- GIAO THỨC ---
+    @staticmethod
+    def _encode(command):
+        parts = [f"*{len(command)}\r\n".encode()]
+        for arg in command:
+            if isinstance(arg, bytes):
+                data = arg
+            else:
+                data = str(arg).encode("utf-8")
+            parts.append(f"${len(data)}\r\n".encode())
+            parts.append(data)
+            parts.append(b"\r\n")
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Redis đóng kết nối")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            return RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError(f"Reply không hợp lệ: {line!r}")
+
+    def _roundtrip(self, commands):
+        self._sock.sendall(b"".join(self._encode(cmd) for cmd in commands))
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def _stale(self):
+        """
+        Kết nối cũ không dùng được nữa: server đã đóng (EOF) hoặc còn dữ liệu
+        thừa chưa đọc. Lúc rảnh socket không được có gì để đọc.
+        """
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _ensure_connected(self):
+        """Kết nối (lại) trước khi gửi, thử 2 lần: chưa gửi lệnh nào nên an toàn"""
+        if self._sock is not None and self._stale():
+            self._close()
+        for attempt in range(2):
+            if self._sock is not None:
+                return
+            try:
+                self._connect()
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt:
+                    raise
+
+    def pipeline(self, *commands):
+        """
+        Gửi nhiều lệnh trong 1 lần (1 round-trip), trả về list kết quả.
+        Chỉ kết nối lại khi chưa gửi gì; đứt kết nối sau khi đã gửi thì báo lỗi
+        luôn, không gửi lại (không biết server đã chạy lệnh nào).
+        """
+        with self._lock:
+            self._ensure_connected()
+            try:
+                return self._roundtrip(commands)
+            except (ConnectionError, OSError):
+                self._close()
+                raise
+
+    def execute(self, *command):
+        return self.pipeline(command)[0]
+
+    def scan_iter(self, match, count=500):
+        """Duyệt key theo mẫu bằng SCAN (không chặn server như KEYS)"""
+        cursor = "0"
+        while True:
+            cursor, keys = self.execute("SCAN", cursor, "MATCH", match, "COUNT", count)
+            yield from keys
+            if cursor == "0":
+                return
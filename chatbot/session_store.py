@@ -0,0 +1,593 @@
+"""
+Kho session của ChatbotEngine.
+
+SessionStore: dict có giới hạn, LRU theo số lượng + TTL theo thời gian không
+hoạt động. Khi vượt max_entries thì session ít dùng nhất bị xóa, session không
+hoạt động quá ttl_seconds bị xóa khi truy cập hoặc khi gọi sweep().
+
+SessionBackend: giao diện lưu lịch sử hội thoại, có bản trong RAM, SQLite và
+Redis để chạy nhiều worker / nhiều máy. Luồng dọn dẹp nền (gọi sweep() định kỳ)
+thuộc về backend, mỗi backend chỉ có 1 luồng.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict, deque
+
+from chatbot.redis_client import RedisClient
+
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class SessionStore:
+    """
+    Args:
+        max_entries: số session tối đa giữ trong bộ nhớ
+        ttl_seconds: thời gian không hoạt động tối đa (None = không hết hạn)
+    """
+    def __init__(self, max_entries=1000, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._data = OrderedDict()  # user_id -> [value, last_access], cũ nhất ở đầu
+        self._lock = threading.RLock()
+
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        self.removed = 0
+
+    # --- NỘI BỘ ---
+    def _expired(self, last_access, now):
+        return self.ttl_seconds is not None and now - last_access > self.ttl_seconds
+
+    def _live_entry(self, user_id, touch=True):
+        """Entry còn hạn của user_id (xóa nếu đã hết hạn), có thể cập nhật LRU"""
+        entry = self._data.get(user_id)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if self._expired(entry[1], now):
+            del self._data[user_id]
+            self.evicted_ttl += 1
+            return None
+        if touch:
+            entry[1] = now
+            self._data.move_to_end(user_id)
+        return entry
+
+    def _evict_overflow(self):
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evicted_lru += 1
+
+    # --- DICT API ---
+    def __contains__(self, user_id):
+        with self._lock:
+            return self._live_entry(user_id, touch=False) is not None
+
+    def __getitem__(self, user_id):
+        with self._lock:
+            entry = self._live_entry(user_id)
+            if entry is None:
+                raise KeyError(user_id)
+            return entry[0]
+
+    def get(self, user_id, default=None):
+        with self._lock:
+            entry = self._live_entry(user_id)
+            return default if entry is None else entry[0]
+
+    def __setitem__(self, user_id, value):
+        with self._lock:
+            if user_id not in self._data:
+                self.created += 1
+            self._data[user_id] = [value, time.monotonic()]
+            self._data.move_to_end(user_id)
+            self._evict_overflow()
+
+    def __delitem__(self, user_id):
+        with self._lock:
+            del self._data[user_id]
+            self.removed += 1
+
+    def pop(self, user_id, default=None):
+        """Xóa và trả về session còn hạn (session hết hạn coi như không có)"""
+        with self._lock:
+            entry = self._live_entry(user_id, touch=False)
+            if entry is None:
+                return default
+            del self._data[user_id]
+            self.removed += 1
+            return entry[0]
+
+    def get_or_create(self, user_id, factory):
+        """
+        Lấy session, tạo mới bằng factory() nếu chưa có (atomic).
+
+        Returns:
+            tuple: (value, created)
+        """
+        with self._lock:
+            entry = self._live_entry(user_id)
+            if entry is not None:
+                return entry[0], False
+            value = factory()
+            self[user_id] = value
+            return value, True
+
+    def keys(self):
+        """Danh sách user_id còn hạn"""
+        with self._lock:
+            now = time.monotonic()
+            return [uid for uid, (_, last) in self._data.items() if not self._expired(last, now)]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    # --- DỌN DẸP (backend gọi định kỳ) ---
+    def sweep(self):
+        """Xóa các session hết hạn, trả về số session đã xóa"""
+        if self.ttl_seconds is None:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            expired = []
+            # OrderedDict theo thứ tự truy cập -> dừng ở entry còn hạn đầu tiên
+            for user_id, (_, last_access) in self._data.items():
+                if not self._expired(last_access, now):
+                    break
+                expired.append(user_id)
+            for user_id in expired:
+                del self._data[user_id]
+            self.evicted_ttl += len(expired)
+            return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "occupancy": len(self._data) / self.max_entries if self.max_entries else 0.0,
+                "created": self.created,
+                "evicted_lru": self.evicted_lru,
+                "evicted_ttl": self.evicted_ttl,
+                "removed": self.removed,
+            }
+
+
+class SessionBackend:
+    """
+    Giao diện kho session của ChatbotEngine.
+
+    Mỗi session là lịch sử [(câu hỏi, câu trả lời)] của window_size lượt gần
+    nhất. Các implementation:
+      - MemorySessionBackend: trong process (LRU/TTL), 1 worker
+      - SQLiteSessionBackend: file SQLite dùng chung cho nhiều worker trên 1 máy
+      - RedisSessionBackend: server Redis, dùng chung cho nhiều máy
+    """
+    name = "base"
+
+    def __init__(self, window_size=5, sweep_interval=60):
+        self.window_size = window_size
+        self.sweep_interval = sweep_interval
+        self._stop = threading.Event()
+        self._sweeper = None
+
+    def load(self, user_id):
+        """Lịch sử của user, tạo session nếu chưa có. Trả về (history, created)"""
+        raise NotImplementedError
+
+    def append_turn(self, user_id, question, answer):
+        """Thêm 1 lượt hội thoại, chỉ giữ window_size lượt gần nhất"""
+        raise NotImplementedError
+
+    def get_history(self, user_id):
+        """Lịch sử của user, None nếu không có session"""
+        raise NotImplementedError
+
+    def clear(self, user_id):
+        """Xóa lịch sử nhưng giữ session, trả về False nếu không có session"""
+        raise NotImplementedError
+
+    def delete(self, user_id):
+        """Xóa hẳn session, trả về False nếu không có session"""
+        raise NotImplementedError
+
+    def list_users(self):
+        """Danh sách user_id đang có session"""
+        raise NotImplementedError
+
+    def stats(self):
+        return {"backend": self.name}
+
+    # --- DỌN DẸP NỀN (mặc định gọi sweep() định kỳ) ---
+    def sweep(self):
+        return 0
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            removed = self.sweep()
+            if removed:
+                print(f">> Đã dọn {removed} session hết hạn")
+
+    def start_sweeper(self):
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=self.sweep_interval)
+            self._sweeper = None
+
+
+class MemorySessionBackend(SessionBackend):
+    """Session trong RAM của process: SessionStore chứa deque(maxlen=window_size)"""
+    name = "memory"
+
+    def __init__(self, window_size=5, max_entries=1000, ttl_seconds=3600, sweep_interval=60):
+        super().__init__(window_size, sweep_interval)
+        self.store = SessionStore(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def _new_history(self):
+        return deque(maxlen=self.window_size)
+
+    def load(self, user_id):
+        history, created = self.store.get_or_create(user_id, self._new_history)
+        return list(history), created
+
+    def append_turn(self, user_id, question, answer):
+        history, _ = self.store.get_or_create(user_id, self._new_history)
+        history.append((question, answer))
+
+    def get_history(self, user_id):
+        history = self.store.get(user_id)
+        return None if history is None else list(history)
+
+    def clear(self, user_id):
+        history = self.store.get(user_id)
+        if history is None:
+            return False
+        history.clear()
+        return True
+
+    def delete(self, user_id):
+        return self.store.pop(user_id) is not None
+
+    def list_users(self):
+        return self.store.keys()
+
+    def stats(self):
+        return {"backend": self.name, **self.store.stats()}
+
+    def sweep(self):
+        return self.store.sweep()
+
+
+def _dump_history(history):
+    """Lịch sử -> JSON gọn (không khoảng trắng, giữ nguyên tiếng Việt)"""
+    return json.dumps(history, ensure_ascii=False, separators=(",", ":"))
+
+
+def _load_history(raw):
+    return [tuple(turn) for turn in json.loads(raw)]
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Session lưu trong 1 file SQLite (WAL), dùng chung cho nhiều worker uvicorn
+    trên cùng 1 máy. Mỗi session là 1 dòng, lịch sử là JSON gọn.
+
+    Args:
+        path: đường dẫn file SQLite
+        window_size: số lượt hội thoại giữ lại
+        max_entries: số session tối đa (xóa session cũ nhất khi vượt)
+        ttl_seconds: thời gian không hoạt động tối đa
+    """
+    name = "sqlite"
+
+    def __init__(self, path, window_size=5, max_entries=1000, ttl_seconds=3600, sweep_interval=60):
+        super().__init__(window_size, sweep_interval)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                user_id TEXT PRIMARY KEY,
+                history TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at)")
+
+    def _conn(self):
+        """Mỗi thread 1 connection (sqlite3 không chia sẻ connection giữa thread)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _expired(self, updated_at, now):
+        return self.ttl_seconds is not None and now - updated_at > self.ttl_seconds
+
+    def _read(self, conn, user_id, now):
+        row = conn.execute(
+            "SELECT history, updated_at FROM sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self._expired(row[1], now):
+            conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            self.evicted_ttl += 1
+            return None
+        return _load_history(row[0])
+
+    def _write(self, conn, user_id, history, now):
+        conn.execute(
+            "INSERT INTO sessions (user_id, history, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET history = excluded.history, updated_at = excluded.updated_at",
+            (user_id, _dump_history(history[-self.window_size:]), now),
+        )
+
+    def _evict_overflow(self, conn):
+        if self.max_entries is None:
+            return
+        cursor = conn.execute(
+            "DELETE FROM sessions WHERE user_id IN ("
+            "SELECT user_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.evicted_lru += cursor.rowcount
+
+    def load(self, user_id):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            history = self._read(conn, user_id, now)
+            created = history is None
+            if created:
+                history = []
+                self._write(conn, user_id, history, now)
+                self._evict_overflow(conn)
+                self.created += 1
+            else:
+                conn.execute("UPDATE sessions SET updated_at = ? WHERE user_id = ?", (now, user_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return history, created
+
+    def append_turn(self, user_id, question, answer):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            history = self._read(conn, user_id, now) or []
+            history.append((question, answer))
+            self._write(conn, user_id, history, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_history(self, user_id):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT history, updated_at FROM sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None or self._expired(row[1], time.time()):
+            return None
+        return _load_history(row[0])
+
+    # Session hết hạn coi như không có: không được clear làm sống lại, delete trả về False
+    # (dòng hết hạn để sweep / _read xóa)
+    def clear(self, user_id):
+        cursor = self._conn().execute(
+            "UPDATE sessions SET history = '[]', updated_at = ? WHERE user_id = ? AND updated_at >= ?",
+            (time.time(), user_id, self._min_updated_at()),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, user_id):
+        cursor = self._conn().execute(
+            "DELETE FROM sessions WHERE user_id = ? AND updated_at >= ?",
+            (user_id, self._min_updated_at()),
+        )
+        return cursor.rowcount > 0
+
+    def _min_updated_at(self):
+        return float("-inf") if self.ttl_seconds is None else time.time() - self.ttl_seconds
+
+    def list_users(self):
+        rows = self._conn().execute(
+            "SELECT user_id FROM sessions WHERE updated_at >= ? ORDER BY updated_at",
+            (self._min_updated_at(),),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def sweep(self):
+        if self.ttl_seconds is None:
+            return 0
+        cursor = self._conn().execute(
+            "DELETE FROM sessions WHERE updated_at < ?", (self._min_updated_at(),)
+        )
+        self.evicted_ttl += cursor.rowcount
+        return cursor.rowcount
+
+    def stats(self):
+        active = self._conn().execute(
+            "SELECT COUNT(*) FROM sessions WHERE updated_at >= ?", (self._min_updated_at(),)
+        ).fetchone()[0]
+        return {
+            "backend": self.name,
+            "active": active,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "occupancy": active / self.max_entries if self.max_entries else 0.0,
+            "created": self.created,
+            "evicted_lru": self.evicted_lru,
+            "evicted_ttl": self.evicted_ttl,
+        }
+
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Session lưu trên Redis, dùng chung cho nhiều worker / nhiều máy.
+
+    Mỗi session gồm 2 key:
+      - {prefix}{user_id}:s  đánh dấu session tồn tại
+      - {prefix}{user_id}:h  list các lượt hội thoại (JSON gọn), RPUSH + LTRIM
+    và 1 sorted set {prefix}users (user_id -> thời điểm truy cập cuối) dùng chung
+    để đếm / liệt kê session mà không phải SCAN cả keyspace.
+    Mọi thao tác đọc / ghi của 1 request được gửi trong 1 pipeline (1 round-trip).
+    TTL do Redis tự xử lý bằng PEXPIRE; giới hạn bộ nhớ dùng maxmemory-policy
+    (không có max_entries).
+
+    Args:
+        url: redis://host:port/db
+        window_size: số lượt hội thoại giữ lại
+        ttl_seconds: thời gian không hoạt động tối đa
+        prefix: tiền tố key
+    """
+    name = "redis"
+
+    def __init__(self, url="redis://localhost:6379/0", window_size=5, ttl_seconds=3600,
+                 prefix="chatbot:session:", client=None):
+        super().__init__(window_size)
+        self.client = client or RedisClient(url)
+        self.ttl_seconds = ttl_seconds or None
+        self.prefix = prefix
+        self.users_key = f"{prefix}users"
+        self.created = 0
+
+    def _keys(self, user_id):
+        base = f"{self.prefix}{user_id}"
+        return f"{base}:s", f"{base}:h"
+
+    def _touch(self, user_id, *keys):
+        """Gia hạn TTL các key và ghi thời điểm truy cập vào {prefix}users"""
+        commands = [("ZADD", self.users_key, repr(time.time()), user_id)]
+        if self.ttl_seconds:
+            ttl_ms = max(1, int(self.ttl_seconds * 1000))
+            commands += [("PEXPIRE", key, ttl_ms) for key in keys]
+        return commands
+
+    def _prune(self):
+        """Xóa user_id đã hết hạn khỏi {prefix}users (key của session đã được Redis xóa)"""
+        if not self.ttl_seconds:
+            return []
+        return [("ZREMRANGEBYSCORE", self.users_key, "-inf", f"({time.time() - self.ttl_seconds!r}")]
+
+    def load(self, user_id):
+        marker, history_key = self._keys(user_id)
+        # SET NX: tạo session nếu chưa có; cùng round-trip đọc lịch sử + gia hạn TTL
+        created, turns, *_ = self.client.pipeline(
+            ("SET", marker, "1", "NX"),
+            ("LRANGE", history_key, 0, -1),
+            *self._touch(user_id, marker, history_key),
+        )
+        created = created is not None
+        if created:
+            self.created += 1
+        return [tuple(json.loads(turn)) for turn in turns], created
+
+    def append_turn(self, user_id, question, answer):
+        marker, history_key = self._keys(user_id)
+        self.client.pipeline(
+            ("SET", marker, "1"),
+            ("RPUSH", history_key, _dump_history([question, answer])),
+            ("LTRIM", history_key, -self.window_size, -1),
+            *self._touch(user_id, marker, history_key),
+        )
+
+    def get_history(self, user_id):
+        marker, history_key = self._keys(user_id)
+        exists, turns = self.client.pipeline(
+            ("EXISTS", marker),
+            ("LRANGE", history_key, 0, -1),
+        )
+        if not exists:
+            return None
+        return [tuple(json.loads(turn)) for turn in turns]
+
+    def clear(self, user_id):
+        marker, history_key = self._keys(user_id)
+        exists, _ = self.client.pipeline(("EXISTS", marker), ("DEL", history_key))
+        return bool(exists)
+
+    def delete(self, user_id):
+        marker, history_key = self._keys(user_id)
+        removed, _ = self.client.pipeline(
+            ("DEL", marker, history_key),
+            ("ZREM", self.users_key, user_id),
+        )
+        return bool(removed)
+
+    def list_users(self):
+        """user_id còn hạn, truy cập cũ nhất trước"""
+        *_, users = self.client.pipeline(
+            *self._prune(),
+            ("ZRANGE", self.users_key, 0, -1),
+        )
+        return users
+
+    def start_sweeper(self):
+        """TTL do Redis tự xử lý (PEXPIRE), không cần luồng dọn dẹp"""
+
+    def stats(self):
+        # ZCARD trên {prefix}users: O(1) + xóa phần đã hết hạn, không SCAN keyspace
+        *_, active = self.client.pipeline(*self._prune(), ("ZCARD", self.users_key))
+        return {
+            "backend": self.name,
+            "active": active,
+            "ttl_seconds": self.ttl_seconds,
+            "created": self.created,
+        }
+
+
+def create_session_backend(kind="memory", window_size=5, max_entries=None, ttl_seconds=3600,
+                           sqlite_path="cache/sessions.db", redis_url="redis://localhost:6379/0"):
+    """
+    Tạo kho session theo tên: memory | sqlite | redis
+
+    max_entries: số session tối đa (None = DEFAULT_MAX_ENTRIES). Redis không
+    giới hạn theo số session (dùng maxmemory-policy) -> truyền max_entries với
+    redis chỉ cảnh báo và bị bỏ qua.
+    """
+    if kind == "redis":
+        if max_entries is not None:
+            warnings.warn(
+                "SESSION_MAX_ENTRIES không áp dụng cho SESSION_BACKEND=redis "
+                "(giới hạn bộ nhớ bằng maxmemory-policy của Redis)",
+                stacklevel=2,
+            )
+        return RedisSessionBackend(redis_url, window_size, ttl_seconds=ttl_seconds)
+    if max_entries is None:
+        max_entries = DEFAULT_MAX_ENTRIES
+    if kind == "memory":
+        return MemorySessionBackend(window_size, max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if kind == "sqlite":
+        return SQLiteSessionBackend(sqlite_path, window_size, max_entries=max_entries,
+                                    ttl_seconds=ttl_seconds)
+    raise ValueError(f"SESSION_BACKEND không hợp lệ: {kind}")
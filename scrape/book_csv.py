@@ -1,36 +1,258 @@
-import os
+"""
+Lưu sách cào được vào CSV theo kiểu chỉ ghi thêm (append-only).
+
+Cạnh mỗi CSV có 1 file chỉ mục khóa <file>.csv.keys: mỗi dòng là 1 khóa
+(title, url) dạng JSON, sau mỗi lần ghi thêm 1 dòng "#size <số byte CSV>".
+update_csv chỉ đọc chỉ mục (không đọc lại cả CSV bằng pandas), lọc ra sách có
+khóa mới rồi ghi thêm vào cuối CSV -> chi phí theo số sách mới, không theo
+kích thước file.
+
+An toàn khi bị dừng giữa chừng:
+  - tạo file mới / compact / dựng lại chỉ mục: ghi ra file tạm rồi os.replace
+  - ghi thêm: 1 lần write + fsync; dòng ghi dở ở cuối CSV (không có "\\n") bị
+    cắt bỏ ở lần ghi sau, sách đó sẽ được thêm lại vì chưa có trong chỉ mục
+  - chỉ mục lệch với CSV (số byte khác "#size" cuối cùng, thiếu file) -> dựng lại
+    từ CSV
+
+compact xóa dòng trùng hoàn toàn rồi trùng (title, url) trong CSV (các CSV có
+sẵn trong data/ còn nhiều dòng trùng) và ghi lại chỉ mục. Chạy từ thư mục gốc:
+    uv run python -m scrape.book_csv compact data
+"""
+import argparse
 import csv
+import glob
+import json
+import os
+import tempfile
+import threading
+
 import pandas as pd
 from dotenv import load_dotenv
 
 load_dotenv(dotenv_path="url.env")
 
+KEY_COLUMNS = ["title", "url"]
+INDEX_SUFFIX = ".keys"
+SIZE_MARK = "#size "
+
+# Khóa theo file: các job của scheduler chạy song song trong nhiều thread
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def _file_lock(csv_file):
+    path = os.path.abspath(csv_file)
+    with _file_locks_guard:
+        return _file_locks.setdefault(path, threading.Lock())
+
+
+def _key(title, url):
+    """Khóa dedupe của 1 sách (giá trị thiếu -> "")"""
+    return tuple("" if pd.isna(v) else str(v) for v in (title, url))
+
+
+def _atomic_write(path, data: bytes):
+    """Ghi cả file qua file tạm cùng thư mục rồi os.replace"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _frame_bytes(df: pd.DataFrame, header: bool) -> bytes:
+    """Nội dung CSV của df giống to_csv(encoding='utf-8-sig') (BOM chỉ khi có header)"""
+    text = df.to_csv(index=False, header=header, lineterminator="\n")
+    return text.encode("utf-8-sig" if header else "utf-8")
+
+
+def _read_frame(csv_file) -> pd.DataFrame:
+    """Đọc CSV giữ nguyên chuỗi (không đổi "" thành NaN, không ép kiểu số)"""
+    return pd.read_csv(csv_file, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+
+
 class CSV_DATA_BOOK:
-    # CSV_FILE = os.getenv("data_book_path")  
-    
-    # cập nhật dữ liệu vào CSV
+    name = "csv"
+    # CSV_FILE = os.getenv("data_book_path")
+
+    # --- chỉ mục khóa (title, url) ---
+    @staticmethod
+    def index_path(csv_file:str) -> str:
+        return csv_file + INDEX_SUFFIX
+
+    def _load_index(self, csv_file:str):
+        """Tập khóa trong chỉ mục, None nếu thiếu hoặc lệch với CSV"""
+        try:
+            with open(self.index_path(csv_file), encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+
+        keys, pending, size = set(), [], None
+        for line in lines:
+            if line.startswith(SIZE_MARK):
+                keys.update(pending)
+                pending = []
+                size = int(line[len(SIZE_MARK):])
+            elif line:
+                try:
+                    pending.append(tuple(json.loads(line)))
+                except ValueError:
+                    return None
+        # Khóa sau "#size" cuối cùng là của lần ghi bị dừng giữa chừng -> bỏ qua
+        if size is None or size != os.path.getsize(csv_file):
+            return None
+        return keys
+
+    def _write_index(self, csv_file:str, keys):
+        lines = [json.dumps(list(key), ensure_ascii=False) for key in sorted(keys)]
+        lines.append(f"{SIZE_MARK}{os.path.getsize(csv_file)}")
+        _atomic_write(self.index_path(csv_file), ("\n".join(lines) + "\n").encode("utf-8"))
+
+    def _append_index(self, csv_file:str, keys):
+        lines = [json.dumps(list(key), ensure_ascii=False) for key in keys]
+        lines.append(f"{SIZE_MARK}{os.path.getsize(csv_file)}")
+        with open(self.index_path(csv_file), "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rebuild_index(self, csv_file:str) -> set:
+        print(f"Dựng lại chỉ mục khóa cho {csv_file}")
+        try:
+            df = pd.read_csv(csv_file, usecols=KEY_COLUMNS, dtype=str,
+                             keep_default_na=False, encoding="utf-8-sig")
+            keys = {_key(t, u) for t, u in zip(df["title"], df["url"])}
+        except (pd.errors.EmptyDataError, ValueError):
+            keys = set()
+        self._write_index(csv_file, keys)
+        return keys
+
+    def keys(self, csv_file:str) -> set:
+        """Tập khóa (title, url) đã có trong CSV"""
+        if not os.path.exists(csv_file) or os.path.getsize(csv_file) == 0:
+            return set()
+        keys = self._load_index(csv_file)
+        return keys if keys is not None else self._rebuild_index(csv_file)
+
+    # --- ghi ---
+    @staticmethod
+    def _read_header(csv_file:str) -> list:
+        with open(csv_file, encoding="utf-8-sig", newline="") as f:
+            return next(csv.reader(f), [])
+
+    @staticmethod
+    def _repair_tail(csv_file:str):
+        """Cắt dòng ghi dở ở cuối CSV (lần ghi thêm trước bị dừng giữa chừng)"""
+        with open(csv_file, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # Dòng cuối thường ngắn: đọc lùi từng khối cho tới khi gặp "\n"
+            end = size
+            while end > 0:
+                start = max(0, end - 4096)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    f.truncate(start + newline + 1)
+                    print(f"Đã cắt dòng ghi dở ở cuối {csv_file}")
+                    return
+                end = start
+
+    # ghi lại cả file (tạo mới, export từ SQLite) qua file tạm, kèm chỉ mục khóa
+    def write_csv(self, csv_file:str, new_data: pd.DataFrame):
+        os.makedirs(os.path.dirname(os.path.abspath(csv_file)), exist_ok=True)
+        _atomic_write(csv_file, _frame_bytes(new_data, header=True))
+        self._write_index(csv_file, {_key(t, u) for t, u in zip(new_data["title"], new_data["url"])})
+
+    # cập nhật dữ liệu vào CSV: chỉ ghi thêm sách có (title, url) chưa có
     def update_csv(self, csv_file:str, new_data: pd.DataFrame):
 
         if new_data.empty:
             print("Không có dữ liệu mới để cập nhật")
             return
-        
-        if not os.path.exists(csv_file) or os.path.getsize(csv_file) == 0:
-            combined = new_data
-            print("Tạo file CSV mới")
-        else:
-            try:
-                old_data = pd.read_csv(csv_file)
-                print(f"Dữ liệu cũ: {len(old_data)} sách")
-                combined = pd.concat([old_data, new_data]).drop_duplicates(subset=["title", "url"])
-                print(f"Sau khi loại bỏ trùng lặp: {len(combined)} sách")
-            except pd.errors.EmptyDataError:
-                combined = new_data
-                print("File CSV cũ trống, tạo mới")
-        
-        combined.to_csv(csv_file, index=False, encoding='utf-8-sig')
+
+        new_data = new_data.drop_duplicates(subset=KEY_COLUMNS)
+        with _file_lock(csv_file):
+            if not os.path.exists(csv_file) or os.path.getsize(csv_file) == 0:
+                self.write_csv(csv_file, new_data)
+                print(f"Tạo file CSV mới: đã lưu {len(new_data)} sách vào {csv_file}")
+                return
+
+            header = self._read_header(csv_file)
+            extra = [c for c in new_data.columns if c not in header]
+            if not header or extra:
+                # Thêm cột mới -> phải ghi lại cả file (giống bản cũ)
+                print(f"CSV thiếu cột {extra}, ghi lại toàn bộ file")
+                self._rewrite(csv_file, new_data)
+                return
+
+            self._repair_tail(csv_file)
+            known = self.keys(csv_file)
+            keys = [_key(t, u) for t, u in zip(new_data["title"], new_data["url"])]
+            is_new = [key not in known for key in keys]
+            rows = new_data[is_new]
+            print(f"Dữ liệu cũ: {len(known)} sách, {len(rows)}/{len(new_data)} sách mới")
+            if rows.empty:
+                return
+
+            data = _frame_bytes(rows.reindex(columns=header, fill_value=""), header=False)
+            with open(csv_file, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self._append_index(csv_file, [key for key, new in zip(keys, is_new) if new])
+            print(f"Đã thêm {len(rows)} sách vào {csv_file}")
+
+    def _rewrite(self, csv_file:str, new_data: pd.DataFrame):
+        try:
+            old_data = _read_frame(csv_file)
+        except pd.errors.EmptyDataError:
+            old_data = pd.DataFrame()
+        combined = pd.concat([old_data, new_data]).drop_duplicates(subset=KEY_COLUMNS)
+        self.write_csv(csv_file, combined)
         print(f"Đã lưu {len(combined)} sách vào {csv_file}")
-        
+
+    # xóa dòng trùng (toàn bộ cột, rồi theo title + url), ghi lại CSV và chỉ mục
+    def compact(self, csv_file:str) -> dict:
+        with _file_lock(csv_file):
+            if not os.path.exists(csv_file) or os.path.getsize(csv_file) == 0:
+                return {"file": csv_file, "rows": 0, "removed": 0}
+            self._repair_tail(csv_file)
+            df = _read_frame(csv_file)
+            compacted = df.drop_duplicates().drop_duplicates(subset=KEY_COLUMNS)
+            removed = len(df) - len(compacted)
+            if removed:
+                _atomic_write(csv_file, _frame_bytes(compacted, header=True))
+            self._write_index(csv_file, {_key(t, u) for t, u in zip(compacted["title"], compacted["url"])})
+            return {"file": csv_file, "rows": len(compacted), "removed": removed}
+
+    def compact_dir(self, data_dir:str) -> list:
+        """compact mọi CSV trong data_dir (cả thư mục con)"""
+        results = []
+        for csv_file in sorted(glob.glob(f"{data_dir}/**/*.csv", recursive=True)):
+            result = self.compact(csv_file)
+            print(f"{csv_file}: còn {result['rows']} dòng, xóa {result['removed']} dòng trùng")
+            results.append(result)
+        return results
+
+    # tập URL sách đã có trong CSV (cào tăng dần: dừng khi gặp toàn sách cũ)
+    def get_known_urls(self, csv_file:str) -> set:
+        with _file_lock(csv_file):
+            return {url.strip() for _, url in self.keys(csv_file) if url.strip()}
+
     # lấy dữ liệu từ CSV
     def get_data(self, csv_file:str) -> list:
         if os.path.exists(csv_file) and os.path.getsize(csv_file) > 0:
@@ -43,4 +265,23 @@ class CSV_DATA_BOOK:
         else:
             print("File CSV không tồn tại hoặc trống")
             return books
-        
\ No newline at end of file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="xóa dòng trùng và dựng lại chỉ mục khóa")
+    compact.add_argument("path", nargs="?", default="data", help="thư mục data hoặc 1 file CSV")
+    args = parser.parse_args()
+
+    store = CSV_DATA_BOOK()
+    if os.path.isdir(args.path):
+        results = store.compact_dir(args.path)
+    else:
+        results = [store.compact(args.path)]
+    removed = sum(r["removed"] for r in results)
+    print(f">> Compact {len(results)} file, xóa {removed} dòng trùng")
+
+
+if __name__ == "__main__":
+    main()
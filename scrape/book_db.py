@@ -0,0 +1,309 @@
+"""
+Catalog sách trong SQLite, thay cho các CSV theo danh mục (CATALOG_BACKEND=sqlite).
+
+Bảng books có index trên title, url, genre (đã chuẩn hóa) và category (đường
+dẫn CSV tương đối so với data_dir, giống cột category của chatbot.ingest), thêm
+bảng FTS5 trên tên sách đã chuẩn hóa (không dấu, chữ thường) để tìm theo từ.
+
+  - scraper: update_csv / get_known_urls cùng giao diện với CSV_DATA_BOOK,
+    mỗi danh mục xác định bằng đường dẫn CSV của nó (data_*_path trong url.env)
+  - chatbot: frame() + version() cho CatalogCorpus (chatbot.corpus_cache)
+  - API: search (FTS5), find_by_url
+
+Mỗi lần ghi có sách mới tăng version trong bảng meta, chatbot dùng version làm
+dấu vân tay corpus (không phải stat / đọc file nào).
+
+Import từ CSV / export ngược ra CSV, chạy từ thư mục gốc dự án:
+    uv run python -m scrape.book_db import data --db cache/catalog.db
+    uv run python -m scrape.book_db export data --db cache/catalog.db
+    uv run python -m scrape.book_db search "tham tu" --db cache/catalog.db
+"""
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+import uuid
+
+import pandas as pd
+
+from scrape.book_csv import CSV_DATA_BOOK, KEY_COLUMNS
+
+
+COLUMNS = ["title", "genre", "url", "img_path", "views", "downloads"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    title TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    url TEXT NOT NULL,
+    img_path TEXT NOT NULL,
+    views TEXT NOT NULL,
+    downloads TEXT NOT NULL,
+    title_normalized TEXT NOT NULL,
+    genre_key TEXT NOT NULL,
+    UNIQUE (category, title, url)
+);
+CREATE INDEX IF NOT EXISTS idx_books_title ON books(title);
+CREATE INDEX IF NOT EXISTS idx_books_url ON books(url);
+CREATE INDEX IF NOT EXISTS idx_books_genre ON books(genre_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+    title_normalized, content='books', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS books_ai AFTER INSERT ON books BEGIN
+    INSERT INTO books_fts(rowid, title_normalized) VALUES (new.id, new.title_normalized);
+END;
+CREATE TRIGGER IF NOT EXISTS books_ad AFTER DELETE ON books BEGIN
+    INSERT INTO books_fts(books_fts, rowid, title_normalized) VALUES ('delete', old.id, old.title_normalized);
+END;
+CREATE TRIGGER IF NOT EXISTS books_au AFTER UPDATE ON books BEGIN
+    INSERT INTO books_fts(books_fts, rowid, title_normalized) VALUES ('delete', old.id, old.title_normalized);
+    INSERT INTO books_fts(rowid, title_normalized) VALUES (new.id, new.title_normalized);
+END;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def normalize_title(text):
+    """Giống ChatbotEngine.normalize_text (không dấu, chữ thường, bỏ ký tự đặc biệt)"""
+    if not isinstance(text, str):
+        return str(text)
+    text = unicodedata.normalize('NFD', text.lower())
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    text = re.sub(r'[^\w\s:\-,]', ' ', text)
+    return ' '.join(text.split())
+
+
+def category_key(category):
+    """"adventure-horror/detective.csv" -> "adventure-horror/detective" (giống BookStore)"""
+    return os.path.splitext(str(category).replace(os.sep, "/"))[0].strip("/")
+
+
+def fts_query(q):
+    """Câu tìm kiếm -> truy vấn FTS5: mọi từ phải có, từ cuối khớp theo tiền tố"""
+    tokens = re.findall(r"\w+", normalize_title(q))
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class BookDB:
+    """
+    Args:
+        path: file SQLite
+        data_dir: thư mục CSV, dùng để đổi đường dẫn CSV <-> category
+    """
+    name = "sqlite"
+
+    def __init__(self, path, data_dir="data"):
+        self.path = path
+        self.data_dir = data_dir
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('catalog_id', ?)", (uuid.uuid4().hex,))
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0')")
+
+    def _conn(self):
+        """Mỗi thread 1 connection (scheduler ghi từ nhiều thread)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def category_of(self, csv_file:str) -> str:
+        """Đường dẫn CSV của danh mục -> category (giống chatbot.ingest.read_csv_frame)"""
+        return os.path.relpath(csv_file, self.data_dir)
+
+    def version(self) -> str:
+        """Dấu vân tay dữ liệu: đổi mỗi khi có sách mới (kể cả khi tạo lại file DB)"""
+        rows = dict(self._conn().execute("SELECT key, value FROM meta").fetchall())
+        return f"{rows['catalog_id']}:{rows['version']}"
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    # --- ghi ---
+    def insert(self, category:str, new_data: pd.DataFrame) -> int:
+        """Thêm sách chưa có (category, title, url), trả về số sách đã thêm"""
+        df = new_data.reindex(columns=COLUMNS).astype(object)
+        df = df.where(df.notna(), "").astype(str).drop_duplicates(subset=KEY_COLUMNS)
+        rows = [
+            (category, title, genre, url, img_path, views, downloads,
+             normalize_title(title), normalize_title(genre))
+            for title, genre, url, img_path, views, downloads in zip(*(df[c].tolist() for c in COLUMNS))
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = conn.executemany(
+                "INSERT OR IGNORE INTO books (category, title, genre, url, img_path, views, downloads, "
+                "title_normalized, genre_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            if added:
+                conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    # cập nhật sách của 1 danh mục (cùng giao diện CSV_DATA_BOOK.update_csv)
+    def update_csv(self, csv_file:str, new_data: pd.DataFrame):
+        if new_data.empty:
+            print("Không có dữ liệu mới để cập nhật")
+            return
+        category = self.category_of(csv_file)
+        added = self.insert(category, new_data)
+        print(f"Đã thêm {added}/{len(new_data)} sách mới vào catalog ({category})")
+
+    # tập URL sách đã có của danh mục (cào tăng dần)
+    def get_known_urls(self, csv_file:str) -> set:
+        rows = self._conn().execute(
+            "SELECT url FROM books WHERE category = ?", (self.category_of(csv_file),)
+        ).fetchall()
+        return {url.strip() for (url,) in rows if url.strip()}
+
+    # sách của 1 danh mục (cùng giao diện CSV_DATA_BOOK.get_data)
+    def get_data(self, csv_file:str) -> list:
+        return self.frame([self.category_of(csv_file)])[COLUMNS].to_dict("records")
+
+    # --- đọc ---
+    def frame(self, categories=None) -> pd.DataFrame:
+        """Sách theo thứ tự thêm vào, cột giống chatbot.ingest.read_csv_frame"""
+        sql = f"SELECT {', '.join(COLUMNS)}, category FROM books"
+        params = ()
+        if categories is not None:
+            sql += f" WHERE category IN ({', '.join('?' * len(categories))})"
+            params = tuple(categories)
+        rows = self._conn().execute(sql + " ORDER BY id", params).fetchall()
+        return pd.DataFrame(rows, columns=[*COLUMNS, "category"], dtype=object)
+
+    def categories(self) -> list:
+        rows = self._conn().execute("SELECT DISTINCT category FROM books ORDER BY category").fetchall()
+        return [category for (category,) in rows]
+
+    def _filters(self, genre, category):
+        clauses, params = [], []
+        if genre:
+            clauses.append("b.genre_key = ?")
+            params.append(normalize_title(genre))
+        if category:
+            key = category_key(category)
+            clauses.append("(b.category = ? OR b.category LIKE ? ESCAPE '\\')")
+            escaped = key.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params += [f"{key}.csv", f"{escaped}/%"]
+        return clauses, params
+
+    def search(self, q, genre=None, category=None, limit=20) -> list:
+        """
+        Tìm sách theo từ trong tên (FTS5, có dấu hoặc không, từ cuối theo tiền tố),
+        xếp theo bm25.
+
+        Returns:
+            list: dict sách (title, genre, url, img_path, views, downloads, category)
+        """
+        match = fts_query(q)
+        if match is None:
+            return []
+        clauses, params = self._filters(genre, category)
+        where = "".join(f" AND {c}" for c in clauses)
+        rows = self._conn().execute(
+            f"SELECT b.title, b.genre, b.url, b.img_path, b.views, b.downloads, b.category "
+            f"FROM books_fts JOIN books b ON b.id = books_fts.rowid "
+            f"WHERE books_fts MATCH ?{where} ORDER BY bm25(books_fts), b.id LIMIT ?",
+            (match, *params, limit),
+        ).fetchall()
+        keys = [*COLUMNS, "category"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    def find_by_url(self, url) -> list:
+        """Sách có url này (1 sách có thể nằm trong nhiều danh mục)"""
+        rows = self._conn().execute(
+            f"SELECT {', '.join(COLUMNS)}, category FROM books WHERE url = ? ORDER BY id", (url,)
+        ).fetchall()
+        keys = [*COLUMNS, "category"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    # --- import / export CSV ---
+    def import_csv(self, data_dir=None) -> dict:
+        """Nạp mọi CSV trong data_dir (bỏ qua sách đã có), trả về {category: số sách thêm}"""
+        data_dir = data_dir or self.data_dir
+        added = {}
+        # Cùng thứ tự glob với chatbot.ingest.list_csv_files -> corpus giống hệt khi đọc CSV
+        for csv_file in glob.glob(f"{data_dir}/**/*.csv", recursive=True):
+            try:
+                df = pd.read_csv(csv_file, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+            except pd.errors.EmptyDataError:
+                continue
+            category = os.path.relpath(csv_file, data_dir)
+            added[category] = self.insert(category, df)
+            print(f"{csv_file}: thêm {added[category]}/{len(df)} sách")
+        return added
+
+    def export_csv(self, data_dir=None) -> dict:
+        """Ghi lại CSV của từng danh mục từ catalog, trả về {category: số sách}"""
+        data_dir = data_dir or self.data_dir
+        store = CSV_DATA_BOOK()
+        exported = {}
+        for category in self.categories():
+            df = self.frame([category])[COLUMNS]
+            csv_file = os.path.join(data_dir, category)
+            store.write_csv(csv_file, df)
+            exported[category] = len(df)
+            print(f"{csv_file}: {len(df)} sách")
+        return exported
+
+
+def create_book_store(kind="csv", sqlite_path="cache/catalog.db", data_dir="data"):
+    """Nơi lưu sách cào được theo tên: csv | sqlite"""
+    if kind == "csv":
+        return CSV_DATA_BOOK()
+    if kind == "sqlite":
+        return BookDB(sqlite_path, data_dir)
+    raise ValueError(f"CATALOG_BACKEND không hợp lệ: {kind}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.getenv("CATALOG_SQLITE_PATH", "cache/catalog.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("import", help="nạp CSV vào catalog").add_argument("data_dir", nargs="?", default="data")
+    sub.add_parser("export", help="ghi catalog ra CSV").add_argument("data_dir", nargs="?", default="data")
+    search = sub.add_parser("search", help="tìm sách theo tên")
+    search.add_argument("q")
+    search.add_argument("--genre")
+    search.add_argument("--category")
+    search.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "search":
+        for book in BookDB(args.db).search(args.q, args.genre, args.category, args.limit):
+            print(f"{book['title']} | {book['genre']} | {book['category']} | {book['url']}")
+        return
+    db = BookDB(args.db, args.data_dir)
+    if args.command == "import":
+        added = db.import_csv()
+        print(f">> Import {len(added)} file, thêm {sum(added.values())} sách, catalog có {db.count()} sách")
+    else:
+        exported = db.export_csv()
+        print(f">> Export {len(exported)} danh mục, {sum(exported.values())} sách")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,171 @@
-from bs4 import BeautifulSoup
 import json
 import time
 from selenium.webdriver.common.by import By
 
-from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from scrape.parsers import (
+    CATEGORY, DOWNLOADS, PRODUCT, TITLE, VIEWS, parse_ebook_data, parse_pagination_relay,
+)
+
+
+# Lấy sách ngay trong trình duyệt: 1 lần execute_script trả về JSON của mọi thẻ
+# sách, không phải serialize cả DOM qua page_source rồi parse lại bằng Python.
+# Cùng selector và cùng cách lấy giá trị với scrape.parsers.parse_bs4.
+EXTRACT_SCRIPT = """
+var sel = arguments[0];
+var text = function (el) { return el.textContent.trim(); };
+var books = [];
+var products = document.querySelectorAll(sel.product);
+for (var i = 0; i < products.length; i++) {
+    var item = products[i];
+    var title = item.querySelector(sel.title);
+    if (!title) continue;
+    var views = item.querySelector(sel.views);
+    var downloads = item.querySelector(sel.downloads);
+    var category = item.querySelector(sel.category);
+    var img = item.querySelector('img');
+    books.push({
+        title: text(title),
+        genre: category ? text(category) : 'null',
+        url: title.getAttribute('href') || '',
+        img_path: img ? (img.getAttribute('data-src') || img.getAttribute('src') || '') : '',
+        views: views ? text(views) : '0',
+        downloads: downloads ? text(downloads) : '0'
+    });
+}
+return books;
+"""
+EXTRACT_SELECTORS = {"product": PRODUCT, "title": TITLE, "views": VIEWS,
+                     "downloads": DOWNLOADS, "category": CATEGORY}
+
+
+# Script đo hoạt động mạng của trang: đang có AJAX của jQuery thì trả về -1,
+# ngược lại trả về số resource đã tải (không đổi trong idle_ms -> mạng rảnh)
+NETWORK_STATE_SCRIPT = """
+if (!window.__resourceBufferRaised) {
+    performance.setResourceTimingBufferSize(100000);
+    window.__resourceBufferRaised = true;
+}
+if (document.readyState !== 'complete') return -1;
+if (window.jQuery && window.jQuery.active > 0) return -1;
+return performance.getEntriesByType('resource').length;
+"""
+
+RELAY_SCRIPT = """
+var relay = document.querySelector('[data-flatsome-relay]');
+return relay ? relay.getAttribute('data-flatsome-relay') : null;
+"""
+
+
+# Các selector có thể là popup/ads
+POPUP_SELECTORS = [
+    # Popup close buttons
+    'button[class*="close"]',
+    'button[class*="dismiss"]', 
+    '[class*="modal"] button',
+    '[class*="popup"] button',
+    '.close-button',
+    '.btn-close',
+    
+    # Ad close buttons
+    '[id*="close"]',
+    '[class*="ad-close"]',
+    '[aria-label*="close" i]',
+    '[title*="close" i]',
+    
+    # Overlay elements
+    '.overlay',
+    '.modal-backdrop',
+    '.popup-overlay'
+]
+
+# Có overlay che trang không (1 lần gọi JS thay cho quét từng selector):
+#  - phần tử popup/overlay ở trên đang hiển thị
+#  - hoặc phần tử position fixed, z-index cao che >= 30% màn hình ở giữa trang
+OVERLAY_SCRIPT = """
+var selectors = arguments[0];
+var visible = function (el) {
+    var rect = el.getBoundingClientRect();
+    var style = getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+};
+var candidates = document.querySelectorAll(selectors.join(','));
+for (var i = 0; i < candidates.length; i++) {
+    if (visible(candidates[i])) return true;
+}
+var area = window.innerWidth * window.innerHeight;
+var el = document.elementFromPoint(window.innerWidth / 2, window.innerHeight / 2);
+for (; el && el !== document.body; el = el.parentElement) {
+    var style = getComputedStyle(el);
+    if (style.position === 'fixed' && (parseInt(style.zIndex, 10) || 0) >= 100) {
+        var rect = el.getBoundingClientRect();
+        if (rect.width * rect.height >= 0.3 * area) return true;
+    }
+}
+return false;
+"""
+
+
+class NetworkIdle:
+    """
+    Điều kiện cho WebDriverWait: trang đã load xong, không còn AJAX và không
+    có resource mới trong idle_ms mili giây
+    """
+    def __init__(self, idle_ms=500):
+        self.idle = idle_ms / 1000
+        self._count = None
+        self._since = None
+
+    def __call__(self, driver):
+        count = driver.execute_script(NETWORK_STATE_SCRIPT)
+        now = time.monotonic()
+        if count is None or count < 0 or count != self._count:
+            self._count = count
+            self._since = now
+            return False
+        return now - self._since >= self.idle
+
+
 class Books:
-    def __init__(self, driver):
+    """
+    Args:
+        driver: Chrome driver
+        timeout: thời gian chờ tối đa (giây) cho nút next / lưới sách mới
+        idle_ms: mạng không có request mới trong idle_ms mili giây thì coi là rảnh
+        idle_timeout: chờ mạng rảnh tối đa (giây); hết giờ vẫn tiếp tục vì sách đã có
+            (trang có quảng cáo tải liên tục sẽ không bao giờ rảnh hẳn)
+        poll: chu kỳ kiểm tra các tín hiệu (giây)
+        parser: "js" (lấy sách trong trình duyệt) hoặc backend của scrape.parsers
+            cho page_source ("bs4" | "lxml" | "selectolax" | "auto")
+    """
+    def __init__(self, driver, timeout=10, idle_ms=500, idle_timeout=3, poll=0.1, parser="js"):
         self.driver = driver
+        self.parser = parser
+        self.timeout = timeout
+        self.idle_ms = idle_ms
+        self.idle_timeout = idle_timeout
+        self.poll = poll
+        # Thời gian chờ của từng lần chuyển trang: {"page", "seconds", "ok"}
+        self.wait_times = []
+        # Số lần kiểm tra overlay / số lần thực sự phải quét + click popup
+        self.overlay_checks = 0
+        self.popup_passes = 0
+
+    def _wait(self, timeout=None):
+        return WebDriverWait(self.driver, timeout or self.timeout, poll_frequency=self.poll)
         
     # lấy thông tin sách từ trang hiện tại  
     def get_ebook_data(self):
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-        
-        books = []
-        products = soup.select(".product-small")
-        
-        for item in products:
-            title_tag = item.select_one(".product-title a")
-            
-            if title_tag:
-                title = title_tag.text.strip()
-                link = title_tag.get("href", "")
-                
-                # Lấy thông tin lượt xem và tải xuống
-                views_tag = item.select_one(".tdk-product-loop-custom-product-meta .last-updated-date span")
-                downloads_tag = item.select_one(".tdk-product-loop-custom-product-meta .version")
-                
-                views = views_tag.text.strip() if views_tag else "0"
-                downloads = downloads_tag.text.strip() if downloads_tag else "0"
-                
-                # Lấy category
-                category_tag = item.select_one(".category")
-                category = category_tag.text.strip() if category_tag else "null"
-                
-                # Lấy ảnh (ưu tiên data-src, fallback src)
-                img_tag = item.select_one("img")
-                img_path = ""
-                if img_tag:
-                    img_path = img_tag.get("data-src") or img_tag.get("src") or ""
-                
-                books.append({
-                    "title": title,
-                    #"author": "",
-                    "genre": category,
-                    # "status": "",
-                    "url": link,
-                    "img_path": img_path,
-                    "views": views,
-                    "downloads": downloads
-                })
-        
-        return books
+        if self.parser == "js":
+            try:
+                return self.driver.execute_script(EXTRACT_SCRIPT, EXTRACT_SELECTORS)
+            except Exception as e:
+                print(f"Lấy sách bằng JavaScript lỗi, parse page_source: {e}")
+                return parse_ebook_data(self.driver.page_source)
+        return parse_ebook_data(self.driver.page_source, self.parser)
     
     
     # Lấy thông tin phân trang từ ux-relay data
@@ -77,47 +189,69 @@ class Books:
                 return 1, max_page
             except:
                 return 1, 1
-            
-            
+
+
+    # currentPage trong data-flatsome-relay (None nếu không có)
+    def _relay_page(self):
+        try:
+            relay = self.driver.execute_script(RELAY_SCRIPT)
+            return json.loads(relay).get('currentPage') if relay else None
+        except Exception:
+            return None
+
+
+    # Đợi lưới sách được thay: sách cũ bị gỡ khỏi DOM (stale) hoặc currentPage đổi
+    def wait_for_page_change(self, old_product, old_page, timeout=None):
+        def changed(driver):
+            if old_page is not None:
+                page = self._relay_page()
+                if page is not None and page != old_page:
+                    return True
+            return old_product is not None and EC.staleness_of(old_product)(driver)
+
+        self._wait(timeout).until(changed)
+
+
+    # Đợi mạng rảnh (không AJAX, không resource mới trong idle_ms), False nếu hết giờ
+    def wait_for_network_idle(self, timeout=None):
+        try:
+            self._wait(timeout or self.idle_timeout).until(NetworkIdle(self.idle_ms))
+            return True
+        except TimeoutException:
+            return False
+
+
+    # Thống kê thời gian chờ chuyển trang
+    def wait_stats(self):
+        seconds = sorted(item["seconds"] for item in self.wait_times)
+        if not seconds:
+            return {"turns": 0, "failed": 0, "mean": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "turns": len(seconds),
+            "failed": sum(1 for item in self.wait_times if not item["ok"]),
+            "mean": round(sum(seconds) / len(seconds), 3),
+            "p95": round(seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))], 3),
+            "max": round(seconds[-1], 3),
+        }
+
+
+    # Có popup / overlay đang che trang không
+    def has_overlay(self):
+        self.overlay_checks += 1
+        try:
+            return bool(self.driver.execute_script(OVERLAY_SCRIPT, POPUP_SELECTORS))
+        except Exception:
+            # Không kiểm tra được -> quét như cũ cho chắc
+            return True
+
+
     # Đóng các popup quảng cáo có thể xuất hiện        
     def close_popups_and_ads(self):
         try:
-            # Đợi một chút để popup load
-            time.sleep(2)
-            
-            # Danh sách các selector có thể là popup/ads
-            popup_selectors = [
-                # Popup close buttons
-                'button[class*="close"]',
-                'button[class*="dismiss"]', 
-                '[class*="modal"] button',
-                '[class*="popup"] button',
-                '.close-button',
-                '.btn-close',
-                
-                # Ad close buttons
-                '[id*="close"]',
-                '[class*="ad-close"]',
-                '[aria-label*="close" i]',
-                '[title*="close" i]',
-                
-                # Overlay elements
-                '.overlay',
-                '.modal-backdrop',
-                '.popup-overlay'
-            ]
-            
-            for selector in popup_selectors:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    for element in elements:
-                        if element.is_displayed():
-                            self.driver.execute_script("arguments[0].click();", element)
-                            print(f"Đã đóng popup với selector: {selector}")
-                            time.sleep(1)
-                            break
-                except:
-                    continue
+            # Chỉ quét + click từng selector khi thật sự có overlay
+            if self.has_overlay():
+                self.popup_passes += 1
+                self._click_popups()
                     
             # Kiểm tra nếu có tab/window mới bị mở
             if len(self.driver.window_handles) > 1:
@@ -130,54 +264,94 @@ class Books:
                 
         except Exception as e:
             print(f"Lỗi khi xử lý popup: {str(e)}")
+
+
+    # Quét các selector popup/ads và click nút đóng đang hiển thị
+    def _click_popups(self):
+        for selector in POPUP_SELECTORS:
+            try:
+                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                for element in elements:
+                    if element.is_displayed():
+                        self.driver.execute_script("arguments[0].click();", element)
+                        print(f"Đã đóng popup với selector: {selector}")
+                        # Đợi popup biến mất (tối đa 1s) thay cho sleep cố định
+                        try:
+                            self._wait(1).until(EC.invisibility_of_element(element))
+                        except TimeoutException:
+                            pass
+                        break
+            except:
+                continue
             
             
     def safe_click_next_page(self):
-        # Click an toàn vào nút next page với xử lý popup
+        """
+        Click an toàn vào nút next page với xử lý popup.
+        Không sleep cố định: chờ nút next click được, lưới sách cũ bị thay
+        (stale / currentPage đổi) rồi mạng rảnh, mỗi bước tối đa self.timeout giây.
+        Thời gian chờ được ghi vào self.wait_times.
+        """
+        start = time.perf_counter()
+        ok = False
+        old_page = None
         try:
             # Đóng popup trước khi click
             self.close_popups_and_ads()
             
             # Tìm nút next
-            next_button = WebDriverWait(self.driver, 5).until(
+            next_button = self._wait().until(
                 EC.element_to_be_clickable((By.CSS_SELECTOR, '.next.page-number'))
             )
             
-            # Scroll đến button và đợi
+            # Scroll đến button
             self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button)
-            time.sleep(5)
         
-            # Lưu URL hiện tại để kiểm tra
+            # Lưu trạng thái hiện tại để nhận biết trang mới
             current_url = self.driver.current_url
+            old_page = self._relay_page()
+            old_products = self.driver.find_elements(By.CSS_SELECTOR, '.product-small')
+            old_product = old_products[0] if old_products else None
             
             # Click bằng JavaScript để tránh các element che
             self.driver.execute_script("arguments[0].click();", next_button)
             print("Đã click nút Next")
             
-            # Đợi AJAX load
-            time.sleep(5)
-            
-            # Xử lý popup sau khi click
-            self.close_popups_and_ads()
+            # Đợi lưới sách mới thay lưới cũ
+            self.wait_for_page_change(old_product, old_page)
             
             # Kiểm tra xem có bị redirect không
             if self.driver.current_url != current_url:
                 print(f"Phát hiện redirect từ {current_url} sang {self.driver.current_url}")
                 self.driver.get(current_url)  # Quay về trang gốc
-                time.sleep(5)
+                self._wait().until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, '.product-small'))
+                )
                 return False
             
-            # Đợi nội dung mới load
-            WebDriverWait(self.driver, 5).until(
+            # Đợi nội dung mới load, rồi AJAX / ảnh của trang mới tải xong
+            self._wait().until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, '.product-small'))
             )
+            self.wait_for_network_idle()
             
-            # Thêm delay để đảm bảo hoàn tất
-            time.sleep(5)
-            
+            # Xử lý popup sau khi chuyển trang
+            self.close_popups_and_ads()
+            ok = True
             return True
             
+        except TimeoutException:
+            print(f"Hết {self.timeout}s chờ trang tiếp theo")
+            return False
         except Exception as e:
             print(f"Lỗi khi click next page: {str(e)}")
             self.close_popups_and_ads()
-            return False
\ No newline at end of file
+            return False
+        finally:
+            seconds = time.perf_counter() - start
+            self.wait_times.append({
+                "page": self._relay_page() if ok else None,
+                "seconds": round(seconds, 3),
+                "ok": ok,
+            })
+            print(f"Chuyển trang mất {seconds:.2f}s")
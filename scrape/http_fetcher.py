@@ -0,0 +1,145 @@
+"""
+Cào trang danh mục bằng HTTP thuần (httpx async), không mở Chrome.
+
+Các trang /page/{n}/ của danh mục là HTML tĩnh: tải qua 1 AsyncClient dùng
+chung (giữ kết nối keep-alive), tối đa max_concurrency request cùng lúc, rồi
+parse bằng scrape.parsers (cùng kết quả với Selenium). Số trang đọc từ
+data-flatsome-relay trong HTML trang đầu; trang không có relay hoặc không có
+sách (nội dung do JavaScript tạo) -> NeedsBrowser, người gọi chuyển sang Selenium.
+
+Cào tăng dần (có known_urls): tải từng đợt vài trang, dừng khi đã gặp
+stop_after trang liên tiếp không có sách mới.
+"""
+import asyncio
+
+import httpx
+import pandas as pd
+
+from scrape.parsers import parse_ebook_data, parse_pagination_relay, resolve_parser
+from scrape.scrape_web import NewBookTracker, category_page_url
+
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+
+class NeedsBrowser(Exception):
+    """Trang danh mục cần chạy JavaScript mới có phân trang / sách"""
+
+
+class HttpScraper:
+    """
+    Args:
+        max_concurrency: số request tối đa cùng lúc (cũng là số kết nối keep-alive)
+        timeout: timeout mỗi request (giây)
+        rate_limiter: HostRateLimiter dùng chung với Selenium (None = không giãn cách)
+        retries: số lần thử lại khi lỗi kết nối
+        parser: backend parse HTML ("bs4" | "lxml" | "selectolax" | "auto", None = SCRAPE_PARSER)
+    """
+    def __init__(self, max_concurrency=8, timeout=20.0, rate_limiter=None, retries=2, parser=None):
+        self.max_concurrency = max_concurrency
+        self.parser = resolve_parser(parser)
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.retries = retries
+        self._semaphore = None
+
+    def client(self):
+        """AsyncClient dùng chung cho mọi danh mục (pool kết nối keep-alive)"""
+        return httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency),
+            transport=httpx.AsyncHTTPTransport(retries=self.retries),
+        )
+
+    async def fetch(self, client, url):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            if self.rate_limiter:
+                await self.rate_limiter.wait_async(url)
+            response = await client.get(url)
+        response.raise_for_status()
+        return response.text
+
+    async def _scrape_page(self, client, url, page):
+        """Sách của 1 trang, None nếu trang lỗi (bỏ qua giống Selenium)"""
+        try:
+            html = await self.fetch(client, url)
+        except httpx.HTTPError as e:
+            print(f"Trang {page} không load được, bỏ qua: {e}")
+            return None
+        # Parse HTML tốn CPU -> chạy trong thread, không chặn các request khác
+        return await asyncio.to_thread(parse_ebook_data, html, self.parser)
+
+    async def scrape_category(self, client, url, stats=None, known_urls=None, stop_after=2):
+        """
+        Cào các trang của 1 danh mục.
+
+        Args:
+            client: AsyncClient từ client()
+            url: trang đầu của danh mục
+            stats: dict nhận số trang đã cào ("pages"), số sách mới ("new_books"),
+                có dừng sớm không ("stopped_early")
+            known_urls: URL sách đã có (từ CSV), None = cào hết mọi trang
+            stop_after: dừng sau stop_after trang liên tiếp không có sách mới
+
+        Returns:
+            DataFrame: giống Scrape.scrape_all_pages_selenium_2
+
+        Raises:
+            NeedsBrowser: trang đầu không có data-flatsome-relay hoặc không có sách
+        """
+        html = await self.fetch(client, url)
+        pagination = parse_pagination_relay(html)
+        first_page = await asyncio.to_thread(parse_ebook_data, html, self.parser)
+        if pagination is None or not first_page:
+            raise NeedsBrowser(url)
+
+        _, total_pages = pagination
+        print(f"Phát hiện {total_pages} trang: {url}")
+
+        all_books = list(first_page)
+        scraped = 1
+        tracker = NewBookTracker(known_urls, stop_after)
+        stop = tracker.add_page(first_page)
+        # Cào toàn bộ: tải mọi trang cùng lúc; cào tăng dần: từng đợt, mỗi đợt vừa đủ
+        # số trang để có thể chạm điều kiện dừng
+        page = 2
+        while page <= total_pages and not stop:
+            batch_size = total_pages if known_urls is None else tracker.pages_until_stop
+            batch = range(page, min(total_pages, page + batch_size - 1) + 1)
+            results = await asyncio.gather(*(
+                self._scrape_page(client, category_page_url(url, n), n) for n in batch
+            ))
+            for page_data in results:
+                if page_data is None:
+                    continue
+                all_books.extend(page_data)
+                scraped += 1
+                stop = stop or tracker.add_page(page_data)
+            page = batch[-1] + 1
+
+        if stats is not None:
+            stats["pages"] = scraped
+            stats.update(tracker.stats())
+        if tracker.stopped_early:
+            print(f"Dừng sớm sau {scraped}/{total_pages} trang ({tracker.new_books} sách mới): {url}")
+        print(f"Tổng cộng đã cào {len(all_books)} sách từ {scraped}/{total_pages} trang: {url}")
+
+        df = pd.DataFrame(all_books)
+        if df.empty:
+            return df
+        # Giống Selenium: xóa trùng theo toàn bộ cột rồi theo tên sách
+        return df.drop_duplicates().drop_duplicates(subset=["title"], keep="first")
+
+    def scrape_all_pages(self, url, stats=None, known_urls=None, stop_after=2):
+        """Bản đồng bộ của scrape_category cho 1 danh mục"""
+        async def run():
+            async with self.client() as client:
+                return await self.scrape_category(client, url, stats, known_urls, stop_after)
+        self._semaphore = None
+        return asyncio.run(run())
@@ -0,0 +1,233 @@
+"""
+Parser HTML trang danh mục -> list dict sách, nhiều backend cho cùng 1 kết quả.
+
+  - bs4: BeautifulSoup + html.parser (thuần Python, luôn có)
+  - lxml: lxml.html + XPath biên dịch sẵn (pip install lxml)
+  - selectolax: Lexbor qua selectolax (pip install selectolax), nhanh nhất
+
+Các backend cho ra đúng các dict giống bs4 (cùng thứ tự, cùng giá trị), kể
+cả việc thẻ .product-small lồng nhau của Flatsome (col > box) cho ra 2 dòng
+trùng (được drop_duplicates phía sau loại bỏ).
+
+Chọn backend: tham số parser, biến môi trường SCRAPE_PARSER, hoặc "auto"
+(selectolax > lxml > bs4 tùy thư viện đã cài).
+Đo và kiểm tra kết quả: python -m benchmarks.bench_parsers
+"""
+import html as html_lib
+import json
+import os
+import re
+
+from bs4 import BeautifulSoup
+
+
+# Selector của 1 thẻ sách (dùng chung cho mọi backend)
+PRODUCT = ".product-small"
+TITLE = ".product-title a"
+VIEWS = ".tdk-product-loop-custom-product-meta .last-updated-date span"
+DOWNLOADS = ".tdk-product-loop-custom-product-meta .version"
+CATEGORY = ".category"
+
+RELAY_PATTERN = re.compile(r"""data-flatsome-relay\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+
+def _book(title, link, views, downloads, category, img_path):
+    return {
+        "title": title,
+        #"author": "",
+        "genre": category,
+        # "status": "",
+        "url": link,
+        "img_path": img_path,
+        "views": views,
+        "downloads": downloads
+    }
+
+
+# --- bs4 ---
+def parse_bs4(html):
+    soup = html if isinstance(html, BeautifulSoup) else BeautifulSoup(html, 'html.parser')
+
+    books = []
+    products = soup.select(PRODUCT)
+
+    for item in products:
+        title_tag = item.select_one(TITLE)
+
+        if title_tag:
+            title = title_tag.text.strip()
+            link = title_tag.get("href", "")
+
+            # Lấy thông tin lượt xem và tải xuống
+            views_tag = item.select_one(VIEWS)
+            downloads_tag = item.select_one(DOWNLOADS)
+
+            views = views_tag.text.strip() if views_tag else "0"
+            downloads = downloads_tag.text.strip() if downloads_tag else "0"
+
+            # Lấy category
+            category_tag = item.select_one(CATEGORY)
+            category = category_tag.text.strip() if category_tag else "null"
+
+            # Lấy ảnh (ưu tiên data-src, fallback src)
+            img_tag = item.select_one("img")
+            img_path = ""
+            if img_tag:
+                img_path = img_tag.get("data-src") or img_tag.get("src") or ""
+
+            books.append(_book(title, link, views, downloads, category, img_path))
+
+    return books
+
+
+# --- lxml ---
+_lxml_xpaths = None
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _compile_lxml():
+    """XPath tương đương các selector CSS ở trên (kết quả theo thứ tự tài liệu)"""
+    global _lxml_xpaths
+    if _lxml_xpaths is None:
+        from lxml import etree
+        meta = f".//*[{_has_class('tdk-product-loop-custom-product-meta')}]"
+        _lxml_xpaths = {
+            "products": etree.XPath(f"//*[{_has_class('product-small')}]"),
+            "title": etree.XPath(f".//*[{_has_class('product-title')}]//a"),
+            "views": etree.XPath(f"{meta}//*[{_has_class('last-updated-date')}]//span"),
+            "downloads": etree.XPath(f"{meta}//*[{_has_class('version')}]"),
+            "category": etree.XPath(f".//*[{_has_class('category')}]"),
+            "img": etree.XPath(".//img"),
+        }
+    return _lxml_xpaths
+
+
+def parse_lxml(html):
+    import lxml.html
+
+    xpaths = _compile_lxml()
+    root = lxml.html.document_fromstring(html)
+
+    def first(name, item):
+        found = xpaths[name](item)
+        return found[0] if found else None
+
+    books = []
+    for item in xpaths["products"](root):
+        title_tag = first("title", item)
+        if title_tag is None:
+            continue
+        views_tag = first("views", item)
+        downloads_tag = first("downloads", item)
+        category_tag = first("category", item)
+        img_tag = first("img", item)
+        img_path = ""
+        if img_tag is not None:
+            img_path = img_tag.get("data-src") or img_tag.get("src") or ""
+        books.append(_book(
+            title_tag.text_content().strip(),
+            title_tag.get("href", ""),
+            views_tag.text_content().strip() if views_tag is not None else "0",
+            downloads_tag.text_content().strip() if downloads_tag is not None else "0",
+            category_tag.text_content().strip() if category_tag is not None else "null",
+            img_path,
+        ))
+    return books
+
+
+# --- selectolax ---
+def parse_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
+
+    def text(node):
+        return node.text(deep=True).strip()
+
+    def attr(node, name):
+        # Thuộc tính không có giá trị: bs4 trả về "", selectolax trả về None
+        value = node.attributes.get(name)
+        return "" if value is None and name in node.attributes else value
+
+    books = []
+    for item in LexborHTMLParser(html).css(PRODUCT):
+        title_tag = item.css_first(TITLE)
+        if title_tag is None:
+            continue
+        views_tag = item.css_first(VIEWS)
+        downloads_tag = item.css_first(DOWNLOADS)
+        category_tag = item.css_first(CATEGORY)
+        img_tag = item.css_first("img")
+        img_path = ""
+        if img_tag is not None:
+            img_path = attr(img_tag, "data-src") or attr(img_tag, "src") or ""
+        link = attr(title_tag, "href")
+        books.append(_book(
+            text(title_tag),
+            link if link is not None else "",
+            text(views_tag) if views_tag is not None else "0",
+            text(downloads_tag) if downloads_tag is not None else "0",
+            text(category_tag) if category_tag is not None else "null",
+            img_path,
+        ))
+    return books
+
+
+PARSERS = {"bs4": parse_bs4, "lxml": parse_lxml, "selectolax": parse_selectolax}
+_REQUIREMENTS = {"bs4": "bs4", "lxml": "lxml.html", "selectolax": "selectolax.lexbor"}
+_available = {}
+
+
+def is_available(name):
+    if name not in _available:
+        try:
+            __import__(_REQUIREMENTS[name])
+            _available[name] = True
+        except ImportError:
+            _available[name] = False
+    return _available[name]
+
+
+def available_parsers():
+    return [name for name in PARSERS if is_available(name)]
+
+
+def resolve_parser(name=None):
+    """Tên backend sẽ dùng: name -> SCRAPE_PARSER -> auto (selectolax > lxml > bs4)"""
+    name = name or os.getenv("SCRAPE_PARSER", "auto")
+    if name == "auto":
+        for candidate in ("selectolax", "lxml"):
+            if is_available(candidate):
+                return candidate
+        return "bs4"
+    if name not in PARSERS:
+        raise ValueError(f"Parser không hợp lệ: {name} (có: {', '.join(PARSERS)}, auto)")
+    if not is_available(name):
+        print(f"Chưa cài thư viện cho parser {name}, dùng bs4")
+        return "bs4"
+    return name
+
+
+# lấy thông tin sách từ HTML 1 trang danh mục (page_source của Selenium hoặc HTML tải bằng HTTP)
+def parse_ebook_data(html, parser=None):
+    if isinstance(html, BeautifulSoup):
+        return parse_bs4(html)
+    return PARSERS[resolve_parser(parser)](html)
+
+
+# thông tin phân trang từ thuộc tính data-flatsome-relay có sẵn trong HTML, None nếu không có
+def parse_pagination_relay(html):
+    if isinstance(html, BeautifulSoup):
+        relay_element = html.select_one('[data-flatsome-relay]')
+        raw = relay_element.get('data-flatsome-relay', '') if relay_element is not None else None
+    else:
+        match = RELAY_PATTERN.search(html)
+        raw = html_lib.unescape(match.group(1) if match.group(1) is not None else match.group(2)) if match else None
+    if raw is None:
+        return None
+    try:
+        relay_data = json.loads(raw)
+        return int(relay_data.get('currentPage', 1)), int(relay_data.get('totalPages', 1))
+    except (ValueError, TypeError, AttributeError):
+        return None
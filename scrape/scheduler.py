@@ -0,0 +1,364 @@
+"""
+Cào nhiều danh mục song song bằng 1 pool Chrome headless dùng lại được.
+
+  - DriverPool: tối đa `size` driver (tạo dần khi cần), mỗi danh mục mượn 1
+    driver rồi trả lại; driver lỗi thì bị đóng và tạo driver mới thay thế
+  - HostRateLimiter: giãn cách các lần tải trang tới cùng 1 host thay cho
+    time.sleep(5) cố định sau mỗi trang -> tổng tốc độ tới 1 host luôn bị
+    chặn, dù có bao nhiêu worker
+  - ScrapeScheduler: chạy các danh mục trên thread pool cùng kích thước với
+    pool driver, ghi CSV (hoặc catalog SQLite) của từng danh mục ngay khi xong,
+    trả về thời gian và số trang / giây của từng danh mục
+  - fetch_mode="http": tải các trang bằng HttpScraper trước (không mở Chrome),
+    chỉ danh mục cần JavaScript / tải HTTP lỗi mới chạy lại bằng Selenium;
+    lỗi khi ghi CSV / catalog là lỗi của job, không cào lại bằng Selenium
+  - incremental: chỉ cào tới khi gặp stop_after trang liên tiếp toàn sách đã
+    có trong CSV; mỗi danh mục vẫn được cào toàn bộ sau mỗi full_crawl_days
+    ngày (thời điểm cào toàn bộ gần nhất lưu trong ScrapeState)
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from scrape.book_csv import CSV_DATA_BOOK
+from scrape.http_fetcher import HttpScraper, NeedsBrowser
+from scrape.scrape_web import Scrape
+from scrape.setup_driver import setup_driver
+
+
+class HttpFetchError(Exception):
+    """Tải / parse danh mục bằng HTTP lỗi -> cào lại bằng Selenium"""
+
+
+class HostRateLimiter:
+    """
+    Mỗi host chỉ được bắt đầu 1 lần tải trang sau mỗi min_interval giây.
+
+    Args:
+        min_interval: khoảng cách tối thiểu (giây) giữa 2 lần tải tới cùng host
+    """
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self._next_slot = {}  # host -> thời điểm (monotonic) được tải tiếp
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _reserve(self, url):
+        """Giữ lượt tiếp theo của host, trả về số giây phải chờ tới lượt đó"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+            delay = slot - now
+            self.waited += delay
+        return delay
+
+    def wait(self, url):
+        """Chờ tới lượt của host trong url, trả về số giây đã chờ"""
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def wait_async(self, url):
+        """Giống wait() cho code async (không chặn event loop)"""
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class ScrapeState:
+    """
+    Thời điểm cào toàn bộ gần nhất của từng danh mục, lưu ra file JSON.
+
+    Args:
+        path: file JSON (None = chỉ giữ trong RAM)
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.last_full_crawl = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.last_full_crawl = json.load(f).get("last_full_crawl", {})
+            except (OSError, ValueError) as e:
+                print(f"Không đọc được trạng thái cào {path}: {e}")
+
+    def full_crawl_due(self, name, interval_seconds):
+        last = self.last_full_crawl.get(name)
+        return last is None or time.time() - last >= interval_seconds
+
+    def mark_full_crawl(self, name):
+        self.last_full_crawl[name] = time.time()
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"last_full_crawl": self.last_full_crawl}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class DriverPool:
+    """
+    Pool Chrome driver dùng lại giữa các danh mục.
+
+    Args:
+        size: số driver tối đa
+        factory: hàm tạo driver (mặc định setup_driver headless)
+        lean: driver mặc định dùng profile lean (chặn ảnh / font / media / quảng cáo)
+    """
+    def __init__(self, size=3, factory=None, lean=True):
+        self.size = size
+        self.factory = factory or (lambda: setup_driver(headless=True, lean=lean))
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._drivers = []
+        self.replaced = 0
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                break
+            # Pool đã đủ driver: chờ driver được trả lại (hoặc bị bỏ -> tạo mới)
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self._drivers.append(driver)
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self._created -= 1
+            self.replaced += 1
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def driver(self):
+        """Mượn 1 driver; lỗi trong lúc dùng thì driver bị đóng, không trả lại pool"""
+        driver = self._acquire()
+        try:
+            yield driver
+        except Exception:
+            self._discard(driver)
+            raise
+        self._idle.put(driver)
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+            self._created = 0
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+class ScrapeScheduler:
+    """
+    Args:
+        workers: số danh mục cào cùng lúc (= số Chrome driver)
+        min_interval: giãn cách tối thiểu (giây) giữa 2 lần tải trang tới cùng host
+        driver_factory: hàm tạo driver (mặc định setup_driver headless)
+        fetch_mode: "http" (HTTP trước, Selenium khi cần) | "selenium"
+        http_concurrency: số request HTTP cùng lúc trên tất cả danh mục
+        incremental: dừng cào sớm khi gặp toàn sách đã có (False = luôn cào toàn bộ)
+        stop_after: số trang liên tiếp không có sách mới thì dừng
+        full_crawl_days: cào toàn bộ mỗi danh mục sau mỗi số ngày này
+        state_path: file JSON lưu thời điểm cào toàn bộ gần nhất
+        lean_driver: Chrome dùng profile lean của setup_driver
+        book_store: nơi lưu sách (CSV_DATA_BOOK mặc định, hoặc scrape.book_db.BookDB)
+    """
+    def __init__(self, workers=3, min_interval=1.0, driver_factory=None,
+                 fetch_mode="http", http_concurrency=8, incremental=True,
+                 stop_after=2, full_crawl_days=7, state_path=None, lean_driver=True,
+                 book_store=None):
+        if fetch_mode not in ("http", "selenium"):
+            raise ValueError(f"fetch_mode không hợp lệ: {fetch_mode}")
+        self.workers = workers
+        self.rate_limiter = HostRateLimiter(min_interval)
+        self.driver_factory = driver_factory
+        self.fetch_mode = fetch_mode
+        self.http_concurrency = http_concurrency
+        self.incremental = incremental
+        self.stop_after = stop_after
+        self.full_crawl_seconds = full_crawl_days * 86400
+        self.state = ScrapeState(state_path)
+        self.lean_driver = lean_driver
+        self.book_store = book_store or CSV_DATA_BOOK()
+
+    def _known_urls(self, name, csv_file):
+        """URL đã có để dừng sớm, None nếu lần này cần cào toàn bộ"""
+        if not self.incremental or self.state.full_crawl_due(name, self.full_crawl_seconds):
+            return None
+        known_urls = self.book_store.get_known_urls(csv_file)
+        return known_urls or None
+
+    @staticmethod
+    def _result(name, fetcher, df, stats, seconds):
+        pages = stats.get("pages", 0)
+        return {
+            "name": name,
+            "fetcher": fetcher,
+            "full_crawl": stats.get("new_books") is None,
+            "pages": pages,
+            "books": len(df),
+            "new_books": stats.get("new_books"),
+            "stopped_early": stats.get("stopped_early", False),
+            "seconds": round(seconds, 2),
+            "pages_per_second": round(pages / seconds, 3) if seconds else 0.0,
+        }
+
+    def _run_job(self, pool, name, url, csv_file):
+        stats = {}
+        start = time.perf_counter()
+        known_urls = self._known_urls(name, csv_file)
+        with pool.driver() as driver:
+            df = Scrape().scrape_all_pages_selenium_2(
+                url, driver=driver, rate_limiter=self.rate_limiter, stats=stats,
+                known_urls=known_urls, stop_after=self.stop_after
+            )
+        seconds = time.perf_counter() - start
+        self.book_store.update_csv(csv_file, df)
+        return self._result(name, "selenium", df, stats, seconds)
+
+    async def _run_http_job(self, scraper, client, name, url, csv_file):
+        stats = {}
+        start = time.perf_counter()
+        known_urls = await asyncio.to_thread(self._known_urls, name, csv_file)
+        # Chỉ lỗi lúc tải mới được chuyển sang Selenium; lỗi đọc / ghi CSV để nguyên
+        try:
+            df = await scraper.scrape_category(client, url, stats, known_urls, self.stop_after)
+        except NeedsBrowser:
+            raise
+        except Exception as e:
+            raise HttpFetchError(e) from e
+        seconds = time.perf_counter() - start
+        await asyncio.to_thread(self.book_store.update_csv, csv_file, df)
+        return self._result(name, "http", df, stats, seconds)
+
+    async def _run_http(self, jobs):
+        """
+        Cào tất cả danh mục bằng HTTP.
+
+        Returns:
+            tuple: (kết quả, các job cần chạy lại bằng Selenium, tên danh mục lỗi)
+        """
+        scraper = HttpScraper(self.http_concurrency, rate_limiter=self.rate_limiter)
+        async with scraper.client() as client:
+            outcomes = await asyncio.gather(
+                *(self._run_http_job(scraper, client, *job) for job in jobs),
+                return_exceptions=True,
+            )
+        results, fallback, failed = [], [], []
+        for job, outcome in zip(jobs, outcomes):
+            if isinstance(outcome, NeedsBrowser):
+                print(f">> {job[0]}: phân trang cần JavaScript, chuyển sang Selenium")
+                fallback.append(job)
+            elif isinstance(outcome, HttpFetchError):
+                print(f">> {job[0]}: tải HTTP lỗi ({outcome}), chuyển sang Selenium")
+                fallback.append(job)
+            elif isinstance(outcome, Exception):
+                print(f"Lỗi khi cập nhật {job[0]}: {outcome}")
+                failed.append(job[0])
+            else:
+                results.append(outcome)
+                self._print_result(outcome)
+        return results, fallback, failed
+
+    @staticmethod
+    def _print_result(result):
+        mode = "toàn bộ" if result["full_crawl"] else f"tăng dần, {result['new_books']} sách mới"
+        print(f">> {result['name']} ({result['fetcher']}, {mode}): {result['pages']} trang, "
+              f"{result['books']} sách trong {result['seconds']}s ({result['pages_per_second']} trang/s)")
+
+    def run(self, jobs):
+        """
+        Cào và ghi CSV cho các danh mục.
+
+        Args:
+            jobs: list (tên, url, đường dẫn CSV)
+
+        Returns:
+            dict: {"categories": [thống kê từng danh mục], "failed", "pages", "seconds",
+                   "pages_per_second", "rate_limit_wait_seconds", "selenium_fallbacks"}
+        """
+        results, failed = [], []
+        start = time.perf_counter()
+        selenium_jobs = jobs
+        if self.fetch_mode == "http":
+            results, selenium_jobs, failed = asyncio.run(self._run_http(jobs))
+
+        # Pool tạo driver khi cần: không danh mục nào phải dùng Selenium thì không mở Chrome
+        pool = DriverPool(self.workers, self.driver_factory, lean=self.lean_driver)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scrape") as executor:
+                futures = {executor.submit(self._run_job, pool, *job): job[0] for job in selenium_jobs}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Lỗi khi cập nhật {name}: {e}")
+                        failed.append(name)
+                        continue
+                    results.append(result)
+                    self._print_result(result)
+        finally:
+            pool.close()
+
+        # Chỉ ghi nhận cào toàn bộ khi danh mục đã cào xong
+        for result in results:
+            if result["full_crawl"]:
+                self.state.mark_full_crawl(result["name"])
+        self.state.save()
+
+        seconds = time.perf_counter() - start
+        pages = sum(result["pages"] for result in results)
+        report = {
+            "categories": sorted(results, key=lambda result: -result["seconds"]),
+            "failed": failed,
+            "pages": pages,
+            "seconds": round(seconds, 2),
+            "pages_per_second": round(pages / seconds, 3) if seconds else 0.0,
+            "rate_limit_wait_seconds": round(self.rate_limiter.waited, 2),
+            "selenium_fallbacks": len(selenium_jobs) if self.fetch_mode == "http" else 0,
+        }
+        print(f">> Cào xong {len(results)}/{len(jobs)} danh mục: {pages} trang trong "
+              f"{report['seconds']}s ({report['pages_per_second']} trang/s, {self.workers} driver)")
+        return report
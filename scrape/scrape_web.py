@@ -13,16 +13,72 @@ from scrape.books import Books
 
 
 load_dotenv(dotenv_path="url.env")
+
+
+def category_page_url(url, page):
+    """URL trang thứ page của danh mục: trang đầu là url, sau đó /page/{n}/"""
+    if page == 1:
+        return url
+    if url.endswith("/"):
+        return f"{url}page/{page}/"
+    return f"{url}/page/{page}/"
+
+
+class NewBookTracker:
+    """
+    Đếm sách mới (URL chưa có trong CSV) trên từng trang để dừng cào sớm:
+    danh mục xếp sách mới nhất lên đầu, nên sau stop_after trang liên tiếp
+    toàn sách cũ thì các trang sau cũng chỉ còn sách cũ.
+
+    Args:
+        known_urls: URL đã có, None = không dừng sớm (cào toàn bộ)
+        stop_after: số trang liên tiếp không có sách mới thì dừng
+    """
+    def __init__(self, known_urls=None, stop_after=2):
+        self.known_urls = known_urls
+        self.stop_after = max(1, stop_after)
+        self.new_books = 0
+        self.pages_without_new = 0
+        self.stopped_early = False
+        self._new_urls = set()
+
+    @property
+    def pages_until_stop(self):
+        """Số trang toàn sách cũ nữa thì dừng"""
+        return self.stop_after - self.pages_without_new
+
+    def add_page(self, page_data):
+        """Ghi nhận 1 trang, True nếu nên dừng"""
+        if self.known_urls is None:
+            return False
+        new = 0
+        for book in page_data:
+            url = str(book.get("url", "")).strip()
+            if url not in self.known_urls and url not in self._new_urls:
+                self._new_urls.add(url)
+                new += 1
+        self.new_books += new
+        self.pages_without_new = 0 if new else self.pages_without_new + 1
+        self.stopped_early = self.pages_without_new >= self.stop_after
+        return self.stopped_early
+
+    def stats(self):
+        if self.known_urls is None:
+            return {"new_books": None, "stopped_early": False}
+        return {"new_books": self.new_books, "stopped_early": self.stopped_early}
+
+
 class Scrape:
-    def scrape_all_pages_selenium(self, url):
+    def scrape_all_pages_selenium(self, url, page_timeout=10, idle_ms=500):
         # Cào tất cả trang sử dụng Selenium
+        # page_timeout: chờ trang tiếp theo tối đa (giây), idle_ms: mạng rảnh sau bao lâu không có request
         driver = setup_driver(headless=False)  # Set False để xem quá trình
         all_books = []
         
         try:
             print(f"Đang truy cập: {url}")
             driver.get(url)
-            scrape = Books(driver)
+            scrape = Books(driver, timeout=page_timeout, idle_ms=idle_ms)
             # Đợi trang load
             WebDriverWait(driver, 5).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, '.product-small'))
@@ -51,14 +107,14 @@ class Scrape:
                         print("Không thể chuyển sang trang tiếp theo hoặc bị redirect")
                         break
                         
-                    # Kiểm tra lại pagination sau khi chuyển trang
-                    time.sleep(2)
+                    # Kiểm tra lại pagination sau khi chuyển trang (safe_click_next_page đã chờ trang mới)
                     new_current, _ = scrape.get_pagination_info()
                     if new_current <= current_page:
                         print("Phát hiện không chuyển trang được, dừng lại")
                         break
             
             print(f"\nTổng cộng đã cào {len(all_books)} sách từ {page_count} trang")
+            print(f"Thời gian chuyển trang: {scrape.wait_stats()}")
             
         finally:
             driver.quit()
@@ -67,12 +123,29 @@ class Scrape:
     
     
     # Dành cho các trang có pagination đơn giản
-    def scrape_all_pages_selenium_2(self, url):
-        driver = setup_driver(headless=True)  # Set False để xem quá trình
+    def scrape_all_pages_selenium_2(self, url, driver=None, rate_limiter=None, stats=None,
+                                    known_urls=None, stop_after=2):
+        """
+        Args:
+            url: trang đầu của danh mục
+            driver: driver dùng lại (vd: từ DriverPool), None = tạo mới và đóng khi xong
+            rate_limiter: HostRateLimiter giãn cách các lần tải trang, None = sleep 5s mỗi trang
+            stats: dict nhận số trang đã cào ("pages"), số sách mới ("new_books"),
+                có dừng sớm không ("stopped_early")
+            known_urls: URL sách đã có (từ CSV), None = cào hết mọi trang
+            stop_after: dừng sau stop_after trang liên tiếp không có sách mới
+        """
+        own_driver = driver is None
+        if own_driver:
+            driver = setup_driver(headless=True, lean=True)  # Set False để xem quá trình
         all_books = []
+        pages = 0
+        tracker = NewBookTracker(known_urls, stop_after)
 
         try:
             print(f"Đang truy cập: {url}")
+            if rate_limiter:
+                rate_limiter.wait(url)
             driver.get(url)
             scrape = Books(driver)
 
@@ -87,16 +160,13 @@ class Scrape:
 
             # Loop qua từng page theo URL /page/{n}/
             for page in range(1, total_pages + 1):
-                if page == 1:
-                    page_url = url  # trang đầu
-                else:
-                    if url.endswith("/"):
-                        page_url = f"{url}page/{page}/"
-                    else:
-                        page_url = f"{url}/page/{page}/"
+                page_url = category_page_url(url, page)
 
                 print(f"\nĐang cào trang {page}: {page_url}")
-                driver.get(page_url)
+                if page > 1:
+                    if rate_limiter:
+                        rate_limiter.wait(page_url)
+                    driver.get(page_url)
 
                 # Đợi load sản phẩm
                 try:
@@ -109,16 +179,27 @@ class Scrape:
 
                 page_data = scrape.get_ebook_data()
                 all_books.extend(page_data)
+                pages += 1
 
                 print(f"Đã cào {len(page_data)} sách từ trang {page}")
-                time.sleep(5)  # tránh bị ban IP
+                if tracker.add_page(page_data):
+                    print(f"{stop_after} trang liên tiếp không có sách mới, dừng ở trang {page}/{total_pages}")
+                    break
+                if rate_limiter is None:
+                    time.sleep(5)  # tránh bị ban IP
 
             print(f"\nTổng cộng đã cào {len(all_books)} sách từ {total_pages} trang")
 
         finally:
-            driver.quit()
-        
+            if own_driver:
+                driver.quit()
+            if stats is not None:
+                stats["pages"] = pages
+                stats.update(tracker.stats())
+
         df = pd.DataFrame(all_books)
+        if df.empty:
+            return df
 
         # Xóa trùng theo toàn bộ cột
         df = df.drop_duplicates()
@@ -0,0 +1,243 @@
+"""
+Server giả lập Redis (RESP2) chạy cục bộ trong thread, dùng cho test.
+
+Chỉ có các lệnh mà RedisClient / RedisSessionBackend dùng. Có thêm 2 cách
+giả lập sự cố mạng:
+  - drop_after: tên lệnh, server chạy lệnh đó rồi đóng kết nối không trả lời
+  - disconnect_all(): đóng mọi kết nối đang mở (như server đóng kết nối idle)
+"""
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        with self.server.guard:
+            self.server.connections.add(self.request)
+
+    def finish(self):
+        with self.server.guard:
+            self.server.connections.discard(self.request)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+        return args
+
+    def handle(self):
+        stub = self.server.stub
+        while True:
+            try:
+                command = self._read_command()
+            except (OSError, ValueError):
+                return
+            if command is None:
+                return
+            name = command[0].upper()
+            with stub.lock:
+                stub.calls.append(name)
+                reply = stub.execute(name, command[1:])
+                drop = stub.drop_after == name
+                if drop:
+                    stub.drop_after = None
+            if drop:
+                self.request.shutdown(socket.SHUT_RDWR)
+                return
+            try:
+                self.wfile.write(_encode(reply))
+                self.wfile.flush()
+            except OSError:
+                return
+
+
+class _Error(str):
+    pass
+
+
+def _encode(value):
+    if isinstance(value, _Error):
+        return f"-{value}\r\n".encode()
+    if value is True:
+        return b"+OK\r\n"
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, list):
+        return f"*{len(value)}\r\n".encode() + b"".join(_encode(v) for v in value)
+    data = str(value).encode("utf-8")
+    return f"${len(data)}\r\n".encode() + data + b"\r\n"
+
+
+def _in_range(score, low, high):
+    """Khoảng điểm của ZREMRANGEBYSCORE: "-inf" / "+inf", "(x" = không tính x"""
+    def bound(text):
+        if text in ("-inf", "+inf"):
+            return float(text), False
+        if text.startswith("("):
+            return float(text[1:]), True
+        return float(text), False
+
+    low_value, low_open = bound(low)
+    high_value, high_open = bound(high)
+    above = score > low_value if low_open else score >= low_value
+    below = score < high_value if high_open else score <= high_value
+    return above and below
+
+
+class RedisStub:
+    """
+    Dùng làm context manager:
+        with RedisStub() as redis:
+            client = RedisClient(redis.url)
+    """
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.calls = []
+        self.drop_after = None
+        self.lock = threading.Lock()
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._server.guard = threading.Lock()
+        self._server.connections = set()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.disconnect_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def disconnect_all(self):
+        with self._server.guard:
+            connections = list(self._server.connections)
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    # --- LỆNH ---
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _list(self, key):
+        if not self._alive(key):
+            self.data[key] = []
+        return self.data[key]
+
+    def _zset(self, key):
+        if not self._alive(key):
+            self.data[key] = {}
+        return self.data[key]
+
+    def execute(self, name, args):
+        if name in ("PING",):
+            return "PONG"
+        if name in ("AUTH", "SELECT"):
+            return True
+        if name == "SET":
+            key, value, *flags = args
+            if "NX" in (f.upper() for f in flags) and self._alive(key):
+                return None
+            self.data[key] = value
+            self.expires.pop(key, None)
+            return True
+        if name == "GET":
+            return self.data.get(args[0]) if self._alive(args[0]) else None
+        if name == "EXISTS":
+            return sum(self._alive(key) for key in args)
+        if name == "DEL":
+            removed = 0
+            for key in args:
+                if self._alive(key):
+                    del self.data[key]
+                    removed += 1
+                self.expires.pop(key, None)
+            return removed
+        if name in ("EXPIRE", "PEXPIRE"):
+            key, ttl = args
+            if not self._alive(key):
+                return 0
+            self.expires[key] = time.monotonic() + int(ttl) / (1 if name == "EXPIRE" else 1000)
+            return 1
+        if name == "ZADD":
+            key, *pairs = args
+            zset = self._zset(key)
+            added = 0
+            for score, member in zip(pairs[::2], pairs[1::2]):
+                added += member not in zset
+                zset[member] = float(score)
+            return added
+        if name == "ZREM":
+            key, *members = args
+            zset = self._zset(key)
+            return sum(zset.pop(member, None) is not None for member in members)
+        if name == "ZCARD":
+            return len(self._zset(args[0]))
+        if name == "ZRANGE":
+            members = sorted(self._zset(args[0]).items(), key=lambda item: (item[1], item[0]))
+            start, stop = int(args[1]), int(args[2])
+            stop = len(members) if stop == -1 else stop + 1
+            return [member for member, _ in members[start:stop]]
+        if name == "ZREMRANGEBYSCORE":
+            key, low, high = args
+            zset = self._zset(key)
+            removed = [m for m, score in zset.items() if _in_range(score, low, high)]
+            for member in removed:
+                del zset[member]
+            return len(removed)
+        if name == "RPUSH":
+            key, *values = args
+            items = self._list(key)
+            items.extend(values)
+            return len(items)
+        if name in ("LRANGE", "LTRIM"):
+            key, start, stop = args[0], int(args[1]), int(args[2])
+            items = self.data.get(key, []) if self._alive(key) else []
+            size = len(items)
+            start = max(start + size if start < 0 else start, 0)
+            stop = stop + size if stop < 0 else min(stop, size - 1)
+            selected = items[start:stop + 1]
+            if name == "LRANGE":
+                return selected
+            if selected:
+                self.data[key] = selected
+            else:
+                self.data.pop(key, None)
+            return True
+        if name == "SCAN":
+            pattern = args[args.index("MATCH") + 1] if "MATCH" in args else "*"
+            keys = [key for key in list(self.data) if self._alive(key) and fnmatch.fnmatchcase(key, pattern)]
+            return ["0", keys]
+        return _Error(f"ERR unknown command '{name}'")
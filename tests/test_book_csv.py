@@ -0,0 +1,81 @@
+import os
+
+import pandas as pd
+import pytest
+
+from scrape.book_csv import CSV_DATA_BOOK
+
+
+def books(*numbers):
+    return pd.DataFrame([
+        {"title": f"Sách {n}", "genre": "Tiểu thuyết", "url": f"https://x/{n}/", "views": str(n)}
+        for n in numbers
+    ])
+
+
+def read(csv_file):
+    return pd.read_csv(csv_file, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+
+
+@pytest.fixture
+def store():
+    return CSV_DATA_BOOK()
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    return str(tmp_path / "data" / "a.csv")
+
+
+def test_append_only_new_keys(store, csv_file):
+    store.update_csv(csv_file, books(1, 2))
+    store.update_csv(csv_file, books(2, 3, 3))
+
+    assert read(csv_file)["title"].tolist() == ["Sách 1", "Sách 2", "Sách 3"]
+    assert store.keys(csv_file) == {(f"Sách {n}", f"https://x/{n}/") for n in (1, 2, 3)}
+    assert store.get_known_urls(csv_file) == {f"https://x/{n}/" for n in (1, 2, 3)}
+
+
+def test_torn_tail_is_cut_and_rewritten(store, csv_file):
+    store.update_csv(csv_file, books(1, 2))
+    # Lần ghi thêm bị dừng giữa chừng: nửa dòng ở cuối CSV, chỉ mục chưa có khóa
+    with open(csv_file, "ab") as f:
+        f.write("Sách 3,Tiểu thu".encode("utf-8"))
+
+    store.update_csv(csv_file, books(3, 4))
+
+    df = read(csv_file)
+    assert df["title"].tolist() == ["Sách 1", "Sách 2", "Sách 3", "Sách 4"]
+    assert df.loc[2, "genre"] == "Tiểu thuyết"
+    assert len(store.keys(csv_file)) == 4
+
+
+def test_index_out_of_sync_is_rebuilt(store, csv_file):
+    store.update_csv(csv_file, books(1))
+    # CSV đã ghi thêm nhưng bị dừng trước khi ghi chỉ mục -> "#size" lệch
+    with open(csv_file, "ab") as f:
+        f.write("Sách 2,Tiểu thuyết,https://x/2/,2\n".encode("utf-8"))
+
+    assert store.keys(csv_file) == {("Sách 1", "https://x/1/"), ("Sách 2", "https://x/2/")}
+    store.update_csv(csv_file, books(2, 3))
+    assert read(csv_file)["title"].tolist() == ["Sách 1", "Sách 2", "Sách 3"]
+
+
+def test_missing_index_is_rebuilt(store, csv_file):
+    store.update_csv(csv_file, books(1, 2))
+    index_file = store.index_path(csv_file)
+    os.remove(index_file)
+
+    store.update_csv(csv_file, books(2, 3))
+    assert read(csv_file)["title"].tolist() == ["Sách 1", "Sách 2", "Sách 3"]
+    assert os.path.exists(index_file)
+
+
+def test_compact_removes_duplicates(store, csv_file):
+    os.makedirs(os.path.dirname(csv_file))
+    df = pd.concat([books(1, 2), books(2), books(1).assign(views="99")], ignore_index=True)
+    df.to_csv(csv_file, index=False, encoding="utf-8-sig")
+
+    assert store.compact(csv_file) == {"file": csv_file, "rows": 2, "removed": 2}
+    assert read(csv_file)["title"].tolist() == ["Sách 1", "Sách 2"]
+    assert store.keys(csv_file) == {("Sách 1", "https://x/1/"), ("Sách 2", "https://x/2/")}
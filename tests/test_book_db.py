@@ -0,0 +1,90 @@
+import os
+
+import pandas as pd
+import pytest
+
+from scrape.book_csv import CSV_DATA_BOOK
+from scrape.book_db import BookDB, fts_query
+
+BOOKS = {
+    "detective/trinh-tham.csv": [
+        ("Thám Tử Gà Mờ", "Trinh thám", "https://x/tham-tu-ga-mo/", "120"),
+        ("Thám Tử Lừng Danh Conan", "Trinh thám", "https://x/conan/", "900"),
+    ],
+    "romance.csv": [
+        ("Thám Hiểm Trái Tim", "Lãng mạn", "https://x/tham-hiem/", "50"),
+        ("Nhà Giả Kim", "Tiểu thuyết", "https://x/nha-gia-kim/", "700"),
+    ],
+}
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["title", "genre", "url", "views"])
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = tmp_path / "data"
+    for category, rows in BOOKS.items():
+        csv_file = data_dir / category
+        os.makedirs(csv_file.parent, exist_ok=True)
+        frame(rows).to_csv(csv_file, index=False, encoding="utf-8-sig")
+    return str(data_dir)
+
+
+@pytest.fixture
+def db(tmp_path, data_dir):
+    db = BookDB(str(tmp_path / "catalog.db"), data_dir)
+    db.import_csv()
+    return db
+
+
+def titles(books):
+    return [book["title"] for book in books]
+
+
+def test_fts_query():
+    assert fts_query("Thám tử!") == '"tham" "tu"*'
+    assert fts_query("  ?? ") is None
+
+
+def test_search_words_accents_and_prefix(db):
+    assert db.count() == 4
+    assert set(titles(db.search("thám tử"))) == {"Thám Tử Gà Mờ", "Thám Tử Lừng Danh Conan"}
+    # Không dấu, từ cuối khớp theo tiền tố
+    assert titles(db.search("tham tu con")) == ["Thám Tử Lừng Danh Conan"]
+    assert set(titles(db.search("tham"))) == {"Thám Tử Gà Mờ", "Thám Tử Lừng Danh Conan", "Thám Hiểm Trái Tim"}
+    assert db.search("không có") == []
+    assert db.search("") == []
+
+
+def test_search_filters(db):
+    assert titles(db.search("tham", genre="Lãng Mạn")) == ["Thám Hiểm Trái Tim"]
+    assert set(titles(db.search("tham", category="detective"))) == {"Thám Tử Gà Mờ", "Thám Tử Lừng Danh Conan"}
+    assert titles(db.search("tham", category="romance")) == ["Thám Hiểm Trái Tim"]
+    book = db.search("nha gia kim")[0]
+    assert book["category"] == "romance.csv" and book["views"] == "700"
+
+
+def test_update_csv_dedupes_and_bumps_version(db, data_dir):
+    csv_file = os.path.join(data_dir, "romance.csv")
+    version = db.version()
+
+    db.update_csv(csv_file, frame(BOOKS["romance.csv"]))
+    assert db.version() == version
+
+    db.update_csv(csv_file, frame([("Tham Vọng", "Lãng mạn", "https://x/tham-vong/", "1")]))
+    assert db.version() != version
+    assert db.count() == 5
+    assert "https://x/tham-vong/" in db.get_known_urls(csv_file)
+    assert titles(db.search("tham vong")) == ["Tham Vọng"]
+
+
+def test_export_roundtrip(db, tmp_path):
+    out = tmp_path / "export"
+    assert db.export_csv(str(out)) == {"detective/trinh-tham.csv": 2, "romance.csv": 2}
+    exported = str(out / "romance.csv")
+    df = pd.read_csv(exported, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    assert df["title"].tolist() == ["Thám Hiểm Trái Tim", "Nhà Giả Kim"]
+    # CSV export kèm chỉ mục khóa của CSV_DATA_BOOK
+    assert len(CSV_DATA_BOOK().keys(exported)) == 2
@@ -0,0 +1,112 @@
+import base64
+import json
+
+import pandas as pd
+import pytest
+
+from chatbot.book_store import BookStore
+from scrape.book_db import normalize_title
+
+BOOKS = [
+    ("Gia Đình", "h3", "Tiểu thuyết", "novel/family.csv"),
+    ("Gia Đình", "h1", "Tiểu thuyết", "novel/family.csv"),
+    ("Gia Đình", "h2", "Gia đình", "novel/family.csv"),
+    ("Gia Đình Là Số Một", "h4", "Gia đình", "novel/family.csv"),
+    ("Án Mạng Trên Tàu", "h5", "Trinh thám", "detective.csv"),
+    ("Ánh Trăng", "h6", "Tiểu thuyết", "novel/moon.csv"),
+    ("Bọt", "h7", "Ngôn tình", "romance.csv"),
+    ("Zen", "h8", "Tiểu thuyết", "novel/zen.csv"),
+]
+
+
+def frame(rows):
+    return pd.DataFrame([
+        {"title": title, "title_normalized": normalize_title(title), "content_hash": content_hash,
+         "genre": genre, "category": category, "url": f"https://x/{content_hash}/", "img_path": "",
+         "views_count": n, "downloads_count": 0}
+        for n, (title, content_hash, genre, category) in enumerate(rows)
+    ])
+
+
+@pytest.fixture
+def store():
+    return BookStore(frame(BOOKS), normalize_title)
+
+
+def keys(books):
+    return [(normalize_title(book["title"]), book["url"]) for book in books]
+
+
+def walk(store, limit, **filters):
+    """Đi hết các trang, trả về sách theo thứ tự"""
+    books, cursor = [], None
+    while True:
+        page = store.search(limit=limit, cursor=cursor, **filters)
+        books += page["books"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return books
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 100])
+def test_pages_cover_everything_once(store, limit):
+    everything = store.search(limit=100)["books"]
+    assert len(everything) == len(BOOKS)
+    # Cùng tên: sắp xếp tiếp theo content_hash
+    assert [book["url"] for book in everything[:3]] == [f"https://x/h{n}/" for n in (5, 6, 7)]
+    assert [book["url"] for book in everything if book["title"] == "Gia Đình"] == \
+        ["https://x/h1/", "https://x/h2/", "https://x/h3/"]
+
+    assert keys(walk(store, limit)) == keys(everything)
+    genre_books = walk(store, limit, genre="tieu thuyet")
+    assert [book["title"] for book in genre_books] == ["Ánh Trăng", "Gia Đình", "Gia Đình", "Zen"]
+    assert len(walk(store, limit, category="novel")) == 6
+
+
+def test_cursor_survives_rebuild(store):
+    first = store.search(limit=4)
+    assert first["books"][-1]["url"] == "https://x/h1/"
+    # Kho build lại giữa 2 trang, thêm sách trước và sau cursor
+    rebuilt = BookStore(frame(BOOKS + [("Gia Đình", "h0", "Tiểu thuyết", "novel/family.csv"),
+                                       ("Gia Đình", "h1a", "Tiểu thuyết", "novel/family.csv")]),
+                        normalize_title)
+    second = rebuilt.search(limit=3, cursor=first["next_cursor"])
+    assert [book["url"] for book in second["books"]] == \
+        ["https://x/h1a/", "https://x/h2/", "https://x/h3/"]
+
+
+def test_prefix_edges(store):
+    def titles(prefix):
+        return [book["title"] for book in walk(store, 2, prefix=prefix)]
+
+    # Đầu / cuối dãy tên đã sắp xếp
+    assert titles("an") == ["Án Mạng Trên Tàu", "Ánh Trăng"]
+    assert titles("zen") == ["Zen"]
+    assert titles("ze") == ["Zen"]
+    assert titles("zz") == []
+    assert titles("a") == ["Án Mạng Trên Tàu", "Ánh Trăng"]
+    # Tiền tố đúng bằng 1 tên: gồm cả tên dài hơn bắt đầu bằng nó
+    assert titles("Gia Đình") == ["Gia Đình"] * 3 + ["Gia Đình Là Số Một"]
+    assert titles("gia đình là") == ["Gia Đình Là Số Một"]
+    assert store.search(prefix="bot")["total"] == 1
+
+
+def cursor_of(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def test_bad_cursor_is_rejected(store):
+    page = store.search(limit=2, prefix="gia")
+    with pytest.raises(ValueError):
+        store.search(cursor="không-phải-cursor")
+    with pytest.raises(ValueError):
+        store.search(cursor=cursor_of(["gia dinh", "h1"]))
+    with pytest.raises(ValueError):
+        store.search(cursor=cursor_of({"title": "gia dinh"}))
+    # Cursor của truy vấn khác (đổi tiền tố / thể loại)
+    with pytest.raises(ValueError):
+        store.search(limit=2, cursor=page["next_cursor"])
+    with pytest.raises(ValueError):
+        store.search(limit=2, prefix="gia", genre="Gia đình", cursor=page["next_cursor"])
+    # Đổi limit giữa 2 trang vẫn được
+    assert store.search(limit=5, prefix="gia", cursor=page["next_cursor"])["books"]
@@ -0,0 +1,57 @@
+import hashlib
+
+import pytest
+
+pytest.importorskip("chromadb")
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from chatbot.chroma_sync import sync_documents
+
+
+def make_docs(rows):
+    docs = [Document(page_content=text, metadata={"views": views}) for text, views in rows]
+    ids = [hashlib.md5(doc.page_content.encode("utf-8")).hexdigest() for doc in docs]
+    return docs, ids
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Chroma(persist_directory=str(tmp_path / "chroma"),
+                  embedding_function=DeterministicFakeEmbedding(size=8))
+
+
+def test_sync_with_injected_embedder(db):
+    embedder = DeterministicFakeEmbedding(size=8)
+    calls = []
+
+    def embed_batches(batches):
+        for texts in batches:
+            calls.append(len(texts))
+            yield embedder.embed_documents(texts)
+
+    docs, ids = make_docs([(f"sách {i}", i) for i in range(5)])
+    assert sync_documents(db, docs, ids, batch_size=2, embed_batches=embed_batches) == \
+        {"added": 5, "updated": 0, "deleted": 0, "unchanged": 0}
+    assert calls == [2, 2, 1]
+
+    stored = db._collection.get(ids=[ids[3]], include=["embeddings", "documents"])
+    assert stored["documents"] == ["sách 3"]
+    assert list(stored["embeddings"][0]) == pytest.approx(embedder.embed_query("sách 3"))
+
+    # Bỏ 1 sách, đổi metadata 1 sách, thêm 1 sách: chỉ sách mới được embed
+    calls.clear()
+    docs, ids = make_docs([("sách 1", 1), ("sách 2", 20), ("sách 3", 3), ("sách 4", 4), ("sách 5", 5)])
+    assert sync_documents(db, docs, ids, batch_size=2, embed_batches=embed_batches) == \
+        {"added": 1, "updated": 1, "deleted": 1, "unchanged": 3}
+    assert calls == [1]
+    assert db._collection.get(ids=[ids[1]])["metadatas"][0]["views"] == 20
+    assert db._collection.count() == 5
+
+
+def test_sync_default_embedder_matches(db):
+    docs, ids = make_docs([("sách a", 1), ("sách b", 2)])
+    assert sync_documents(db, docs, ids)["added"] == 2
+    assert sync_documents(db, *make_docs([("sách a", 1), ("sách b", 2)])) == \
+        {"added": 0, "updated": 0, "deleted": 0, "unchanged": 2}
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+
+from api.concurrency import ConcurrencyLimiter, QueueTimeoutError
+
+
+def test_run_returns_result_and_wait():
+    async def main():
+        limiter = ConcurrencyLimiter(max_in_flight=2)
+        try:
+            result, waited = await limiter.run(lambda a, b=0: a + b, 1, b=2)
+        finally:
+            limiter.shutdown()
+        return result, waited, limiter.stats()
+
+    result, waited, stats = asyncio.run(main())
+    assert result == 3
+    assert waited >= 0
+    assert stats["completed"] == 1 and stats["in_flight"] == 0
+
+
+def test_cancelled_run_keeps_slot_until_thread_finishes():
+    started, finish = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        finish.wait(5)
+        return "xong"
+
+    async def main():
+        limiter = ConcurrencyLimiter(max_in_flight=1, queue_timeout=0.2)
+        try:
+            task = asyncio.create_task(limiter.run(work))
+            await asyncio.to_thread(started.wait, 5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # Thread vẫn đang chạy work(): slot chưa được trả
+            assert limiter.stats()["in_flight"] == 1
+            with pytest.raises(QueueTimeoutError):
+                await limiter.acquire()
+
+            finish.set()
+            result, _ = await limiter.run(lambda: "tiếp")
+            return result, limiter.stats()
+        finally:
+            finish.set()
+            limiter.shutdown()
+
+    result, stats = asyncio.run(main())
+    assert result == "tiếp"
+    assert stats["in_flight"] == 0 and stats["completed"] == 2
+
+
+def test_cancelled_iterate_releases_after_next_returns():
+    started, finish = threading.Event(), threading.Event()
+
+    def tokens():
+        yield "a"
+        started.set()
+        finish.wait(5)
+        yield "b"
+
+    async def main():
+        limiter = ConcurrencyLimiter(max_in_flight=1)
+        try:
+            await limiter.acquire()
+            stream = limiter.iterate(tokens(), release=True)
+            assert await stream.__anext__() == "a"
+            pending = asyncio.create_task(stream.__anext__())
+            await asyncio.to_thread(started.wait, 5)
+            pending.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await pending
+            in_flight = limiter.stats()["in_flight"]
+
+            finish.set()
+            for _ in range(100):
+                if limiter.stats()["in_flight"] == 0:
+                    break
+                await asyncio.sleep(0.01)
+            return in_flight, limiter.stats()
+        finally:
+            finish.set()
+            limiter.shutdown()
+
+    in_flight, stats = asyncio.run(main())
+    assert in_flight == 1
+    assert stats["in_flight"] == 0 and stats["completed"] == 1
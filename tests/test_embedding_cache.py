@@ -0,0 +1,67 @@
+import sys
+import unicodedata
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from chatbot.embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+
+
+class RecordingEmbeddings(Embeddings):
+    """Vector = độ dài text, ghi lại text đã embed"""
+    def __init__(self):
+        self.queries = []
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 0.1]
+
+
+def entry_size(key, dim=4):
+    return dim * 4 + sys.getsizeof(key)
+
+
+def test_lru_evicts_by_bytes():
+    cache = QueryEmbeddingCache(max_bytes=2 * entry_size("a"))
+    cache.put("a", [1.0] * 4)
+    cache.put("b", [2.0] * 4)
+    assert cache.get("a") == [1.0] * 4  # "a" mới dùng -> "b" cũ nhất
+
+    cache.put("c", [3.0] * 4)
+    assert cache.get("b") is None
+    assert cache.get("c") == [3.0] * 4
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evicted"] == 1
+    assert stats["bytes"] == 2 * entry_size("a") <= stats["max_bytes"]
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_lru_replaces_and_skips_oversized():
+    cache = QueryEmbeddingCache(max_bytes=entry_size("a"))
+    cache.put("a", [1.0] * 4)
+    cache.put("a", [5.0] * 4)
+    assert cache.stats()["bytes"] == entry_size("a")
+    assert cache.get("a") == [5.0] * 4
+    # Lớn hơn cả cache: không lưu, không đẩy vector khác ra
+    cache.put("b", [1.0] * 64)
+    assert cache.get("b") is None
+    assert cache.stats()["evicted"] == 0
+
+
+@pytest.mark.parametrize("query_cache_bytes", [0, 1024])
+def test_embed_query_normalizes_with_and_without_cache(tmp_path, query_cache_bytes):
+    base = RecordingEmbeddings()
+    embeddings = CachedEmbeddings(base, "fake", str(tmp_path), query_cache_bytes=query_cache_bytes)
+    # Dạng NFD, thừa khoảng trắng
+    decomposed = unicodedata.normalize("NFD", " sách  hay ")
+
+    first = embeddings.embed_query(decomposed)
+    second = embeddings.embed_query("sách hay")
+    assert first == second == np.float32([8.0, 0.1]).tolist()
+    # Cache tắt vẫn embed câu hỏi đã chuẩn hóa, cache bật thì lần 2 là hit
+    assert base.queries == ["sách hay"] * (1 if query_cache_bytes else 2)
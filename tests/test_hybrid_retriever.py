@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from chatbot.hybrid_retriever import HybridRetriever, LexicalIndex
+from scrape.book_db import normalize_title
+
+BOOKS = [
+    ("Bọt Tháng Ngày Dài", "Ngôn tình", 50),
+    ("Bọt Tháng Ngày Dài", "Trinh thám", 5),
+    ("Tháng Ngày Rực Rỡ", "Ngôn tình", 70),
+    ("Án Mạng Trên Tàu", "Trinh thám", 90),
+    ("Thám Tử Gà Mờ", "Trinh thám", 20),
+    ("Gia Đình", "Tiểu thuyết", 30),
+]
+
+
+def doc(title, genre, views):
+    return Document(page_content=f"{title} - {genre}", metadata={
+        "title": title, "title_normalized": normalize_title(title), "genre": genre,
+        "views": str(views), "views_count": views,
+    })
+
+
+class RecordingVectorstore:
+    """Thay Chroma: ghi lại các lần vector search"""
+    def __init__(self):
+        self.calls = []
+
+    def max_marginal_relevance_search(self, query, k, fetch_k, lambda_mult, filter=None):
+        self.calls.append((query, filter))
+        return []
+
+
+@pytest.fixture
+def index():
+    return LexicalIndex([doc(*book) for book in BOOKS], normalize_title)
+
+
+@pytest.fixture
+def vectorstore():
+    return RecordingVectorstore()
+
+
+@pytest.fixture
+def retriever(index, vectorstore):
+    return HybridRetriever(vectorstore=vectorstore, index=index, k=3)
+
+
+def titles(docs):
+    return [d.metadata["title"] for d in docs]
+
+
+def test_whole_title_skips_vector_search(retriever, vectorstore):
+    docs = retriever.invoke("tìm sách bọt tháng ngày dài")
+    assert titles(docs)[:2] == ["Bọt Tháng Ngày Dài"] * 2
+    assert vectorstore.calls == []
+    assert retriever.stats()["title"] == 1
+
+
+def test_partial_title_runs_hybrid(retriever, vectorstore):
+    retriever.invoke("bọt tháng ngày")
+    assert len(vectorstore.calls) == 1
+    retriever.invoke("có sách bọt tháng ngày dài không")
+    assert len(vectorstore.calls) == 2
+    stats = retriever.stats()
+    assert (stats["title"], stats["hybrid"], stats["title_fused"]) == (0, 1, 1)
+
+
+def test_filter_applies_to_title_and_genre_terms(index, retriever, vectorstore):
+    where = {"genre": "Ngôn tình"}
+    docs = retriever.with_filter(where).invoke("bọt tháng ngày dài")
+    assert [d.metadata["genre"] for d in docs] == ["Ngôn tình"] * len(docs)
+    assert vectorstore.calls == []
+
+    # "trinh thám" khớp từ thể loại (g:) của sách trinh thám, filter vẫn loại chúng
+    assert {index.docs[i].metadata["genre"] for i, _ in index.search("truyện trinh thám")} == {"Trinh thám"}
+    assert index.search("truyện trinh thám", where=where) == []
+    hits = index.search("thám tử trinh thám", where={"genre": {"$in": ["Trinh thám"]}})
+    assert index.docs[hits[0][0]].metadata["title"] == "Thám Tử Gà Mờ"
+
+
+def test_counters_shared_across_threads(retriever):
+    filtered = retriever.with_filter({"genre": "Trinh thám"})
+    assert filtered._lock is retriever._lock and filtered.counters is retriever.counters
+
+    def worker():
+        for _ in range(50):
+            filtered.invoke("án mạng trên tàu")
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = retriever.stats()
+    assert (stats["title"], stats["filtered"]) == (200, 200)
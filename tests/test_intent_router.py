@@ -0,0 +1,105 @@
+import pytest
+from langchain_core.documents import Document
+
+from chatbot.catalog import BookCatalog
+from chatbot.intent_router import DEFAULT_LIMIT, MAX_LIMIT, IntentRouter
+from scrape.book_db import normalize_title
+
+BOOKS = [
+    ("Hay", "Tiểu thuyết", 10, 1),
+    ("Gia Đình", "Tiểu thuyết", 30, 3),
+    ("Bọt Tháng Ngày Dài", "Ngôn tình", 50, 9),
+    ("Yêu Em Từ Cái Nhìn Đầu Tiên", "Ngôn tình", 70, 2),
+    ("Án Mạng Trên Tàu", "Trinh thám", 90, 8),
+    ("Bọt Tháng Ngày Dài", "Trinh thám", 5, 0),
+    ("Đêm Muộn", "18+", 40, 4),
+]
+
+
+def doc(title, genre, views, downloads):
+    slug = normalize_title(title).replace(" ", "-")
+    return Document(page_content=title, metadata={
+        "title": title, "title_normalized": normalize_title(title), "genre": genre,
+        "url": f"https://x/{slug}/", "img_path": "", "views": str(views), "downloads": str(downloads),
+        "views_count": views, "downloads_count": downloads,
+    })
+
+
+@pytest.fixture
+def catalog():
+    return BookCatalog([doc(*book) for book in BOOKS], normalize_title)
+
+
+@pytest.fixture
+def router(catalog):
+    return IntentRouter(catalog)
+
+
+def intent(router, question, genre=None):
+    result = router.route(question, genre=genre)
+    return result["intent"] if result else "chain"
+
+
+def titles(result):
+    return [book["title"] for book in result["books"]]
+
+
+def test_one_word_title_needs_exact_question(router):
+    assert titles(router.route("Hay")) == ["Hay"]
+    # "sách hay" là hỏi sách hay, không phải cuốn "Hay"
+    assert intent(router, "sách hay") == "chain"
+    assert intent(router, "gợi ý cho tôi sách hay") == "chain"
+
+
+def test_age_is_not_adult_genre(catalog, router):
+    assert catalog.detect_genre("sách cho học sinh 18 tuổi") is None
+    assert catalog.detect_genre("top 18 cuốn xem nhiều nhất") is None
+    assert catalog.detect_genre("truyện 18+") == "18"
+    assert catalog.detect_genre("truyện người lớn") == "18"
+    assert intent(router, "sách cho học sinh 18 tuổi") == "chain"
+
+
+def test_whole_and_partial_title(router):
+    result = router.route("bọt tháng ngày dài")
+    assert result["intent"] == "title"
+    assert len(result["books"]) == 2
+    assert intent(router, "tìm sách bọt tháng ngày dài") == "title"
+    # Một phần tên sách / tên ngắn là cụm từ thông dụng -> chain
+    assert intent(router, "bọt tháng ngày") == "chain"
+    assert intent(router, "sách về gia đình") == "chain"
+    assert intent(router, "Gia Đình") == "title"
+    assert intent(router, "sách Gia Đình") == "title"
+    assert intent(router, "sách gia đình") == "chain"
+
+
+def test_top_limit(router):
+    assert router._limit("top 3 sach") == 3
+    assert router._limit("cho toi 2 cuon") == 2
+    assert router._limit("sach hay") == DEFAULT_LIMIT
+    assert router._limit("top 0") == 1
+    assert router._limit("top 50 sach") == MAX_LIMIT
+
+    result = router.route("top 2 sách được xem nhiều nhất")
+    assert result["intent"] == "top_views"
+    assert titles(result) == ["Án Mạng Trên Tàu", "Yêu Em Từ Cái Nhìn Đầu Tiên"]
+    result = router.route("3 cuốn tải nhiều nhất")
+    assert result["intent"] == "top_downloads"
+    assert titles(result) == ["Bọt Tháng Ngày Dài", "Án Mạng Trên Tàu", "Đêm Muộn"]
+
+
+def test_explicit_genre_wins(catalog, router):
+    assert catalog.query_genre("truyện trinh thám", "ngon tinh") == "ngon tinh"
+    assert catalog.query_genre("truyện trinh thám") == "trinh tham"
+
+    result = router.route("liệt kê sách trinh thám", genre="ngon tinh")
+    assert result["intent"] == "genre"
+    assert {book["genre"] for book in result["books"]} == {"Ngôn tình"}
+    result = router.route("top 5 truyện trinh thám xem nhiều nhất", genre="ngon tinh")
+    assert {book["genre"] for book in result["books"]} == {"Ngôn tình"}
+
+
+def test_title_outside_genre_is_dropped(router):
+    result = router.route("bọt tháng ngày dài", genre="ngon tinh")
+    assert [book["genre"] for book in result["books"]] == ["Ngôn tình"]
+    # Tên sách không thuộc thể loại đã chọn -> không trả lời theo tên
+    assert intent(router, "Hay", genre="trinh tham") == "chain"
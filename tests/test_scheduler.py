@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.bench_scrape_http import start_server
+from scrape.book_csv import CSV_DATA_BOOK
+from scrape.scheduler import ScrapeScheduler
+
+
+class RecordingScheduler(ScrapeScheduler):
+    """Không mở Chrome: job chuyển sang Selenium chỉ được ghi lại"""
+    def __init__(self, **kwargs):
+        super().__init__(workers=1, min_interval=0.0, incremental=False, **kwargs)
+        self.selenium_jobs = []
+
+    def _run_job(self, pool, name, url, csv_file):
+        self.selenium_jobs.append(name)
+        df = pd.DataFrame([{"title": name, "url": url}])
+        self.book_store.update_csv(csv_file, df)
+        return self._result(name, "selenium", df, {"pages": 1}, 0.01)
+
+
+class BrokenStore(CSV_DATA_BOOK):
+    """Ghi CSV lỗi với file nằm trong broken"""
+    def __init__(self, broken):
+        self.broken = broken
+
+    def update_csv(self, csv_file, new_data):
+        if csv_file in self.broken:
+            raise OSError(f"Hết dung lượng: {csv_file}")
+        super().update_csv(csv_file, new_data)
+
+
+@pytest.fixture(scope="module")
+def site():
+    server, base = start_server(total_pages=3, latency=0)
+    yield base
+    server.shutdown()
+
+
+def run(tmp_path, jobs, store=None):
+    scheduler = RecordingScheduler(state_path=str(tmp_path / "state.json"), book_store=store)
+    return scheduler, scheduler.run(jobs)
+
+
+def test_http_success_and_browser_fallback(tmp_path, site):
+    jobs = [
+        ("http", f"{site}/cbo/a/", str(tmp_path / "a.csv")),
+        ("nojs", f"{site}/nojs/cbo/b/", str(tmp_path / "b.csv")),
+        ("down", "http://127.0.0.1:1/cbo/c/", str(tmp_path / "c.csv")),
+    ]
+    scheduler, report = run(tmp_path, jobs)
+
+    # Cần JavaScript / tải HTTP lỗi -> cào lại bằng Selenium
+    assert sorted(scheduler.selenium_jobs) == ["down", "nojs"]
+    assert report["failed"] == []
+    assert report["selenium_fallbacks"] == 2
+    fetchers = {result["name"]: result["fetcher"] for result in report["categories"]}
+    assert fetchers == {"http": "http", "nojs": "selenium", "down": "selenium"}
+    http_result = next(r for r in report["categories"] if r["name"] == "http")
+    assert http_result["pages"] == 3
+    assert len(pd.read_csv(tmp_path / "a.csv")) == http_result["books"] > 0
+
+
+def test_storage_error_fails_job_without_selenium(tmp_path, site):
+    broken = str(tmp_path / "a.csv")
+    jobs = [
+        ("broken", f"{site}/cbo/a/", broken),
+        ("ok", f"{site}/cbo/b/", str(tmp_path / "b.csv")),
+    ]
+    scheduler, report = run(tmp_path, jobs, store=BrokenStore({broken}))
+
+    # Tải HTTP thành công nhưng ghi CSV lỗi: lỗi của job, không cào lại bằng Selenium
+    assert scheduler.selenium_jobs == []
+    assert report["failed"] == ["broken"]
+    assert [result["name"] for result in report["categories"]] == ["ok"]
+    assert not os.path.exists(broken)
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from chatbot.redis_client import RedisClient
+from chatbot.session_store import SessionStore, create_session_backend
+from redis_stub import RedisStub
+
+
+@pytest.fixture
+def redis():
+    with RedisStub() as stub:
+        yield stub
+
+
+def make_backend(kind, tmp_path, redis, **kwargs):
+    return create_session_backend(
+        kind, sqlite_path=str(tmp_path / "sessions.db"), redis_url=redis.url, **kwargs,
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path, redis):
+    backend = make_backend(request.param, tmp_path, redis, window_size=2)
+    yield backend
+    backend.stop_sweeper()
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "redis"])
+def test_expired_session_is_gone(kind, tmp_path, redis):
+    backend = make_backend(kind, tmp_path, redis, ttl_seconds=0.2)
+    backend.append_turn("u", "hỏi", "đáp")
+    backend.append_turn("v", "hỏi", "đáp")
+    assert sorted(backend.list_users()) == ["u", "v"]
+    time.sleep(0.3)
+
+    # Hết hạn: clear không được làm sống lại session, delete báo không có session
+    assert backend.get_history("u") is None
+    assert not backend.clear("u")
+    assert backend.get_history("u") is None
+    assert not backend.delete("v")
+    assert backend.list_users() == []
+    assert backend.stats()["active"] == 0
+    # Dùng lại user_id sau khi hết hạn -> session mới
+    assert backend.load("u") == ([], True)
+
+
+def test_backend_roundtrip(backend):
+    assert backend.get_history("u1") is None
+    assert backend.load("u1") == ([], True)
+    assert backend.load("u1") == ([], False)
+
+    for i in range(3):
+        backend.append_turn("u1", f"hỏi {i}", f"đáp {i}")
+    # Chỉ giữ window_size lượt gần nhất
+    assert backend.get_history("u1") == [("hỏi 1", "đáp 1"), ("hỏi 2", "đáp 2")]
+    assert backend.list_users() == ["u1"]
+
+    assert backend.clear("u1")
+    assert backend.get_history("u1") == []
+    assert backend.delete("u1")
+    assert backend.get_history("u1") is None
+    assert not backend.delete("u1")
+    assert not backend.clear("u1")
+
+
+def test_single_sweeper_thread(backend):
+    def sweepers():
+        return sum(t.name == "session-sweeper" for t in threading.enumerate())
+
+    before = sweepers()
+    backend.start_sweeper()
+    backend.start_sweeper()
+    # memory / sqlite: 1 luồng của backend; redis: TTL do server xử lý
+    assert sweepers() - before == (0 if backend.name == "redis" else 1)
+
+
+def test_session_store_sweep():
+    store = SessionStore(max_entries=10, ttl_seconds=0)
+    store["a"] = 1
+    store["b"] = 2
+    assert store.sweep() == 2
+    assert len(store) == 0
+    assert store.stats()["evicted_ttl"] == 2
+
+
+def test_redis_reconnects_after_idle_disconnect(redis):
+    client = RedisClient(redis.url)
+    assert client.execute("RPUSH", "k", "a") == 1
+    redis.disconnect_all()
+    # Kết nối cũ đã bị đóng: phát hiện trước khi gửi, kết nối lại rồi gửi 1 lần
+    assert client.execute("RPUSH", "k", "b") == 2
+    assert client.execute("LRANGE", "k", 0, -1) == ["a", "b"]
+    client.close()
+
+
+def test_redis_does_not_resend_after_send(redis):
+    client = RedisClient(redis.url)
+    redis.drop_after = "RPUSH"
+    with pytest.raises((ConnectionError, OSError)):
+        client.pipeline(("RPUSH", "k", "a"), ("LTRIM", "k", -5, -1))
+    # RPUSH đã chạy trên server, không được gửi lại
+    assert redis.calls.count("RPUSH") == 1
+    assert client.execute("LRANGE", "k", 0, -1) == ["a"]
+    client.close()
+
+
+def test_redis_backend_survives_disconnect(redis):
+    backend = create_session_backend("redis", window_size=5, redis_url=redis.url)
+    backend.load("u1")
+    redis.disconnect_all()
+    backend.append_turn("u1", "hỏi", "đáp")
+    assert backend.get_history("u1") == [("hỏi", "đáp")]
+    assert redis.calls.count("RPUSH") == 1
+
+
+def test_redis_stats_without_scan(redis):
+    backend = create_session_backend("redis", redis_url=redis.url)
+    for user_id in ("a", "b", "c"):
+        backend.load(user_id)
+    backend.delete("b")
+    assert backend.stats()["active"] == 2
+    assert backend.list_users() == ["a", "c"]
+    assert "SCAN" not in redis.calls
+
+
+def test_redis_warns_on_max_entries(redis):
+    with pytest.warns(UserWarning, match="SESSION_MAX_ENTRIES"):
+        create_session_backend("redis", max_entries=10, redis_url=redis.url)